@@ -0,0 +1,83 @@
+""" Benchmark HttpClient, WsClient and Blockchain against a local FakeSteemd node.
+
+Usage: python scripts/bench_clients.py [--blocks 500] [--latency 0.01] [--db-lock 0.0]
+"""
+import argparse
+import logging
+import time
+
+from steep.blockchain import Blockchain
+from steep.consts import DATABASE_API
+from steep.steemd import Steemd
+from steepbase.fake_steemd import FakeSteemd
+from steepbase.http_client import HttpClient
+from steepbase.retry import RetryPolicy
+from steepbase.ws_client import WsClient
+
+
+def timed(label, blocks, fn):
+    started = time.monotonic()
+    fn()
+    elapsed = time.monotonic() - started
+    print('%-56s %7.2fs  %8.1f blocks/s' % (label, elapsed, blocks / elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--blocks', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.01, help='seconds added to every response')
+    parser.add_argument('--db-lock', type=float, default=0.0, help='probability of database lock errors')
+    args = parser.parse_args()
+
+    n = args.blocks
+    retry_policy = RetryPolicy(backoff=0.01, max_backoff=0.1)
+    node = FakeSteemd(latency=args.latency, head_block=n + 100, produce_blocks=False,
+                      errors={'db_lock': args.db_lock})
+    http_url, ws_url = node.serve_http(), node.serve_ws()
+    print('%d blocks, %.0fms latency, %.0f%% db lock errors' % (n, args.latency * 1000, args.db_lock * 100))
+
+    with node:
+        http = HttpClient([http_url], retry_policy=retry_policy, log_level=logging.ERROR)
+        timed('HttpClient.call get_block', n,
+              lambda: [http.call('get_block', i, api=DATABASE_API) for i in range(1, n + 1)])
+        timed('HttpClient.call_batch get_block', n,
+              lambda: http.call_batch([('get_block', [i], DATABASE_API) for i in range(1, n + 1)]))
+        timed('HttpClient.call_multi_with_futures', n,
+              lambda: list(http.call_multi_with_futures('get_block', list(range(1, n + 1)), api=DATABASE_API,
+                                                        max_workers=10)))
+
+        # WsClient hands RPC errors to the caller instead of retrying them
+        errors, node.errors = node.errors, {}
+
+        ws = WsClient([ws_url], retry_policy=retry_policy, log_level=logging.ERROR)
+        timed('WsClient.call get_block', n,
+              lambda: [ws.call('get_block', i, api=DATABASE_API) for i in range(1, n + 1)])
+        ws.close()
+
+        ws = WsClient([ws_url], multiplex=True, retry_policy=retry_policy,
+                      log_level=logging.ERROR)
+        timed('WsClient(multiplex) call_multi_with_futures', n,
+              lambda: list(ws.call_multi_with_futures('get_block', list(range(1, n + 1)), api=DATABASE_API,
+                                                      max_workers=10)))
+        ws.close()
+        node.errors = errors
+
+        steemd = Steemd(nodes=[http_url], retry_policy=retry_policy, log_level=logging.ERROR)
+        blockchain = Blockchain(steemd, mode='head')
+        timed('Blockchain.stream_from full blocks', n,
+              lambda: list(blockchain.stream_from(start_block=1, end_block=n, full_blocks=True)))
+        timed('Blockchain.stream_from operations', n,
+              lambda: list(blockchain.stream_from(start_block=1, end_block=n)))
+        timed('Blockchain.stream_from operations, prefetch', n,
+              lambda: list(blockchain.stream_from(start_block=1, end_block=n, prefetch=100, prefetch_workers=8)))
+
+        # one get_ops_in_block per request, like nodes which don't accept batches
+        steemd.client.non_batch_nodes.add(steemd.client.url)
+        timed('Blockchain.stream_from operations, no batches', n,
+              lambda: list(blockchain.stream_from(start_block=1, end_block=n)))
+        timed('Blockchain.stream_from operations, no batches, prefetch', n,
+              lambda: list(blockchain.stream_from(start_block=1, end_block=n, prefetch=100, prefetch_workers=8)))
+
+
+if __name__ == '__main__':
+    main()
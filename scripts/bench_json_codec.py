@@ -0,0 +1,44 @@
+""" Compare the JSON codecs available to the RPC clients on the block fixtures in ``tests/block_data``.
+
+Usage: python scripts/bench_json_codec.py [rounds]
+"""
+import os
+import sys
+import timeit
+
+from steepbase.json_codec import JsonCodec, available_codecs
+
+block_data = os.path.join(os.path.dirname(__file__), '..', 'tests', 'block_data')
+
+
+def load_fixtures():
+    """ Every fixture wrapped in a JSON-RPC response, as it would come off the wire. """
+    fixtures = []
+    for filename in sorted(os.listdir(block_data)):
+        with open(os.path.join(block_data, filename), 'rb') as f:
+            try:
+                result = JsonCodec.loads(f.read())
+            except ValueError:
+                # a few fixtures are not strict JSON
+                continue
+        fixtures.append(JsonCodec.dumps({'jsonrpc': '2.0', 'id': 0, 'result': result}))
+    return fixtures
+
+
+def bench(rounds):
+    fixtures = load_fixtures()
+    decoded = [JsonCodec.loads(data) for data in fixtures]
+    size = sum(map(len, fixtures))
+    print('%d responses, %d KiB, %d rounds' % (len(fixtures), size // 1024, rounds))
+
+    baseline = None
+    for name, codec in reversed(list(available_codecs.items())):
+        loads = timeit.timeit(lambda: [codec.loads(data) for data in fixtures], number=rounds)
+        dumps = timeit.timeit(lambda: [codec.dumps(obj) for obj in decoded], number=rounds)
+        baseline = baseline or loads + dumps
+        print('%-8s loads %7.1f MiB/s   dumps %7.1f MiB/s   %.1fx' % (
+            name, size * rounds / loads / 2 ** 20, size * rounds / dumps / 2 ** 20, baseline / (loads + dumps)))
+
+
+if __name__ == '__main__':
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,80 @@
+""" Compare the serialization of transfers through an object per field (as the operation classes
+used to) with the packing plans of steepbase.wire, for single operations and for signed transactions
+of several transfers. ``bytes(Operation(op))`` is what TransactionBuilder and Commit do: the checks of
+the operation classes, then the packing plan.
+
+Usage: python scripts/bench_serializer.py [--count 20000] [--ops-per-trx 50]
+"""
+import argparse
+import time
+
+import steep.consts  # noqa: F401
+from steepbase.operationids import operations
+from steepbase.operations import Operation, operation_layouts, wire_object
+from steepbase.transactions import SignedTransaction
+from steepbase.types import Id
+from steepbase.wire import CompiledOperation, encode_operation, encode_transaction
+
+signature = '20' + 'ab' * 64
+
+
+def transfers(count):
+    """ An airdrop: the same few amounts to many accounts. """
+    return [['transfer', {
+        'from': 'airdrop',
+        'to': 'user%d' % i,
+        'amount': '%d.000 STEEM' % (1 + i % 10),
+        'memo': 'thanks for being part of steem, #%d' % i,
+    }] for i in range(count)]
+
+
+def object_graph(op):
+    """ ``op`` serialized through the :mod:`steepbase.types` objects of its fields. """
+    name, data = op
+    return bytes(Id(operations[name])) + bytes(wire_object(operation_layouts[name], data))
+
+
+def timed(name, count, serialize, baseline=None):
+    start = time.perf_counter()
+    result = serialize()
+    elapsed = time.perf_counter() - start
+    print('%-36s %9.0f ops/s%s' % (
+        name, count / elapsed, '   %.1fx' % (baseline / elapsed) if baseline else ''))
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--count', type=int, default=20000, help='transfers to serialize')
+    parser.add_argument('--ops-per-trx', type=int, default=50, help='transfers per transaction')
+    args = parser.parse_args()
+
+    ops = transfers(args.count)
+    print('%d transfers' % args.count)
+    objects, baseline = timed('object per field', args.count, lambda: [object_graph(op) for op in ops])
+    checked, _ = timed('bytes(Operation(op))', args.count,
+                       lambda: [bytes(Operation(op)) for op in ops], baseline)
+    compiled, _ = timed('encode_operation(op)', args.count,
+                        lambda: [encode_operation(op) for op in ops], baseline)
+    wrapped, _ = timed('bytes(CompiledOperation(op))', args.count,
+                       lambda: [bytes(CompiledOperation(op)) for op in ops], baseline)
+    assert objects == checked == compiled == wrapped
+
+    trxs = [{
+        'ref_block_num': 34294,
+        'ref_block_prefix': 3707022213,
+        'expiration': '2016-04-06T08:29:27',
+        'operations': ops[i:i + args.ops_per_trx],
+        'extensions': [],
+        'signatures': [signature],
+    } for i in range(0, args.count, args.ops_per_trx)]
+    print('%d transactions of %d transfers' % (len(trxs), args.ops_per_trx))
+    objects, baseline = timed('bytes(SignedTransaction(**trx))', args.count,
+                              lambda: [bytes(SignedTransaction(**dict(trx))) for trx in trxs])
+    compiled, _ = timed('encode_transaction(trx)', args.count,
+                        lambda: [encode_transaction(trx) for trx in trxs], baseline)
+    assert objects == compiled
+
+
+if __name__ == '__main__':
+    main()
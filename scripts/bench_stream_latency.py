@@ -0,0 +1,67 @@
+""" Measure the block delivery latency of Blockchain.stream_from in head mode, against a local
+FakeSteemd producing blocks in real time, with adaptive polling and with a fixed sleep of one block interval.
+
+Usage: python scripts/bench_stream_latency.py [--blocks 20] [--block-interval 3] [--consumers 5]
+"""
+import argparse
+import random
+import threading
+import time
+
+from steep.blockchain import Blockchain
+from steep.steemd import Steemd
+from steepbase.fake_steemd import FakeSteemd
+from steepbase.instrumentation import Histogram
+
+
+class FixedIntervalBlockchain(Blockchain):
+    """ Polls like stream_from used to: one block interval after each round. """
+
+    def _next_poll_delay(self, head_time, block_interval, misses):
+        return block_interval
+
+
+def consume(blockchain_class, url, blocks, block_interval, latency, polls):
+    # start at a random point of the block interval, like a real consumer
+    time.sleep(random.uniform(0, block_interval))
+    blockchain = blockchain_class(Steemd(nodes=[url]), mode='head')
+    info = blockchain.info
+    blockchain.info = lambda: polls.append(1) or info()
+
+    stream = blockchain.stream_from(full_blocks=True, subscribe=False)
+    next(stream)
+    for _ in range(blocks):
+        next(stream)
+    stream.close()
+    for value in blockchain.delivery_latency.samples:
+        latency.observe(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--blocks', type=int, default=20)
+    parser.add_argument('--block-interval', type=float, default=3)
+    parser.add_argument('--consumers', type=int, default=5, help='concurrent streams of each kind')
+    args = parser.parse_args()
+
+    results = {label: (Histogram(), []) for label in ('adaptive', 'fixed')}
+    with FakeSteemd(head_block=1000, block_interval=args.block_interval, realtime=True) as node:
+        url = node.serve_http()
+        threads = []
+        for label, cls in (('adaptive', Blockchain), ('fixed', FixedIntervalBlockchain)):
+            for _ in range(args.consumers):
+                threads.append(threading.Thread(target=consume, args=(
+                    cls, url, args.blocks, args.block_interval) + results[label]))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    for label, (latency, polls) in results.items():
+        print('%-10s p50 %.3fs  p95 %.3fs  mean %.3fs  %.2f polls/block' % (
+            label, latency.quantile(0.5), latency.quantile(0.95), latency.sum / latency.count,
+            len(polls) / (args.blocks * args.consumers)))
+
+
+if __name__ == '__main__':
+    main()
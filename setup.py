@@ -58,6 +58,14 @@ TEST_REQUIRED = [
     'autopep8'
 ]
 
+ASYNC_REQUIRED = [
+    'aiohttp'
+]
+
+FAST_JSON_REQUIRED = [
+    'orjson'
+]
+
 BUILD_REQUIRED = [
     'twine',
     'pypandoc',
@@ -121,7 +129,9 @@ setup(
     extras_require={
         'dev': TEST_REQUIRED + BUILD_REQUIRED,
         'build': BUILD_REQUIRED,
-        'test': TEST_REQUIRED
+        'test': TEST_REQUIRED,
+        'async': ASYNC_REQUIRED,
+        'fast_json': FAST_JSON_REQUIRED
     },
     tests_require=TEST_REQUIRED,
     include_package_data=True,
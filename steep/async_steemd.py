@@ -0,0 +1,110 @@
+import asyncio
+from typing import List
+
+from funcy import first
+
+from steep.consts import DATABASE_API
+from steep.steemd import SteemdApi
+from steepbase.chains import known_chains
+from steepbase.connector import AsyncConnector
+
+
+class AsyncSteemd(SteemdApi, AsyncConnector):
+    """ Connect to the Steem network from ``asyncio`` code.
+
+        The RPC methods of :class:`Steemd` and its block and account helpers return coroutines,
+        so thousands of calls can be in flight on one event loop without threads.
+        Helpers streaming responses, filling the block store or building ``Post`` objects
+        are only on the blocking ``Steemd``.
+
+        Args:
+            nodes (list): A list of Steem HTTP RPC nodes to connect to. If not provided, official Steemit nodes will be used.
+
+        Example:
+
+           .. code-block:: python
+
+               async def main():
+                   async with AsyncSteemd() as s:
+                       props, block = await asyncio.gather(
+                           s.get_dynamic_global_properties(),
+                           s.get_block(1000),
+                       )
+
+       """
+
+    @property
+    def chain_params(self):
+        """ Identify the connected network. Must be awaited. """
+        return self._chain_params()
+
+    async def _chain_params(self):
+        props = await self.get_dynamic_global_properties()
+        chain = props["current_supply"].split(" ")[1]
+        assert chain in known_chains, "The chain you are connecting to is not supported"
+        return known_chains.get(chain)
+
+    @property
+    def last_irreversible_block_num(self):
+        """ Newest irreversible block number. Must be awaited. """
+        return self._get_dgp_key('last_irreversible_block_num')
+
+    @property
+    def head_block_number(self):
+        """ Newest block number. Must be awaited. """
+        return self._get_dgp_key('head_block_number')
+
+    async def _get_dgp_key(self, key):
+        return (await self.get_dynamic_global_properties())[key]
+
+    async def get_account(self, account):
+        """ Lookup account information such as user profile, public keys,
+        balances, etc.
+        """
+        return first(await self.call('get_accounts', [account], api=DATABASE_API))
+
+    async def get_all_usernames(self, last_user=''):
+        """ Fetch the full list of STEEM usernames. """
+        usernames = await self.lookup_accounts(last_user, 1000)
+        batch = []
+        while len(batch) != 1:
+            batch = await self.lookup_accounts(usernames[-1], 1000)
+            usernames += batch[1:]
+
+        return usernames
+
+    async def _get_blocks(self, blocks):
+        results = await self.call_batch([('get_block', [x], DATABASE_API) for x in blocks])
+        return [{**x, 'block_num': int(x['previous'][:8], base=16) + 1} for x in results if x]
+
+    async def get_blocks(self, block_nums: List[int]):
+        """ Fetch multiple blocks from steemd concurrently.
+
+        Returns:
+            list: An ensured and ordered list of all `get_block` results.
+        """
+        required = set(block_nums)
+        missing = required
+        blocks = {}
+
+        while missing:
+            for block in await self._get_blocks(missing):
+                blocks[block['block_num']] = block
+
+            missing = required - set(blocks.keys())
+
+        return [blocks[x] for x in block_nums]
+
+    async def get_blocks_range(self, start: int, end: int):
+        """ Fetch multiple blocks from steemd concurrently, given a range. """
+        return await self.get_blocks(list(range(start, end)))
+
+    async def get_accounts(self, account_names: list):
+        """ Lookup account information for multiple accounts at the time.
+
+        Long lists are split into chunks of ``accounts_per_call`` names, fetched concurrently.
+        """
+        chunks = [account_names[i:i + self.accounts_per_call]
+                  for i in range(0, len(account_names), self.accounts_per_call)] or [[]]
+        results = await asyncio.gather(*[self.call('get_accounts', names, api=DATABASE_API) for names in chunks])
+        return [account for accounts in results for account in accounts]
@@ -1,29 +1,150 @@
+import calendar
+import concurrent.futures
 import hashlib
 import json
 import logging
+import threading
 import time
 import warnings
+from collections import deque
 from typing import Union
 
+from funcy import chunks
+
 from steep.consts import DATABASE_API
 from steep.instance import shared_steemd_instance
 from steep.steemd import Steemd
 from steep.utils import parse_time
+from steepbase.block_log import BlockLog
+from steepbase.instrumentation import Histogram
+from steepbase.storage import Checkpoints
 
 logger = logging.getLogger(__name__)
 
 
+def _block_timestamp(block_time):
+    """ Unix time of a UTC block time string. """
+    return calendar.timegm(parse_time(block_time).timetuple())
+
+
+class _HeadSubscription(object):
+    """ Head block number, pushed by the node's block applied notifications. """
+
+    def __init__(self, steemd_instance, timeout=None):
+        self.steem = steemd_instance
+        self.head = None
+        self.head_time = None
+        self._changed = threading.Condition()
+        self.id = self.steem.set_block_applied_callback(self._on_block, timeout=timeout)
+
+    def _on_block(self, header):
+        # headers carry no number, but the previous block id starts with the previous block number
+        num = int(header['previous'][:8], 16) + 1
+        with self._changed:
+            if num > (self.head or 0):
+                self.head, self.head_time = num, header.get('timestamp')
+            self._changed.notify_all()
+
+    def wait(self, after, timeout):
+        """ Wait for a head above ``after``. Returns it, or ``None`` after ``timeout`` seconds. """
+        with self._changed:
+            if self._changed.wait_for(lambda: (self.head or 0) > after, timeout):
+                return self.head
+        return None
+
+    def close(self):
+        try:
+            self.steem.remove_block_applied_callback(self.id)
+        except Exception as e:
+            logger.debug('Failed to remove block applied callback: %s', e)
+
+
+class _Prefetch(object):
+    """ Fetches up to ``window`` blocks ahead on ``workers`` threads, yielding them in order. """
+
+    def __init__(self, steemd_instance, window, workers=None):
+        self.steem = steemd_instance
+        self.window = window
+        self.workers = workers or self.steem.client.executor_workers
+        self.executor = None
+        if workers:
+            self.executor = concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix='Blockchain-prefetch')
+
+    def fetch(self, block_nums, method, extra_args, batch_size):
+        # spread the window over the workers, in batches when the node supports them
+        size = 1
+        if self.steem.supports_batch:
+            size = max(1, min(batch_size, self.window // self.workers))
+
+        def fetch_chunk(nums):
+            if len(nums) > 1:
+                return self.steem.call_batch([(method, [num, *extra_args], DATABASE_API) for num in nums])
+            return [self.steem.call(method, nums[0], *extra_args, api=DATABASE_API)]
+
+        requests = self.steem.client.imap(fetch_chunk, chunks(size, block_nums),
+                                          window=max(1, self.window // size), executor=self.executor)
+        for results in requests:
+            yield from results
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+
+class _Checkpointer(object):
+    """ Tracks the last processed position of a stream, and saves it to ``store`` every ``every`` blocks. """
+
+    def __init__(self, store, name, every=1):
+        self.store = store
+        self.name = name
+        self.every = max(1, every)
+        self.position = self.saved = store.load(name)
+        self.blocks = 0
+
+    def resume(self, start_block):
+        """ Block to (re)start from, and the last processed op index in it (or ``None``). """
+        if self.position is None:
+            return start_block, None
+        block_num, op_index = self.position
+        if op_index is None:
+            return block_num + 1, None
+        return block_num, op_index
+
+    def processed(self, block_num, op_index=None):
+        self.position = (block_num, op_index)
+        if op_index is None:
+            self.blocks += 1
+            if self.blocks >= self.every:
+                self.flush()
+
+    def flush(self):
+        if self.position is not None and self.position != self.saved:
+            self.store.save(self.name, *self.position)
+            self.saved = self.position
+        self.blocks = 0
+
+
 class Blockchain(object):
     """ Access the blockchain and read data from it.
 
     Args:
         steemd_instance (Steemd): Steemd() instance to use when accessing a RPC
         mode (str): `irreversible` or `head`. `irreversible` is default.
+
+    Attributes:
+        delivery_latency (Histogram): In `head` mode, seconds from the production of each new head
+            block to the end of its fetch, while streaming (see :class:`steepbase.instrumentation.Histogram`).
     """
 
+    #: seconds after a block's due time before it is polled for, as it has to reach the node first
+    poll_margin = 0.2
+    #: first backoff when the next block is late, doubled on each miss up to the block interval
+    poll_backoff = 0.25
+
     def __init__(self, steemd_instance=None, mode="irreversible"):
         self.steem = steemd_instance or shared_steemd_instance()
         self.config = self.steem.get_config()
+        self.delivery_latency = Histogram()
 
         if mode == "irreversible":
             self.mode = 'last_irreversible_block_num'
@@ -52,6 +173,14 @@ class Blockchain(object):
                     end_block=None,
                     batch_operations=False,
                     full_blocks=False,
+                    batch_size=50,
+                    subscribe=False,
+                    prefetch=0,
+                    prefetch_workers=None,
+                    checkpoint=None,
+                    checkpoint_store=None,
+                    checkpoint_every=1,
+                    block_log=None,
                     **kwargs):
         """ This call yields raw blocks or operations depending on
         ``full_blocks`` param.
@@ -68,6 +197,30 @@ class Blockchain(object):
                 yield a list of all operations for each block.
             full_blocks (bool): (Defaults to False) Rather than yielding operations, return raw, unedited blocks as
                 provided by steemd. This mode will NOT include virtual operations.
+            batch_size (int): (Defaults to 50) When catching up, fetch up to this many blocks per
+                JSON-RPC batch request, if the node supports batches.
+            subscribe (bool): (Defaults to False) When streaming, wait for the node's block applied
+                notifications instead of polling every block interval. Requires a WebSocket node
+                supporting subscriptions; polling is used if subscribing fails or takes longer than
+                two block intervals. Notifications come on a connection of their own unless the
+                client is ``multiplex``.
+            prefetch (int): (Defaults to 0) When catching up, fetch up to this many blocks ahead
+                concurrently. Blocks are still yielded in order. Once caught up, blocks are
+                fetched one by one again.
+            prefetch_workers (int): Threads fetching ahead. Defaults to the threads of the client
+                (its ``max_workers``), which it shares with other concurrent calls.
+            checkpoint (str): Name under which the position of the stream is saved. A stream
+                with a saved position resumes right after the last block (or operation) it
+                processed, instead of at ``start_block``. An item counts as processed once the
+                next one is asked for, so the last item yielded before a crash is yielded again.
+            checkpoint_store: Where positions are saved, any object with the ``load`` and ``save``
+                methods of :class:`steepbase.storage.Checkpoints` (the default, SQLite).
+            checkpoint_every (int): (Defaults to 1) Save the position every this many processed
+                blocks, and when the stream is closed. Higher values trade the number of blocks
+                replayed after a crash for throughput.
+            block_log: A :class:`steepbase.block_log.BlockLog`, or the path of the ``block_log`` of a
+                local steemd. Blocks it holds are read from it instead of being fetched from the node.
+                It holds no virtual operations, so operations read from it don't include them.
         """
 
         _ = kwargs  # we need this
@@ -76,33 +229,233 @@ class Blockchain(object):
 
         is_reversed = end_block and start_block > end_block
 
+        checkpointer, skip_ops = None, None
+        if checkpoint:
+            if is_reversed:
+                raise ValueError('reversed streams cannot be checkpointed')
+            if checkpoint_store is None:
+                checkpoint_store = Checkpoints()
+            checkpointer = _Checkpointer(checkpoint_store, checkpoint, checkpoint_every)
+            start_block, op_index = checkpointer.resume(start_block)
+            if op_index is not None:
+                skip_ops = (start_block, op_index)
+
         if not start_block:
             start_block = self.get_current_block_num()
 
+        subscription = None
+        if subscribe and end_block is None:
+            subscription = self._subscribe(timeout=block_interval * 2)
+
+        pipeline = None
+        if prefetch:
+            pipeline = _Prefetch(self.steem, prefetch, prefetch_workers)
+
+        own_block_log = isinstance(block_log, str)
+        if own_block_log:
+            block_log = BlockLog(block_log)
+
+        try:
+            yield from self._stream_blocks(start_block, end_block, is_reversed, batch_operations, full_blocks,
+                                           batch_size, block_interval, subscription, pipeline, checkpointer,
+                                           skip_ops, block_log)
+        finally:
+            if own_block_log:
+                block_log.close()
+            if checkpointer is not None:
+                checkpointer.flush()
+            if subscription is not None:
+                subscription.close()
+            if pipeline is not None:
+                pipeline.close()
+
+    def _subscribe(self, timeout):
+        try:
+            return _HeadSubscription(self.steem, timeout=timeout)
+        except Exception as e:
+            logger.info('Block subscriptions unavailable, polling instead - %s: %s', e.__class__.__name__, e)
+            return None
+
+    def _next_poll_delay(self, head_time, block_interval, misses):
+        """ Seconds until the next block should be there: one block interval after the head block,
+        or a doubling backoff once it is late. """
+        if misses == 0 and head_time:
+            due = _block_timestamp(head_time) + block_interval + self.poll_margin - time.time()
+            if due > 0:
+                return min(due, block_interval)
+        return min(self.poll_backoff * 2 ** max(misses - 1, 0), block_interval)
+
+    def _stream_blocks(self, start_block, end_block, is_reversed, batch_operations, full_blocks, batch_size,
+                       block_interval, subscription, pipeline=None, checkpointer=None, skip_ops=None,
+                       block_log=None):
+        head_block = head_time = None
+        notified = polled = misses = 0
+        streaming = False
         while True:
-            head_block = self.get_current_block_num()
+            if head_block is None:
+                props = self.info()
+                head_block, head_time = props.get(self.mode), props.get('time')
+                misses = misses + 1 if head_block <= polled else 0
+                polled = head_block
+
+            if is_reversed:
+                block_nums = range(start_block, end_block - 1, -1)
+            elif end_block is not None:
+                block_nums = range(start_block, min(head_block, end_block) + 1)
+            else:
+                block_nums = range(start_block, head_block + 1)
+
+            measure = streaming and head_time and self.mode == 'head_block_number'
+            blocks_data = self._get_block_data(block_nums, full_blocks, batch_size, pipeline, block_log)
+            for block_num, block_data in zip(block_nums, blocks_data):
+                if measure and block_num == head_block:
+                    self.delivery_latency.observe(time.time() - _block_timestamp(head_time))
+                if full_blocks or batch_operations:
+                    yield block_data
+                elif checkpointer is None:
+                    yield from block_data
+                else:
+                    skip = skip_ops[1] if skip_ops and skip_ops[0] == block_num else -1
+                    for op_index, op in enumerate(block_data):
+                        if op_index > skip:
+                            yield op
+                            checkpointer.processed(block_num, op_index)
+                if checkpointer is not None:
+                    checkpointer.processed(block_num)
+
+            if is_reversed or (end_block is not None and head_block >= end_block):
+                return
 
-            range_params = (start_block, head_block + 1)
-            if end_block is not None and start_block > end_block:
-                range_params = (start_block, max(0, end_block - 2), -1)
+            # next round
+            streaming = True
+            start_block = max(start_block, head_block + 1)
+            if subscription is None:
+                time.sleep(self._next_poll_delay(head_time, block_interval, misses))
+                head_block = None
+                continue
+
+            # a missed notification only delays the next round by a couple of block intervals
+            head_block = subscription.wait(max(head_block, notified), timeout=block_interval * 2)
+            head_time = subscription.head_time
+            notified = head_block or notified
+            if self.mode != 'head_block_number':
+                # notifications only tell the head block, ask for the last irreversible one
+                head_block = None
+
+    def _get_block_data(self, block_nums, full_blocks, batch_size, pipeline=None, block_log=None):
+        """ Yield blocks (or lists of operations) for ``block_nums``, in order.
+
+        Blocks in the ``block_log`` are read from it. Others are fetched with JSON-RPC batches
+        when the node supports them, and ahead concurrently with a ``pipeline``.
+        """
+        if block_log is not None:
+            read = block_log.get_block if full_blocks else block_log.get_ops
+            for in_log, nums in self._split_range(block_nums, block_log.head_block_num):
+                if in_log:
+                    yield from map(read, nums)
+                else:
+                    yield from self._get_block_data(nums, full_blocks, batch_size, pipeline)
+            return
+
+        if full_blocks:
+            method, extra_args = 'get_block', []
+        else:
+            method, extra_args = 'get_ops_in_block', [False]
 
-            for block_num in range(*range_params):
-                if end_block is not None:
-                    if is_reversed and block_num < end_block:
-                        raise StopIteration("Reached stop block at: #%s" % block_num)
-                    elif not is_reversed and block_num > end_block:
-                        raise StopIteration("Reached stop block at: #%s" % block_num)
+        if pipeline is not None and len(block_nums) > 1:
+            yield from pipeline.fetch(block_nums, method, extra_args, batch_size)
+            return
 
+        if len(block_nums) > 1 and self.steem.supports_batch:
+            for i in range(0, len(block_nums), batch_size):
+                calls = [(method, [num, *extra_args], DATABASE_API) for num in block_nums[i:i + batch_size]]
+                yield from self.steem.call_batch(calls)
+        else:
+            for block_num in block_nums:
                 if full_blocks:
                     yield self.steem.get_block(block_num)
-                elif batch_operations:
-                    yield self.steem.get_ops_in_block(block_num, False)
                 else:
-                    yield from self.steem.get_ops_in_block(block_num, False)
+                    yield self.steem.get_ops_in_block(block_num, False)
 
-            # next round
-            start_block = head_block + 1
-            time.sleep(block_interval)
+    @staticmethod
+    def _split_range(block_nums, last):
+        """ Split ``block_nums`` into the numbers up to ``last`` and the ones after it, keeping
+        their order. Returns ``(up to last, range)`` pairs. """
+        start, stop, step = block_nums.start, block_nums.stop, block_nums.step
+        if step > 0:
+            return [(True, range(start, min(stop, last + 1))), (False, range(max(start, last + 1), stop))]
+        return [(False, range(start, max(stop, last), -1)), (True, range(min(start, last), stop, -1))]
+
+    def stream_head(self, start_block=None, buffer_size=64, subscribe=False):
+        """ Yield head blocks as they are produced, and undo the ones orphaned by forks.
+
+        Unlike ``stream_from`` in `head` mode, each block is checked to link up (by ``previous``)
+        with the block yielded before it, using a ring buffer of the ``buffer_size`` most recent
+        block ids. When a block doesn't, its predecessors are rolled back until the branches meet,
+        then the canonical branch is streamed from there. Events are ``(kind, data)`` tuples:
+
+        - ``('apply', block)``: a new block, with an added ``block_num``.
+        - ``('rollback', {'block_num': ..., 'block_id': ...})``: a block previously applied
+          was orphaned. Rollbacks come newest first, before the blocks replacing them.
+
+        .. code-block:: python
+
+           for event, data in Blockchain(mode='head').stream_head():
+               if event == 'apply':
+                   index(data)
+               else:
+                   unindex(data['block_num'], data['block_id'])
+
+        Args:
+            start_block (int): Block to start with. If not provided, current (head) block is used.
+            buffer_size (int): Number of recent block ids kept. Forks deeper than that can't be
+                rolled back; ``buffer_size`` should exceed the distance to the last irreversible block.
+            subscribe (bool): Wait for block applied notifications rather than polling, see ``stream_from``.
+        """
+        block_interval = self.config.get("STEEM_BLOCK_INTERVAL") or 3
+        recent = deque(maxlen=buffer_size)
+        subscription = self._subscribe(timeout=block_interval * 2) if subscribe else None
+        try:
+            props = self.steem.get_dynamic_global_properties()
+            head_block, head_time = props['head_block_number'], props.get('time')
+            block_num = start_block or head_block
+            misses = 0
+            while True:
+                while block_num <= head_block:
+                    block = self.steem.get_block(block_num)
+                    if block is None:
+                        break
+
+                    # the node switched branches: roll back to where they meet. A replacement
+                    # block the node doesn't have yet is fetched again on the next poll.
+                    while recent and block is not None and block['previous'] != recent[-1][1]:
+                        orphan_num, orphan_id = recent.pop()
+                        logger.info('Fork: rolling back block %d (%s)', orphan_num, orphan_id)
+                        yield 'rollback', {'block_num': orphan_num, 'block_id': orphan_id}
+                        block_num = orphan_num
+                        block = self.steem.get_block(block_num)
+                        if not recent:
+                            logger.warning('Fork deeper than %d blocks, applying block %d unchecked',
+                                           buffer_size, block_num)
+                    if block is None:
+                        break
+
+                    recent.append((block_num, block['block_id']))
+                    yield 'apply', {**block, 'block_num': block_num}
+                    block_num += 1
+
+                if subscription is not None and subscription.wait(block_num - 1, timeout=block_interval * 2):
+                    head_block = subscription.head
+                    continue
+
+                if subscription is None:
+                    time.sleep(self._next_poll_delay(head_time, block_interval, misses))
+                props = self.steem.get_dynamic_global_properties()
+                misses = misses + 1 if props['head_block_number'] <= head_block else 0
+                head_block, head_time = props['head_block_number'], props.get('time')
+        finally:
+            if subscription is not None:
+                subscription.close()
 
     def reliable_stream(self,
                         start_block=None,
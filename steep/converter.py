@@ -22,9 +22,8 @@ class Converter(object):
         """ Obtain the sbd price as derived from the median over all
             witness feeds. Return value will be SBD
         """
-        return (Amount(self.steemd.get_feed_history()['current_median_history']
-                       ['base']).amount / Amount(self.steemd.get_feed_history(
-        )['current_median_history']['quote']).amount)
+        median = self.steemd.get_feed_history()['current_median_history']
+        return Amount(median['base']).amount / Amount(median['quote']).amount
 
     def steem_per_mvests(self):
         """ Obtain STEEM/MVESTS ratio
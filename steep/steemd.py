@@ -1,8 +1,9 @@
 # coding=utf-8
 import logging
+from itertools import tee
 from typing import List, Any, Union, Set
 
-from funcy import first
+from funcy import first, chunks
 
 from steep.block import Block
 from steep.consts import *
@@ -22,211 +23,21 @@ def get_config_node_list():
         return nodes.split(',')
 
 
-class Steemd(Connector):
-    """ Connect to the Steem network.
-
-        Args:
-            nodes (list): A list of Steem HTTP RPC nodes to connect to. If not provided, official Steemit nodes will be used.
-
-        Returns:
-            Steemd class instance. It can be used to execute commands against steem node.
-
-        Example:
-
-           If you would like to override the official Steemit nodes (default), you can pass your own.
-           When currently used node goes offline, ``Steemd`` will automatically fail-over to the next available node.
-
-           .. code-block:: python
+class SteemdApi(object):
+    """ The steemd RPC methods which are a single ``call``, shared by :class:`Steemd` and
+        :class:`steep.async_steemd.AsyncSteemd`. With the latter, they return coroutines.
 
-               nodes = [
-                   'https://steemd.yournode1.com',
-                   'https://steemd.yournode2.com',
-               ]
+        It goes before the connector in the bases, and picks the default nodes.
+    """
 
-               s = Steemd(nodes)
-
-       """
+    #: max number of names sent in a single ``get_accounts`` call
+    accounts_per_call = 100
 
     def __init__(self, nodes=None, **kwargs):
         if not nodes:
             nodes = get_config_node_list() or ['https://api.steemit.com']
 
-        super(Steemd, self).__init__(nodes, **kwargs)
-
-    @property
-    def chain_params(self):
-        """ Identify the connected network. This call returns a
-            dictionary with keys chain_id, prefix, and other chain
-            specific settings
-        """
-        props = self.get_dynamic_global_properties()
-        chain = props["current_supply"].split(" ")[1]
-        assert chain in known_chains, "The chain you are connecting to is not supported"
-        return known_chains.get(chain)
-
-    def get_replies(self, author, skip_own=True):
-        """ Get replies for an author
-
-            :param str author: Show replies for this author
-            :param bool skip_own: Do not show my own replies
-        """
-        from steep.post import Post
-
-        state = self.get_state("/@%s/recent-replies" % author)
-        replies = state["accounts"][author].get("recent_replies", [])
-        discussions = []
-        for reply in replies:
-            post = state["content"][reply]
-            if skip_own and post["author"] == author:
-                continue
-            discussions.append(Post(post, steemd_instance=self))
-        return discussions
-
-    def get_promoted(self):
-        """ Get promoted posts
-        """
-        from steep.post import Post
-
-        state = self.get_state("/promoted")
-        # why is there a empty key in the struct?
-        promoted = state["discussion_idx"][''].get("promoted", [])
-        r = []
-        for p in promoted:
-            post = state["content"].get(p)
-            r.append(Post(post, steemd_instance=self))
-        return r
-
-    def get_posts(self, limit=10, sort="hot", category=None, start=None):
-        """ Get multiple posts in an array.
-
-            :param int limit: Limit the list of posts by ``limit``
-            :param str sort: Sort the list by "recent" or "payout"
-            :param str category: Only show posts in this category
-            :param str start: Show posts after this post. Takes an
-                              identifier of the form ``@author/permlink``
-        """
-        from steep.post import Post
-
-        discussion_query = {
-            "tag": category,
-            "limit": limit,
-        }
-        if start:
-            author, permlink = resolve_identifier(start)
-            discussion_query["start_author"] = author
-            discussion_query["start_permlink"] = permlink
-
-        if sort not in [
-            "trending", "created", "active", "cashout", "payout", "votes",
-            "children", "hot"
-        ]:
-            raise Exception("Invalid choice of '--sort'!")
-
-        func = getattr(self, "get_discussions_by_%s" % sort)
-        r = []
-        for p in func(discussion_query):
-            r.append(Post(p, steemd_instance=self))
-        return r
-
-    def stream_comments(self, *args, **kwargs):
-        """ Generator that yields posts when they come in
-
-            To be used in a for loop that returns an instance of `Post()`.
-        """
-        from steep.blockchain import Blockchain
-        from steep.post import Post
-
-        for c in Blockchain(
-                mode=kwargs.get("mode", "irreversible"),
-                steemd_instance=self,
-        ).stream("comment", *args, **kwargs):
-            yield Post(c, steemd_instance=self)
-
-    @property
-    def last_irreversible_block_num(self):
-        """ Newest irreversible block number. """
-        return self.get_dynamic_global_properties()['last_irreversible_block_num']
-
-    @property
-    def head_block_number(self):
-        """ Newest block number. """
-        return self.get_dynamic_global_properties()['head_block_number']
-
-    def get_account(self, account):
-        """ Lookup account information such as user profile, public keys,
-        balances, etc.
-
-        Args:
-            account (str): STEEM username that we are looking up.
-
-        Returns:
-            dict: Account information.
-
-        """
-        return first(self.call('get_accounts', [account], api=DATABASE_API))
-
-    def get_all_usernames(self, last_user=''):
-        """ Fetch the full list of STEEM usernames. """
-        usernames = self.lookup_accounts(last_user, 1000)
-        batch = []
-        while len(batch) != 1:
-            batch = self.lookup_accounts(usernames[-1], 1000)
-            usernames += batch[1:]
-
-        return usernames
-
-    def _get_blocks(self, blocks: Union[List[int], Set[int]]):
-        """ Fetch multiple blocks from steemd at once.
-
-        Warning: This method does not ensure that all blocks are returned,
-        or that the results are ordered.  You will probably want to use
-        `steemd.get_blocks()` instead.
-
-        Args:
-            blocks (list): A list, or a set of block numbers.
-
-        Returns:
-            A generator with results.
-
-        """
-        results = self.call_multi_with_futures('get_block', blocks, api=DATABASE_API, max_workers=10)
-        return ({**x, 'block_num': int(x['previous'][:8], base=16) + 1} for x in results if x)
-
-    def get_blocks(self, block_nums: List[int]):
-        """ Fetch multiple blocks from steemd at once, given a range.
-
-        Args:
-            block_nums (list): A list of all block numbers we would like to tech.
-
-        Returns:
-            dict: An ensured and ordered list of all `get_block` results.
-        """
-        required = set(block_nums)
-        available = set()
-        missing = required - available
-        blocks = {}
-
-        while missing:
-            for block in self._get_blocks(missing):
-                blocks[block['block_num']] = block
-
-            available = set(blocks.keys())
-            missing = required - available
-
-        return [blocks[x] for x in block_nums]
-
-    def get_blocks_range(self, start: int, end: int):
-        """ Fetch multiple blocks from steemd at once, given a range.
-
-        Args:
-            start (int): The number of the block to start with
-            end (int): The number of the block at the end of the range. Not included in results.
-
-        Returns:
-            dict: An ensured and ordered list of all `get_block` results.
-
-        """
-        return self.get_blocks(list(range(start, end)))
+        super(SteemdApi, self).__init__(nodes, **kwargs)
 
     def get_reward_fund(self, fund_name='post'):
         """ Get details for a reward fund.
@@ -456,13 +267,6 @@ class Steemd(Connector):
         """ get_next_scheduled_hardfork """
         return self.call('get_next_scheduled_hardfork', api=DATABASE_API)
 
-    def get_accounts(self, account_names: list):
-        """ Lookup account information such as user profile, public keys, balances, etc.
-
-        This method is same as ``get_account``, but supports querying for multiple accounts at the time.
-        """
-        return self.call('get_accounts', account_names, api=DATABASE_API)
-
     def get_account_references(self, account_id: int):
         """ get_account_references """
         return self.call('get_account_references', account_id, api=DATABASE_API)
@@ -935,6 +739,293 @@ class Steemd(Connector):
         return self.call('get_key_references', public_keys, api=ACCOUNT_BY_KEY_API)
 
 
+class Steemd(SteemdApi, Connector):
+    """ Connect to the Steem network.
+
+        Args:
+            nodes (list): A list of Steem HTTP RPC nodes to connect to. If not provided, official Steemit nodes will be used.
+
+        Returns:
+            Steemd class instance. It can be used to execute commands against steem node.
+
+        Example:
+
+           If you would like to override the official Steemit nodes (default), you can pass your own.
+           When currently used node goes offline, ``Steemd`` will automatically fail-over to the next available node.
+
+           .. code-block:: python
+
+               nodes = [
+                   'https://steemd.yournode1.com',
+                   'https://steemd.yournode2.com',
+               ]
+
+               s = Steemd(nodes)
+
+       """
+
+    @property
+    def chain_params(self):
+        """ Identify the connected network. This call returns a
+            dictionary with keys chain_id, prefix, and other chain
+            specific settings
+        """
+        props = self.get_dynamic_global_properties()
+        chain = props["current_supply"].split(" ")[1]
+        assert chain in known_chains, "The chain you are connecting to is not supported"
+        return known_chains.get(chain)
+
+    def get_replies(self, author, skip_own=True):
+        """ Get replies for an author
+
+            :param str author: Show replies for this author
+            :param bool skip_own: Do not show my own replies
+        """
+        from steep.post import Post
+
+        state = self.get_state("/@%s/recent-replies" % author)
+        replies = state["accounts"][author].get("recent_replies", [])
+        discussions = []
+        for reply in replies:
+            post = state["content"][reply]
+            if skip_own and post["author"] == author:
+                continue
+            discussions.append(Post(post, steemd_instance=self))
+        return discussions
+
+    def get_promoted(self):
+        """ Get promoted posts
+        """
+        from steep.post import Post
+
+        state = self.get_state("/promoted")
+        # why is there a empty key in the struct?
+        promoted = state["discussion_idx"][''].get("promoted", [])
+        r = []
+        for p in promoted:
+            post = state["content"].get(p)
+            r.append(Post(post, steemd_instance=self))
+        return r
+
+    def get_posts(self, limit=10, sort="hot", category=None, start=None):
+        """ Get multiple posts in an array.
+
+            :param int limit: Limit the list of posts by ``limit``
+            :param str sort: Sort the list by "recent" or "payout"
+            :param str category: Only show posts in this category
+            :param str start: Show posts after this post. Takes an
+                              identifier of the form ``@author/permlink``
+        """
+        from steep.post import Post
+
+        discussion_query = {
+            "tag": category,
+            "limit": limit,
+        }
+        if start:
+            author, permlink = resolve_identifier(start)
+            discussion_query["start_author"] = author
+            discussion_query["start_permlink"] = permlink
+
+        if sort not in [
+            "trending", "created", "active", "cashout", "payout", "votes",
+            "children", "hot"
+        ]:
+            raise Exception("Invalid choice of '--sort'!")
+
+        func = getattr(self, "get_discussions_by_%s" % sort)
+        r = []
+        for p in func(discussion_query):
+            r.append(Post(p, steemd_instance=self))
+        return r
+
+    def stream_comments(self, *args, **kwargs):
+        """ Generator that yields posts when they come in
+
+            To be used in a for loop that returns an instance of `Post()`.
+        """
+        from steep.blockchain import Blockchain
+        from steep.post import Post
+
+        for c in Blockchain(
+                mode=kwargs.get("mode", "irreversible"),
+                steemd_instance=self,
+        ).stream("comment", *args, **kwargs):
+            yield Post(c, steemd_instance=self)
+
+    @property
+    def last_irreversible_block_num(self):
+        """ Newest irreversible block number. """
+        return self.get_dynamic_global_properties()['last_irreversible_block_num']
+
+    @property
+    def head_block_number(self):
+        """ Newest block number. """
+        return self.get_dynamic_global_properties()['head_block_number']
+
+    def get_account(self, account):
+        """ Lookup account information such as user profile, public keys,
+        balances, etc.
+
+        Args:
+            account (str): STEEM username that we are looking up.
+
+        Returns:
+            dict: Account information.
+
+        """
+        return first(self.call('get_accounts', [account], api=DATABASE_API))
+
+    def get_all_usernames(self, last_user=''):
+        """ Fetch the full list of STEEM usernames. """
+        usernames = self.lookup_accounts(last_user, 1000)
+        batch = []
+        while len(batch) != 1:
+            batch = self.lookup_accounts(usernames[-1], 1000)
+            usernames += batch[1:]
+
+        return usernames
+
+    def _get_blocks(self, blocks: Union[List[int], Set[int]]):
+        """ Fetch multiple blocks from steemd at once.
+
+        Warning: This method does not ensure that all blocks are returned,
+        or that the results are ordered.  You will probably want to use
+        `steemd.get_blocks()` instead.
+
+        Args:
+            blocks (list): A list, or a set of block numbers.
+
+        Returns:
+            A generator with results.
+
+        """
+        if self.supports_batch:
+            results = self.call_batch([('get_block', [x], DATABASE_API) for x in blocks])
+        else:
+            results = self.call_multi_with_futures('get_block', blocks, api=DATABASE_API, max_workers=10)
+        return ({**x, 'block_num': int(x['previous'][:8], base=16) + 1} for x in results if x)
+
+    def get_blocks(self, block_nums: List[int]):
+        """ Fetch multiple blocks from steemd at once, given a range.
+
+        Args:
+            block_nums (list): A list of all block numbers we would like to tech.
+
+        Returns:
+            dict: An ensured and ordered list of all `get_block` results.
+        """
+        return list(self.iter_blocks(block_nums))
+
+    def iter_blocks(self, block_nums, window=None):
+        """ Fetch blocks concurrently, yielding them in the order of ``block_nums`` as they arrive.
+
+        Only ``window`` requests (batches, if the node supports them) are in flight at once,
+        so memory use doesn't grow with the number of blocks. Blocks missing from a response
+        are fetched again.
+
+        Args:
+            block_nums (iterable): Block numbers, ie. a ``range`` of any length.
+            window (int): Max number of requests in flight.
+
+        Returns:
+            generator: ``get_block`` results, with an added ``block_num``.
+        """
+        if self.supports_batch:
+            batch_size = getattr(self.client, 'batch_size', 50)
+            batches = self.client.imap(
+                lambda nums: zip(nums, self.call_batch([('get_block', [x], DATABASE_API) for x in nums])),
+                chunks(batch_size, block_nums), window)
+            results = (result for batch in batches for result in batch)
+        else:
+            block_nums, nums = tee(block_nums)
+            results = zip(nums, self.map_ordered('get_block', block_nums, api=DATABASE_API, window=window))
+
+        for num, block in results:
+            while not block:
+                block = self.get_block(num)
+            yield {**block, 'block_num': num}
+
+    def backfill_block_store(self, start_block=1, end_block=None, operations=False, window=None):
+        """ Download irreversible blocks into `block_store` in bulk, skipping the ones already there.
+
+        Args:
+            start_block (int): First block to store.
+            end_block (int): Last block to store, capped at (and defaulting to) the last irreversible block.
+            operations (bool): Also store the ``get_ops_in_block`` results (virtual operations included).
+            window (int): Max number of requests in flight, see `iter_blocks`.
+
+        Returns:
+            int: Number of blocks newly stored.
+        """
+        if self.block_store is None:
+            raise ValueError('backfill_block_store() requires a Steemd(block_store=...)')
+
+        # teaches the store the last irreversible block
+        lib = self.get_dynamic_global_properties()['last_irreversible_block_num']
+        end_block = min(end_block or lib, lib)
+
+        stored = 0
+        missing = (num for num in range(start_block, end_block + 1) if ('blocks', num) not in self.block_store)
+        for block in self.iter_blocks(missing, window):
+            num = block.pop('block_num')
+            self.block_store.put('get_block', [num], block)
+            stored += 1
+            if stored % 10000 == 0:
+                logger.info('Stored %d blocks, up to block %d', stored, num)
+
+        if operations:
+            missing, nums = tee(num for num in range(start_block, end_block + 1) if ('ops', num) not in self.block_store)
+            ops = self.map_ordered('get_ops_in_block', ([num, False] for num in missing), api=DATABASE_API,
+                                   window=window)
+            for num, result in zip(nums, ops):
+                self.block_store.put('get_ops_in_block', [num, False], result)
+
+        return stored
+
+    def get_blocks_range(self, start: int, end: int):
+        """ Fetch multiple blocks from steemd at once, given a range.
+
+        Args:
+            start (int): The number of the block to start with
+            end (int): The number of the block at the end of the range. Not included in results.
+
+        Returns:
+            dict: An ensured and ordered list of all `get_block` results.
+
+        """
+        return self.get_blocks(list(range(start, end)))
+
+    def stream_block_transactions(self, block_num):
+        """ Yield the transactions of a block one by one, parsing the response as it arrives.
+
+        Unlike ``get_block(block_num)['transactions']``, this never holds the whole block in memory.
+        Yields nothing if the block doesn't exist (yet).
+        """
+        return self.call_streaming('get_block', block_num, path='result.transactions', api=DATABASE_API)
+
+    def get_accounts(self, account_names: list):
+        """ Lookup account information such as user profile, public keys, balances, etc.
+
+        This method is same as ``get_account``, but supports querying for multiple accounts at the time.
+        Long lists are split into chunks of ``accounts_per_call`` names, sent as one batch when the
+        node supports it.
+        """
+        if len(account_names) <= self.accounts_per_call or not self.supports_batch:
+            return self.call('get_accounts', account_names, api=DATABASE_API)
+
+        calls = [('get_accounts', [names], DATABASE_API)
+                 for names in chunks(self.accounts_per_call, account_names)]
+        return [account for accounts in self.call_batch(calls) for account in accounts]
+
+    def stream_account_history(self, account: str, index_from: int = -1, limit: int = 1000):
+        """ Like `get_account_history`, but yields the ``[index, operation]`` items one by one,
+        parsing the response as it arrives, so that large ``limit`` values don't need the whole
+        response in memory.
+        """
+        return self.call_streaming('get_account_history', account, index_from, limit, api=DATABASE_API)
+
+
 if __name__ == '__main__':
     s = Steemd()
     print(s.get_account_count())
@@ -82,7 +82,7 @@ class TransactionBuilder(dict):
 
     def constructTx(self):
         if isinstance(self.op, list):
-            ops = [Operation(o) for o in self.op]
+            ops = [o if isinstance(o, Operation) else Operation(o) for o in self.op]
         else:
             ops = [Operation(self.op)]
         expiration = fmt_time_from_now(self.expiration)
@@ -0,0 +1,224 @@
+import asyncio
+import json
+import logging
+import time
+from urllib.parse import urlparse
+
+from steep.consts import CONDENSER_API
+from steepbase.base_client import BaseClient
+from steepbase.exceptions import RPCErrorRecoverable
+from steepbase.http_client import HttpClient
+from steepbase.instrumentation import CallRecord
+from steepbase.json_codec import get_codec
+from steepbase.node_pool import NodePool
+from steepbase.retry import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+    logger.debug("To use AsyncHttpClient install \n"
+                 "    pip install aiohttp")
+
+
+class AsyncHttpClient(BaseClient):
+    """ Steem JSON-HTTP-RPC API for asyncio
+
+    This is the ``asyncio`` counterpart of :class:`HttpClient`, built on ``aiohttp``.
+    Calls are coroutines, so any number of them can be in flight on one event loop.
+    Node fail-over, appbase downgrade and error classification work like in ``HttpClient.call``.
+
+    Args:
+      nodes (list): A list of Steem HTTP RPC nodes to connect to.
+
+    .. code-block:: python
+
+       from steepbase.async_http_client import AsyncHttpClient
+
+       async def main():
+           async with AsyncHttpClient(['https://api.steemit.com']) as rpc:
+               blocks = await asyncio.gather(*[
+                   rpc.call('get_block', num, api='database_api') for num in range(1, 1001)
+               ])
+
+    """
+
+    def __init__(self, nodes, **kwargs):
+        super().__init__()
+
+        if aiohttp is None:
+            raise ImportError('AsyncHttpClient requires aiohttp: pip install aiohttp')
+
+        self.return_with_args = kwargs.get('return_with_args', False)
+        self.re_raise = kwargs.get('re_raise', True)
+        self.codec = get_codec(kwargs.get('json_codec'))
+
+        self.maxsize = kwargs.get('maxsize', 100)
+        self.timeout = kwargs.get('timeout', 60)
+        self.session = None
+
+        self.node_pool = NodePool(
+            nodes,
+            policy=kwargs.get('node_policy', 'latency'),
+            cooldown=kwargs.get('node_cooldown', 30),
+            failure_threshold=kwargs.get('breaker_threshold', 1))
+        self.retry_policy = kwargs.get('retry_policy', None) or RetryPolicy()
+        self.url = ''
+        self.next_node()
+
+        log_level = kwargs.get('log_level', logging.INFO)
+        logger.setLevel(log_level)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """ Close the underlying ``aiohttp`` session and its connections. """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _get_session(self):
+        # aiohttp sessions belong to the running loop, so we can't create one in __init__
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.maxsize),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={'Content-Type': 'application/json'})
+        return self.session
+
+    @staticmethod
+    def _node_downgraded(url):
+        return url in HttpClient.non_appbase_nodes
+
+    @staticmethod
+    def _downgrade_node(url):
+        HttpClient.non_appbase_nodes.add(url)
+
+    def next_node(self):
+        """ Switch to the next available node. """
+        self.set_node(self.node_pool.select(exclude=self.url))
+
+    def set_node(self, node_url):
+        """ Change current node to provided node URL. """
+        self.url = node_url
+
+    async def _post(self, url, body):
+        async with self._get_session().post(url, data=body) as response:
+            if response.status not in {301, 302, 303, 307, 308, 200}:
+                raise RPCErrorRecoverable('non-200 response: %s from %s' % (response.status, urlparse(url).hostname))
+            return await response.read()
+
+    async def call(self, name, *args, **kwargs):
+        """ Call a remote procedure in steemd.
+
+        Warnings:
+            This command will auto-retry in case of node failure, as well as handle
+            node fail-over, unless we are broadcasting a transaction.
+            In latter case, the exception is **re-raised**.
+        """
+        if not self.hooks:
+            return await self._call(name, args, kwargs)
+
+        record = CallRecord(name, kwargs.get('api'))
+        started = time.monotonic()
+        try:
+            result = await self._call(name, args, kwargs, record=record)
+            record.outcome = 'ok'
+            return result
+        except BaseException as e:
+            record.outcome = e.__class__.__name__
+            raise
+        finally:
+            record.latency = time.monotonic() - started
+            self._emit(record)
+
+    async def _call(self, name, args, kwargs, record=None):
+        retry_exceptions = (
+            aiohttp.ClientError,
+            asyncio.TimeoutError,
+            RPCErrorRecoverable,
+            json.decoder.JSONDecodeError,
+        )
+
+        retry = self.retry_policy.begin()
+        while True:
+            url = self.url = self.node_pool.route(self.url)
+            started = time.monotonic()
+            try:
+                body_kwargs = kwargs.copy()
+                if not self._node_downgraded(url):
+                    body_kwargs['api'] = CONDENSER_API
+
+                body = AsyncHttpClient.json_rpc_body(name, *args, codec=self.codec, **body_kwargs)
+                data = await self._post(url, body)
+                if record is not None:
+                    record.node, record.retries = url, retry.attempts
+                    record.request_bytes, record.response_bytes = len(body), len(data)
+
+                result = self.codec.loads(data)
+                assert result, 'result entirely blank'
+
+                if 'error' in result:
+                    # legacy (pre-appbase) nodes always return err code 1
+                    legacy = result['error']['code'] == 1
+                    if legacy and not self._node_downgraded(url):
+                        self._downgrade_node(url)
+                        logging.error('Downgrade-retry %s', urlparse(url).hostname)
+                        continue
+
+                    error = self._classify_error(name, result['error'])
+                    if not isinstance(error, RPCErrorRecoverable):
+                        self.node_pool.record_success(url, time.monotonic() - started)
+                    raise error
+
+                self.node_pool.record_success(url, time.monotonic() - started)
+                if name == 'get_dynamic_global_properties' and isinstance(result['result'], dict):
+                    self.node_pool.record_head_block(url, result['result'].get('head_block_number'))
+
+                return result['result']
+
+            except retry_exceptions as e:
+                self.node_pool.record_failure(url)
+                delay = retry.backoff(e)
+                if record is not None:
+                    record.node, record.retries = url, retry.attempts
+                if retry.attempts >= 10:
+                    logger.error('Failed to call Steem API after %d atempts - %s: %s',
+                                 retry.attempts, e.__class__.__name__, e)
+                logger.warning('Retry in %.1fs - %s: %s', delay, e.__class__.__name__, e)
+                await asyncio.sleep(delay)
+                # another coroutine may have switched nodes already
+                if self.url == url:
+                    self.next_node()
+                continue
+
+            except Exception as e:
+                logger.error('Unexpected exception - %s: %s', e.__class__.__name__, e, extra={
+                    'err': e,
+                    'url': url
+                })
+                raise e
+
+    async def call_batch(self, calls):
+        """ Execute several calls concurrently, returning their results in the same order.
+
+        Args:
+            calls (list): A list of ``(name, args, api)`` tuples. ``api`` may be omitted.
+        """
+        calls = [self._unpack_batch_call(c) for c in calls]
+        return await asyncio.gather(*[self.call(name, *args, api=api) for name, args, api in calls])
+
+    def call_multi_with_futures(self, name, params, api=None, max_workers=None):
+        raise NotImplementedError('use `call_batch` or `asyncio.gather` with AsyncHttpClient')
+
+    def map_ordered(self, name, params, api=None, window=None):
+        raise NotImplementedError('use `call_batch` or `asyncio.gather` with AsyncHttpClient')
+
+    def imap(self, fn, iterable, window=None):
+        raise NotImplementedError('use `asyncio.gather` with AsyncHttpClient')
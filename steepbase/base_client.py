@@ -2,11 +2,15 @@ import concurrent.futures
 import json
 import logging
 import re
+import threading
+import time
+from collections import deque
 from urllib.parse import urlparse
 
-from steepbase.exceptions import RPCError, decodeRPCErrorMsg, AlreadyTransactedThisBlock, \
+from steepbase.exceptions import RPCError, RPCErrorRecoverable, decodeRPCErrorMsg, AlreadyTransactedThisBlock, \
     MissingRequiredPostingAuthority, VoteWeightTooSmall, OnlyVoteOnceEvery3Seconds, AlreadyVotedSimilarily, \
     PostOnlyEvery5Min, DuplicateTransaction, ExceededAllowedBandwidth, NoMethodWithName, UnhandledRPCError
+from steepbase.json_codec import default_codec
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +25,11 @@ class BaseClient(object):
         self.re_raise = True
         self.max_workers = None
         self.url = ''
+        self.single_flight = None
+        self.codec = default_codec
+        self.hooks = []
+        self._executor = None
+        self._executor_lock = threading.Lock()
 
     @property
     def hostname(self):
@@ -38,6 +47,7 @@ class BaseClient(object):
             as_json (bool): Should this function return json as dictionary or string.
             _id (int): This is an arbitrary number that can be used for request/response tracking in multi-threaded
              scenarios.
+            codec (JsonCodec): Codec encoding the body (see ``steepbase.json_codec``).
 
         Returns:
             (dict,str): If `as_json` is set to `True`, we get json formatted as a string.
@@ -47,6 +57,7 @@ class BaseClient(object):
         as_json = kwargs.pop('as_json', True)
         api = kwargs.pop('api', None)
         _id = kwargs.pop('_id', 0)
+        codec = kwargs.pop('codec', None) or default_codec
 
         # `kwargs` for object-style param, `args` for list-style. pick one.
         assert not (kwargs and args), 'fail - passed array AND object args'
@@ -68,7 +79,7 @@ class BaseClient(object):
             }
 
         if as_json:
-            return json.dumps(body, ensure_ascii=False).encode('utf8')
+            return codec.dumps(body)
 
         else:
             return body
@@ -76,52 +87,204 @@ class BaseClient(object):
     def call(self, name, *args, **kwargs):
         raise NotImplementedError('`call` method should be implemented')
 
+    def add_hook(self, hook):
+        """ Have ``hook(record)`` called with a :class:`steepbase.instrumentation.CallRecord` after every call. """
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def _emit(self, record):
+        for hook in self.hooks:
+            try:
+                hook(record)
+            except Exception as e:
+                logger.warning('Call hook %r failed - %s: %s', hook, e.__class__.__name__, e)
+
+    def _instrumented(self, record, fn, *args):
+        """ Run ``fn(*args, record=record)``, which fills in ``record``, time it, and pass it to the hooks. """
+        started = time.monotonic()
+        try:
+            result = fn(*args, record=record)
+            record.outcome = 'ok'
+            return result
+        except BaseException as e:
+            record.outcome = e.__class__.__name__
+            raise
+        finally:
+            record.latency = time.monotonic() - started
+            self._emit(record)
+
+    @property
+    def deduplicated_calls(self):
+        """ Number of calls answered by an identical call already in flight (see ``single_flight``). """
+        return self.single_flight.deduplicated if self.single_flight else 0
+
+    def call_coalesced(self, name, *args, **kwargs):
+        """ Same as `call`, but with ``single_flight`` enabled, identical concurrent calls
+        (same method, api and params) share one upstream request.
+
+        Broadcasts are never coalesced.
+        """
+        if self.single_flight is None or name.startswith('broadcast_'):
+            return self.call(name, *args, **kwargs)
+
+        key = json.dumps([name, kwargs.get('api'), args, sorted(kwargs.items())], default=str)
+        return self.single_flight.do(key, lambda: self.call(name, *args, **kwargs))
+
+    @property
+    def supports_batch(self):
+        """ Whether the current node accepts JSON-RPC 2.0 batch (array) bodies. """
+        return False
+
+    def call_streaming(self, name, *args, path='result', api=None):
+        """ Call ``name``, and yield the items of the array (or the ``(key, value)`` pairs of the
+        object) at ``path`` in the response, ie. ``result.transactions``.
+
+        Clients able to parse responses incrementally (`HttpClient`) override this, so that only
+        one item at a time is held in memory. This default implementation decodes the whole response.
+        """
+        value = {'result': self.call(name, *args, api=api)}
+        for key in (path.split('.') if isinstance(path, str) else path):
+            value = value.get(key) if isinstance(value, dict) else None
+        if isinstance(value, dict):
+            yield from value.items()
+        elif isinstance(value, list):
+            yield from value
+        elif value is not None:
+            yield value
+
+    def set_block_applied_callback(self, callback, timeout=None):
+        raise NotImplementedError('block applied callbacks require a WebSocket node')
+
+    def remove_block_applied_callback(self, subscription_id):
+        raise NotImplementedError('block applied callbacks require a WebSocket node')
+
+    def call_batch(self, calls):
+        """ Execute several calls, returning their results in the same order.
+
+        Clients which can't send JSON-RPC batches just issue the calls one by one.
+
+        Args:
+            calls (list): A list of ``(name, args, api)`` tuples. ``api`` may be omitted.
+
+        Returns:
+            list: Results, in the order of ``calls``.
+        """
+        results = []
+        for name, args, api in map(self._unpack_batch_call, calls):
+            results.append(self.call(name, *args, api=api))
+        return results
+
+    @staticmethod
+    def _unpack_batch_call(call):
+        name, args, *rest = call
+        api = rest[0] if rest else None
+        return name, list(args), api
+
+    def _is_error_recoverable(self, error):
+        assert 'message' in error, "missing error msg key: {}".format(error)
+        assert 'code' in error, "missing error code key: {}".format(error)
+        message = error['message']
+        code = error['code']
+
+        # common steemd error
+        # {"code"=>-32003, "message"=>"Unable to acquire database lock"}
+        if message == 'Unable to acquire database lock':
+            return True
+
+        # rare steemd error
+        # {"code"=>-32000, "message"=>"Unknown exception", "data"=>"0 exception: unspecified\nUnknown Exception\n[...]"}
+        if message == 'Unknown exception':
+            return True
+
+        # generic jussi error
+        # {'code': -32603, 'message': 'Internal Error', 'data': {'error_id': 'c7a15140-f306-4727-acbd-b5e8f3717e9b',
+        #         'request': {'amzn_trace_id': 'Root=1-5ad4cb9f-9bc86fbca98d9a180850fb80', 'jussi_request_id': None}}}
+        if message == 'Internal Error' and code == -32603:
+            return True
+
+        return False
+
+    def _classify_error(self, name, error):
+        """ Turn a JSON-RPC error returned by a node into `RPCError` or `RPCErrorRecoverable`.
+
+        Recoverable errors are worth retrying on another node.
+        """
+        # legacy (pre-appbase) nodes always return err code 1
+        legacy = error['code'] == 1
+        detail = error['message']
+
+        # some errors have no data key (db lock error)
+        if 'data' not in error:
+            error_name = 'error'
+        # some errors have no name key (jussi errors)
+        elif 'name' not in error['data']:
+            error_name = 'unspecified error'
+        else:
+            error_name = error['data']['name']
+
+        if legacy:
+            detail = ":".join(detail.split("\n")[0:2])
+
+        detail = ('%s from %s (%s) in %s' % (
+            error_name, self.hostname, detail, name))
+
+        if self._is_error_recoverable(error):
+            return RPCErrorRecoverable(detail)
+        else:
+            return RPCError(detail)
+
+    @staticmethod
+    def _error_to_exception(error):
+        """ Map a JSON-RPC error object to the matching `RPCError` subclass. """
+        error_message = error.get('detail', error['message'])
+        e = RPCError(error_message)
+        msg = decodeRPCErrorMsg(e).strip()
+        if msg == "Account already transacted this block.":
+            return AlreadyTransactedThisBlock(msg)
+        elif msg == "missing required posting authority":
+            return MissingRequiredPostingAuthority()
+        elif msg == "Voting weight is too small, please accumulate more voting power or steem power.":
+            return VoteWeightTooSmall(msg)
+        elif msg == "Can only vote once every 3 seconds.":
+            return OnlyVoteOnceEvery3Seconds(msg)
+        elif msg == "You have already voted in a similar way.":
+            return AlreadyVotedSimilarily(msg)
+        elif msg == "You may only post once every 5 minutes.":
+            return PostOnlyEvery5Min(msg)
+        elif msg == "Duplicate transaction check failed":
+            return DuplicateTransaction(msg)
+        elif msg == "Account exceeded maximum allowed bandwidth per vesting share.":
+            return ExceededAllowedBandwidth(msg)
+        elif re.match("^no method with name.*", msg):
+            return NoMethodWithName(msg)
+        elif msg:
+            return UnhandledRPCError(msg)
+        else:
+            return e
+
     def _return(self, response=None, args=None, return_with_args=None):
         return_with_args = return_with_args or self.return_with_args
         result = None
 
         if response:
             try:
-                if hasattr(response, 'data'):
-                    data = response.data.decode('utf-8')
+                if isinstance(response, dict):
+                    # already decoded, ie. by a reader correlating responses by id
+                    response_json = response
+                elif hasattr(response, 'data'):
+                    response_json = self.codec.loads(response.data)
                 else:
-                    data = response if isinstance(response, str) else response.decode('utf-8')
-                response_json = json.loads(data)
+                    response_json = self.codec.loads(response)
             except Exception as e:
                 extra = dict(response=response, request_args=args, err=e)
                 logger.info('failed to load response', extra=extra)
                 result = None
             else:
                 if 'error' in response_json:
-                    error = response_json['error']
-
                     if self.re_raise:
-                        error_message = error.get(
-                            'detail', response_json['error']['message'])
-                        e = RPCError(error_message)
-                        msg = decodeRPCErrorMsg(e).strip()
-                        if msg == "Account already transacted this block.":
-                            raise AlreadyTransactedThisBlock(msg)
-                        elif msg == "missing required posting authority":
-                            raise MissingRequiredPostingAuthority
-                        elif msg == "Voting weight is too small, please accumulate more voting power or steem power.":
-                            raise VoteWeightTooSmall(msg)
-                        elif msg == "Can only vote once every 3 seconds.":
-                            raise OnlyVoteOnceEvery3Seconds(msg)
-                        elif msg == "You have already voted in a similar way.":
-                            raise AlreadyVotedSimilarily(msg)
-                        elif msg == "You may only post once every 5 minutes.":
-                            raise PostOnlyEvery5Min(msg)
-                        elif msg == "Duplicate transaction check failed":
-                            raise DuplicateTransaction(msg)
-                        elif msg == "Account exceeded maximum allowed bandwidth per vesting share.":
-                            raise ExceededAllowedBandwidth(msg)
-                        elif re.match("^no method with name.*", msg):
-                            raise NoMethodWithName(msg)
-                        elif msg:
-                            raise UnhandledRPCError(msg)
-                        else:
-                            raise e
+                        raise self._error_to_exception(response_json['error'])
 
                     result = response_json['error']
                 else:
@@ -131,13 +294,89 @@ class BaseClient(object):
         else:
             return result
 
+    @property
+    def executor_workers(self):
+        return self.max_workers or 10
+
+    @property
+    def executor(self):
+        """ Thread pool of ``max_workers`` (default 10) threads, shared by all concurrent calls of this client. """
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.executor_workers)
+        return self._executor
+
+    def close(self):
+        """ Stop the threads of `executor`. """
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    @staticmethod
+    def _ensure_list(parameter):
+        return parameter if type(parameter) in (list, tuple, set) else [parameter]
+
     def call_multi_with_futures(self, name, params, api=None, max_workers=None):
-        with concurrent.futures.ThreadPoolExecutor(
-                max_workers=max_workers) as executor:
-            # Start the load operations and mark each future with its URL
-            def ensure_list(parameter):
-                return parameter if type(parameter) in (list, tuple, set) else [parameter]
-
-            futures = (executor.submit(self.call, name, *ensure_list(param), api=api) for param in params)
-            for future in concurrent.futures.as_completed(futures):
+        """ Call ``name`` once per item of ``params`` concurrently, yielding results as they complete.
+
+        Calls run on `executor`, at most ``max_workers`` of them at once (by default, as many as
+        `executor` has threads). For more than that, a pool of ``max_workers`` threads is started
+        for the duration of the call.
+
+        It waits for threads of `executor`, so it must not be called from one of them
+        (ie. from a function passed to `imap`), which could deadlock.
+        """
+        window = max_workers or self.executor_workers
+        executor = self.executor
+        own_executor = window > self.executor_workers
+        if own_executor:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=window)
+        pending = set()
+        try:
+            for param in params:
+                pending.add(executor.submit(self.call, name, *self._ensure_list(param), api=api))
+                if len(pending) >= window:
+                    done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            for future in concurrent.futures.as_completed(pending):
                 yield future.result()
+        finally:
+            if own_executor:
+                for future in pending:
+                    future.cancel()
+                executor.shutdown(wait=False)
+
+    def map_ordered(self, name, params, api=None, window=None):
+        """ Call ``name`` once per item of ``params`` concurrently, yielding results in the order of ``params``.
+
+        Only ``window`` calls (by default twice the `executor` threads) are in flight or waiting to
+        be yielded at any time, so ``params`` may be a generator of any length.
+
+        Like `call_multi_with_futures`, it must not be called from a thread of `executor`.
+        """
+        return self.imap(lambda param: self.call(name, *self._ensure_list(param), api=api), params, window)
+
+    def imap(self, fn, iterable, window=None, executor=None):
+        """ Like `map_ordered`, for any callable: ``fn(item)`` runs on `executor` (or the given one),
+        results are yielded in order.
+
+        ``fn`` must not itself wait for calls on the same executor (ie. through `map_ordered`):
+        once all of its threads wait, none is left to run what they wait for.
+        """
+        window = window or self.executor_workers * 2
+        executor = executor or self.executor
+        pending = deque()
+        try:
+            for item in iterable:
+                pending.append(executor.submit(fn, item))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # the consumer stopped early, or a call failed
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,148 @@
+""" Blocks read straight from the ``block_log`` of a steemd node, instead of over JSON-RPC.
+
+.. code-block:: python
+
+   log = BlockLog('/data/steemd/blockchain')
+   log.get_block(1000000)
+   list(Blockchain(s).history(start_block=1, end_block=1000000, block_log=log))
+
+``block_log`` holds the irreversible blocks, each one in the wire format followed by its position
+in the file (an uint64). ``block_log.index`` holds the position of each block: block ``n`` at
+``8 * (n - 1)``. Both are memory-mapped, and blocks are decoded in place.
+"""
+import logging
+import mmap
+import os
+import struct
+from array import array
+
+from steepbase.operations import default_prefix
+from steepbase.wire import WireDecoder
+
+logger = logging.getLogger(__name__)
+
+_position = struct.Struct('<Q')
+
+
+def _map(path):
+    """ A read-only map of the file at ``path``, or ``None`` when the file is missing or empty. """
+    try:
+        with open(path, 'rb') as f:
+            if not os.fstat(f.fileno()).st_size:
+                return None
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return None
+
+
+class BlockLog(object):
+    """ The blocks of a steemd ``block_log``.
+
+    Blocks and operations are returned as ``get_block`` and ``get_ops_in_block`` return them,
+    except that blocks have no ``signing_key`` and, as the log holds no virtual operations,
+    only the operations of the transactions are returned.
+
+    Blocks appended after the log is opened are not seen. A missing or outdated
+    ``block_log.index`` is rebuilt in memory, from the position following each block.
+
+    Args:
+        path (str): The ``block_log`` file, or the directory holding it.
+        prefix (str): Prefix of public keys (``STM``).
+    """
+
+    def __init__(self, path, prefix=default_prefix):
+        if os.path.isdir(path):
+            path = os.path.join(path, 'block_log')
+        if not os.path.exists(path):
+            raise FileNotFoundError('no block_log at %s' % path)
+        self.path = path
+        self.decoder = WireDecoder(prefix)
+
+        self._log = _map(path)
+        self._data = memoryview(self._log) if self._log is not None else memoryview(b'')
+        self._index = _map(path + '.index')
+        self._positions = None
+        if self._index is not None:
+            self._positions = memoryview(self._index)
+
+        last = _position.unpack_from(self._data, len(self._data) - 8)[0] if self._data else None
+        if self._index_head() != last:
+            logger.warning('%s.index does not match the log, rebuilding it in memory', path)
+            self._rebuild_index()
+
+    def _index_head(self):
+        """ Position of the last block in the index, ``None`` when it is empty. """
+        if not self._positions:
+            return None
+        return _position.unpack_from(self._positions, len(self._positions) - 8)[0]
+
+    def _rebuild_index(self):
+        # each block is followed by its position, walk the log from the end
+        positions = array('Q')
+        end = len(self._data)
+        while end > 0:
+            start = _position.unpack_from(self._data, end - 8)[0]
+            if start >= end - 8:
+                raise IOError('corrupt block_log at %d in %s' % (end, self.path))
+            positions.append(start)
+            end = start
+        positions.reverse()
+        if self._positions is not None:
+            self._positions.release()
+        self._positions = memoryview(positions.tobytes())
+
+    @property
+    def head_block_num(self):
+        """ The number of the last block in the log, 0 when it is empty. """
+        return len(self._positions) // 8 if self._positions else 0
+
+    def __contains__(self, block_num):
+        return 1 <= block_num <= self.head_block_num
+
+    def get_block(self, block_num):
+        """ Block ``block_num``, or ``None`` if it isn't in the log. """
+        if block_num not in self:
+            return None
+        position = _position.unpack_from(self._positions, 8 * (block_num - 1))[0]
+        block, _ = self.decoder.block(self._data, position)
+        if not block['block_id'].startswith('%08x' % block_num):
+            raise IOError('corrupt block %d in %s' % (block_num, self.path))
+        return block
+
+    def get_ops(self, block_num):
+        """ The operations of block ``block_num``, in the ``get_ops_in_block`` format. """
+        block = self.get_block(block_num)
+        if block is None:
+            return []
+        return [{
+            'trx_id': trx['transaction_id'],
+            'block': block_num,
+            'trx_in_block': trx_in_block,
+            'op_in_trx': op_in_trx,
+            'virtual_op': 0,
+            'timestamp': block['timestamp'],
+            'op': op,
+        } for trx_in_block, trx in enumerate(block['transactions'])
+            for op_in_trx, op in enumerate(trx['operations'])]
+
+    def blocks(self, start_block=1, end_block=None):
+        """ Yield the blocks from ``start_block`` to ``end_block`` (included, by default the last one). """
+        end_block = min(end_block or self.head_block_num, self.head_block_num)
+        for block_num in range(max(start_block, 1), end_block + 1):
+            yield self.get_block(block_num)
+
+    def close(self):
+        for view in (self._data, self._positions):
+            if view is not None:
+                view.release()
+        for mapped in (self._log, self._index):
+            if mapped is not None:
+                mapped.close()
+        self._log = self._index = self._positions = None
+        self._data = memoryview(b'')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,253 @@
+""" Local, append-only store of irreversible blocks (and their operations), so that replaying
+historic ranges doesn't download them again.
+
+.. code-block:: python
+
+   s = Steemd(block_store='/data/steem-blocks')
+   s.backfill_block_store(1, 1000000)
+   list(Blockchain(s).history(start_block=1, end_block=1000000))  # read from disk
+
+Or from a shell: ``python -m steepbase.block_store /data/steem-blocks --start 1 --end 1000000 --ops``
+"""
+import argparse
+import logging
+import mmap
+import os
+import struct
+import threading
+
+from steepbase.json_codec import default_codec
+
+logger = logging.getLogger(__name__)
+
+#: index entry of a block: segment number + 1 (0 when the block isn't stored), offset, length
+INDEX_ENTRY = struct.Struct('<IQI')
+#: header of a record in a segment: block number, length of the data following it
+RECORD_HEADER = struct.Struct('<II')
+
+
+class BlockTable(object):
+    """ Blocks of one kind (ie. ``get_block`` results) in a directory.
+
+    Records are appended to segment files (``000000.seg``, ``000001.seg``, ...), a new segment
+    being started once the current one reaches ``segment_size`` bytes. Records are never
+    rewritten. The ``index`` file maps block numbers to records: one fixed size entry per block
+    number, memory-mapped, so a lookup is a single read.
+    """
+
+    def __init__(self, path, segment_size=2 ** 28, sync=False, codec=None):
+        self.path = path
+        self.segment_size = segment_size
+        self.sync = sync
+        self.codec = codec or default_codec
+        self._lock = threading.RLock()
+        self._readers = {}
+        os.makedirs(path, exist_ok=True)
+
+        self._index_file = open(os.path.join(path, 'index'), 'a+b')
+        self._index = None
+        self._map_index(os.fstat(self._index_file.fileno()).st_size)
+
+        segments = sorted(int(name[:-4]) for name in os.listdir(path) if name.endswith('.seg'))
+        self._segment = segments[-1] if segments else 0
+        self._writer = open(self._segment_path(self._segment), 'ab')
+
+    def _segment_path(self, segment):
+        return os.path.join(self.path, '%06d.seg' % segment)
+
+    def _map_index(self, size):
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+        if size:
+            self._index = mmap.mmap(self._index_file.fileno(), size)
+
+    def _entry(self, block_num):
+        if self._index is None or (block_num + 1) * INDEX_ENTRY.size > len(self._index):
+            return 0, 0, 0
+        return INDEX_ENTRY.unpack_from(self._index, block_num * INDEX_ENTRY.size)
+
+    def __contains__(self, block_num):
+        with self._lock:
+            return self._entry(block_num)[0] != 0
+
+    def get(self, block_num):
+        """ The stored data of ``block_num``, or ``None``. """
+        with self._lock:
+            segment, offset, length = self._entry(block_num)
+            if not segment:
+                return None
+            reader = self._readers.get(segment)
+            if reader is None:
+                reader = self._readers[segment] = open(self._segment_path(segment - 1), 'rb')
+            reader.seek(offset)
+            record = reader.read(length)
+
+        stored_num, data_length = RECORD_HEADER.unpack_from(record)
+        if stored_num != block_num or data_length != length - RECORD_HEADER.size:
+            raise IOError('corrupt record of block %d in %s' % (block_num, self.path))
+        return self.codec.loads(record[RECORD_HEADER.size:])
+
+    def put(self, block_num, data):
+        """ Append ``data`` for ``block_num``, unless the block is already stored. """
+        payload = self.codec.dumps(data)
+        with self._lock:
+            if self._entry(block_num)[0]:
+                return
+            if self._writer.tell() >= self.segment_size:
+                self._writer.close()
+                self._segment += 1
+                self._writer = open(self._segment_path(self._segment), 'ab')
+
+            offset = self._writer.tell()
+            self._writer.write(RECORD_HEADER.pack(block_num, len(payload)) + payload)
+            self._writer.flush()
+            if self.sync:
+                os.fsync(self._writer.fileno())
+
+            # the record is written before the entry pointing to it
+            needed = (block_num + 1) * INDEX_ENTRY.size
+            if self._index is None or needed > len(self._index):
+                # grow by at least 1M entries at once
+                size = max(needed, 2 * len(self._index or b''), 2 ** 20 * INDEX_ENTRY.size)
+                self._index_file.truncate(size)
+                self._map_index(size)
+            INDEX_ENTRY.pack_into(self._index, block_num * INDEX_ENTRY.size,
+                                  self._segment + 1, offset, RECORD_HEADER.size + len(payload))
+
+    def flush(self):
+        with self._lock:
+            if self._index is not None:
+                self._index.flush()
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._map_index(0)
+            self._index_file.close()
+            self._writer.close()
+            for reader in self._readers.values():
+                reader.close()
+            self._readers = {}
+
+
+class BlockStore(object):
+    """ On-disk store of irreversible blocks, with the same ``get``/``put`` interface as
+    :class:`steepbase.cache.ResponseCache`. Clients check it before calling the node.
+
+    ``get_block`` results and ``get_ops_in_block`` results (all operations, or virtual only)
+    are kept in a :class:`BlockTable` each. Only blocks at or below the last irreversible block
+    are stored, which the store learns from the ``get_dynamic_global_properties`` responses
+    passing through it, so stored data never changes.
+
+    Args:
+        path (str): Directory of the store, created if needed.
+        segment_size (int): Size at which a new segment file is started.
+        sync (bool): ``fsync`` each record, for durability across power loss.
+    """
+
+    tables = {
+        ('get_block', False): 'blocks',
+        ('get_ops_in_block', False): 'ops',
+        ('get_ops_in_block', True): 'virtual_ops',
+    }
+
+    def __init__(self, path, segment_size=2 ** 28, sync=False):
+        self.path = path
+        self.segment_size = segment_size
+        self.sync = sync
+        self.last_irreversible_block_num = None
+        self.hits = 0
+        self.misses = 0
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def table(self, name):
+        """ The :class:`BlockTable` ``name`` (``blocks``, ``ops`` or ``virtual_ops``), opened on first use. """
+        with self._lock:
+            table = self._tables.get(name)
+            if table is None:
+                table = self._tables[name] = BlockTable(
+                    os.path.join(self.path, name), segment_size=self.segment_size, sync=self.sync)
+            return table
+
+    def _locate(self, name, args):
+        """ ``(table name, block number)`` of a call, ``None`` if it isn't one the store keeps. """
+        if name not in ('get_block', 'get_ops_in_block') or not args:
+            return None
+        try:
+            block_num = int(args[0])
+        except (TypeError, ValueError):
+            return None
+        only_virtual = bool(args[1]) if name == 'get_ops_in_block' and len(args) > 1 else False
+        return self.tables[(name, only_virtual)], block_num
+
+    def get(self, name, args, api=None):
+        """ Look up a stored response.
+
+        Returns:
+            tuple: ``(True, response)`` on a hit, ``(False, None)`` on a miss.
+        """
+        location = self._locate(name, args)
+        if location is None:
+            return False, None
+        response = self.table(location[0]).get(location[1])
+        if response is None:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, response
+
+    def put(self, name, args, response, api=None):
+        """ Store a response, if it is of an irreversible block. """
+        if name == 'get_dynamic_global_properties' and isinstance(response, dict):
+            lib = response.get('last_irreversible_block_num')
+            if lib is not None:
+                self.last_irreversible_block_num = max(self.last_irreversible_block_num or 0, lib)
+            return
+
+        location = self._locate(name, args)
+        if location is None or response is None or self.last_irreversible_block_num is None:
+            return
+        table, block_num = location
+        if block_num <= self.last_irreversible_block_num:
+            self.table(table).put(block_num, response)
+
+    def __contains__(self, location):
+        """ Whether ``(table name, block number)`` is stored. """
+        name, block_num = location
+        return block_num in self.table(name)
+
+    def stats(self):
+        """ Hit/miss counters. """
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        with self._lock:
+            for table in self._tables.values():
+                table.close()
+            self._tables = {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Download irreversible blocks into a local block store.')
+    parser.add_argument('path', help='block store directory')
+    parser.add_argument('--node', action='append', help='node URL, may be repeated')
+    parser.add_argument('--start', type=int, default=1)
+    parser.add_argument('--end', type=int, default=None, help='defaults to the last irreversible block')
+    parser.add_argument('--ops', action='store_true', help='also store get_ops_in_block results')
+    parser.add_argument('--window', type=int, default=None, help='max requests in flight')
+    args = parser.parse_args()
+
+    from steep.steemd import Steemd
+    logging.basicConfig(level=logging.INFO)
+    steemd = Steemd(nodes=args.node, block_store=args.path)
+    try:
+        count = steemd.backfill_block_store(args.start, args.end, operations=args.ops, window=args.window)
+        print('Stored %d blocks in %s' % (count, args.path))
+    finally:
+        steemd.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+import concurrent.futures
+import copy
+import json
+import threading
+import time
+from collections import OrderedDict
+
+#: ttl of responses which never expire
+FOREVER = float('inf')
+
+
+def irreversible_block_ttl(cache, args):
+    """ Blocks at or below the last irreversible block can't change, so they never expire.
+
+    Anything newer (or any block while the irreversible block number is unknown) is not cached.
+    """
+    if not args or cache.last_irreversible_block_num is None:
+        return 0
+    try:
+        block_num = int(args[0])
+    except (TypeError, ValueError):
+        return 0
+    return FOREVER if block_num <= cache.last_irreversible_block_num else 0
+
+
+class ResponseCache(object):
+    """ LRU cache of RPC responses, with a time-to-live policy per method.
+
+    Only methods with a policy are cached. A policy is either a ttl in seconds
+    (``FOREVER`` for responses that never change), or a callable
+    ``policy(cache, args)`` returning the ttl for one particular call (0 to skip caching).
+
+    The cache learns the last irreversible block number from the
+    ``get_dynamic_global_properties`` responses passing through it.
+
+    Args:
+        maxsize (int): Max number of responses kept, least recently used ones are evicted first.
+        block_interval (float): Seconds between blocks, the ttl of per-block data like global properties.
+        policies (dict): Extra or overriding ``{method: ttl or callable}`` policies.
+
+    .. code-block:: python
+
+       s = Steemd(cache=ResponseCache(maxsize=10000))
+       s.get_config()
+       s.get_config()
+       s.cache.stats()
+       # {'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 10000}
+
+    """
+
+    def __init__(self, maxsize=1000, block_interval=3, policies=None):
+        self.maxsize = maxsize
+        self.policies = {
+            'get_config': FOREVER,
+            'get_dynamic_global_properties': block_interval,
+            'get_feed_history': block_interval,
+            'get_current_median_history_price': block_interval,
+            'get_chain_properties': block_interval,
+            'get_block': irreversible_block_ttl,
+            'get_block_header': irreversible_block_ttl,
+            'get_ops_in_block': irreversible_block_ttl,
+        }
+        self.policies.update(policies or {})
+        self.last_irreversible_block_num = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """ Hit/miss counters and current size. """
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self), 'maxsize': self.maxsize}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @staticmethod
+    def key(name, args, api=None):
+        return json.dumps([name, api, args], sort_keys=True, default=str)
+
+    def ttl(self, name, args):
+        """ Seconds a response to this call may be reused for (0 if it must not be cached). """
+        policy = self.policies.get(name)
+        if callable(policy):
+            return policy(self, args)
+        return policy or 0
+
+    def get(self, name, args, api=None):
+        """ Look up a response.
+
+        Returns:
+            tuple: ``(True, response)`` on a hit, ``(False, None)`` on a miss.
+        """
+        if name not in self.policies:
+            return False, None
+
+        key = self.key(name, args, api)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                # callers may mutate what they get back
+                return True, copy.deepcopy(entry[1])
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+        return False, None
+
+    def put(self, name, args, response, api=None):
+        """ Store a response, if the policy of ``name`` allows it. """
+        if name == 'get_dynamic_global_properties' and isinstance(response, dict):
+            lib = response.get('last_irreversible_block_num')
+            if lib is not None:
+                self.last_irreversible_block_num = max(self.last_irreversible_block_num or 0, lib)
+
+        ttl = self.ttl(name, args)
+        if not ttl or response is None:
+            return
+
+        key = self.key(name, args, api)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, copy.deepcopy(response))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+class SingleFlight(object):
+    """ Collapse identical calls which are in flight at the same time into one.
+
+    The first caller (the leader) runs the call, every caller arriving while it runs
+    waits for, and shares, its result or exception.
+
+    .. code-block:: python
+
+       flights = SingleFlight()
+       flights.do(key, lambda: client.call('get_dynamic_global_properties'))
+       flights.deduplicated
+       # 31
+
+    """
+
+    def __init__(self):
+        #: number of calls which were answered by another caller's request
+        self.deduplicated = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = concurrent.futures.Future()
+            else:
+                self.deduplicated += 1
+
+        if not leader:
+            # every waiter gets its own copy, the same way cached responses are handed out
+            return copy.deepcopy(flight.result())
+
+        try:
+            result = fn()
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._flights[key]
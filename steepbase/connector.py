@@ -1,21 +1,58 @@
+import asyncio
 from urllib.parse import urlparse
 
+from steepbase.async_http_client import AsyncHttpClient
+from steepbase.block_store import BlockStore
+from steepbase.cache import ResponseCache
 from steepbase.exceptions import InvalidNodeSchemes
 from steepbase.http_client import HttpClient
+from steepbase.instrumentation import CallStats
 from steepbase.ws_client import WsClient
 
 
-class Connector(object):
+class BaseConnector(object):
+    """ Pick the client matching the nodes' scheme, and route calls through it.
+
+    Args:
+        nodes (list): Node URLs, all of them http(s) or all ws(s).
+        cache (bool, ResponseCache): Cache responses of slowly changing methods,
+            see :class:`steepbase.cache.ResponseCache`. Pass ``True`` for the default policies.
+        instrument (bool, CallStats): Record latency, sizes, retries and outcome of every call,
+            see :class:`steepbase.instrumentation.CallStats`. Available as ``call_stats``.
+        block_store (str, BlockStore): Keep irreversible blocks and their operations on disk,
+            in this directory, see :class:`steepbase.block_store.BlockStore`. It is checked before ``cache``.
+    """
+    http_client_class = None
+    ws_client_class = None
+
     def __init__(self, nodes, **kwargs):
         scheme = self.get_scheme(nodes)
 
-        if scheme == 'http':
-            self.client = HttpClient(nodes, **kwargs)
-        elif scheme == 'ws':
-            self.client = WsClient(nodes, **kwargs)
+        cache = kwargs.pop('cache', None)
+        if cache is True:
+            cache = ResponseCache()
+        self.cache = cache if cache is not False else None
+
+        block_store = kwargs.pop('block_store', None)
+        if isinstance(block_store, str):
+            block_store = BlockStore(block_store)
+        self.block_store = block_store
+
+        call_stats = kwargs.pop('instrument', None)
+        if call_stats is True:
+            call_stats = CallStats()
+        self.call_stats = call_stats or None
+
+        if scheme == 'http' and self.http_client_class:
+            self.client = self.http_client_class(nodes, **kwargs)
+        elif scheme == 'ws' and self.ws_client_class:
+            self.client = self.ws_client_class(nodes, **kwargs)
         else:
             raise InvalidNodeSchemes('Unsupported node scheme.')
 
+        if self.call_stats is not None:
+            self.client.add_hook(self.call_stats)
+
     @staticmethod
     def get_scheme(nodes):
         ws_schemas = ['ws', 'wss']
@@ -36,10 +73,40 @@ class Connector(object):
 
         return 'ws' * is_ws + 'http' * is_http
 
+    @property
+    def stores(self):
+        """ Where responses are looked up before calling the node, in order. """
+        return [store for store in (self.block_store, self.cache) if store is not None]
+
     @property
     def hostname(self):
         return self.client.hostname
 
+    @property
+    def supports_batch(self):
+        return self.client.supports_batch
+
+    def add_hook(self, hook):
+        """ Have ``hook(record)`` called after every RPC call, see `BaseClient.add_hook`. """
+        self.client.add_hook(hook)
+
+    def _lookup(self, name, args, api):
+        for store in self.stores:
+            hit, response = store.get(name, args, api)
+            if hit:
+                return True, response
+        return False, None
+
+    def _remember(self, name, args, response, api):
+        for store in self.stores:
+            store.put(name, args, response, api)
+
+
+class Connector(BaseConnector):
+    """ Blocking :class:`BaseConnector`, for HTTP(S) or WebSocket nodes. """
+    http_client_class = HttpClient
+    ws_client_class = WsClient
+
     def call(self, name, *args, **kwargs):
         """ Execute a method against steemd RPC.
 
@@ -48,7 +115,120 @@ class Connector(object):
             node fail-over, unless we are broadcasting a transaction.
             In latter case, the exception is **re-raised**.
         """
-        return self.client.call(name, *args, **kwargs)
+        if not self.stores:
+            return self.client.call_coalesced(name, *args, **kwargs)
+
+        api = kwargs.get('api')
+        hit, response = self._lookup(name, args, api)
+        if hit:
+            return response
+        response = self.client.call_coalesced(name, *args, **kwargs)
+        self._remember(name, args, response, api)
+        return response
 
     def call_multi_with_futures(self, name, params, api=None, max_workers=None):
         return self.client.call_multi_with_futures(name, params, api=api, max_workers=max_workers)
+
+    def map_ordered(self, name, params, api=None, window=None):
+        """ Concurrent calls of ``name``, one per item of ``params``, yielded in order. See `BaseClient.map_ordered`. """
+        return self.client.map_ordered(name, params, api=api, window=window)
+
+    def set_block_applied_callback(self, callback, timeout=None):
+        """ Have ``callback(block_header)`` called for every new block. Requires a WebSocket node
+        supporting subscriptions, see `WsClient.set_block_applied_callback`. """
+        return self.client.set_block_applied_callback(callback, timeout=timeout)
+
+    def remove_block_applied_callback(self, subscription_id):
+        self.client.remove_block_applied_callback(subscription_id)
+
+    def call_streaming(self, name, *args, path='result', api=None):
+        """ Items at ``path`` of the response of ``name``, parsed as they arrive. See `HttpClient.call_streaming`.
+
+        Streamed responses are never cached.
+        """
+        return self.client.call_streaming(name, *args, path=path, api=api)
+
+    def close(self):
+        """ Release the connections and threads of the client, and the files of the block store. """
+        self.client.close()
+        if self.block_store is not None:
+            self.block_store.close()
+
+    def call_batch(self, calls):
+        """ Execute several methods against steemd RPC, batched into as few requests as the node allows.
+
+        Args:
+            calls (list): A list of ``(name, args, api)`` tuples.
+
+        Returns:
+            list: Results, in the order of ``calls``.
+        """
+        if not self.stores:
+            return self.client.call_batch(calls)
+
+        calls = [self.client._unpack_batch_call(c) for c in calls]
+        results = [self._lookup(name, args, api) for name, args, api in calls]
+        missing = [i for i, (hit, _) in enumerate(results) if not hit]
+        fetched = self.client.call_batch([calls[i] for i in missing]) if missing else []
+        results = [response for _, response in results]
+        for i, response in zip(missing, fetched):
+            name, args, api = calls[i]
+            self._remember(name, args, response, api)
+            results[i] = response
+        return results
+
+
+class AsyncConnector(BaseConnector):
+    """ ``asyncio`` flavour of :class:`Connector`. Only HTTP(S) nodes are supported.
+
+    All calls are coroutines and have to be awaited.
+    """
+    http_client_class = AsyncHttpClient
+    ws_client_class = None
+
+    async def call(self, name, *args, **kwargs):
+        """ Execute a method against steemd RPC.
+
+        The block store reads and writes files, so its lookups run in the default executor
+        rather than on the event loop.
+        """
+        if not self.stores:
+            return await self.client.call(name, *args, **kwargs)
+
+        api = kwargs.get('api')
+        hit, response = await self._in_executor(self._lookup, name, args, api)
+        if hit:
+            return response
+        response = await self.client.call(name, *args, **kwargs)
+        await self._in_executor(self._remember, name, args, response, api)
+        return response
+
+    async def _in_executor(self, fn, *args):
+        """ ``fn(*args)``, off the event loop if it may touch the block store's files. """
+        if self.block_store is None:
+            return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    async def call_batch(self, calls):
+        """ Execute several methods against steemd RPC concurrently.
+
+        Args:
+            calls (list): A list of ``(name, args, api)`` tuples.
+
+        Returns:
+            list: Results, in the order of ``calls``.
+        """
+        calls = [self.client._unpack_batch_call(c) for c in calls]
+        return await asyncio.gather(*[self.call(name, *args, api=api) for name, args, api in calls])
+
+    async def close(self):
+        """ Close connections to the nodes. """
+        await self.client.close()
+        if self.block_store is not None:
+            self.block_store.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -0,0 +1,578 @@
+""" A local stand-in for a steemd node, serving a deterministic synthetic chain over
+HTTP and WebSocket JSON-RPC. Made for benchmarks and load tests, which then run offline.
+
+.. code-block:: python
+
+   from steepbase.fake_steemd import FakeSteemd
+   from steep.steemd import Steemd
+
+   node = FakeSteemd(latency=0.02, errors={'db_lock': 0.01})
+   s = Steemd(nodes=[node.serve_http()])
+   s.get_block(1000)
+   node.shutdown()
+
+Or from a shell: ``python -m steepbase.fake_steemd --http 8090 --ws 8091 --latency 0.02``
+"""
+import argparse
+import base64
+import hashlib
+import json
+import logging
+import random
+import socket
+import socketserver
+import struct
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+logger = logging.getLogger(__name__)
+
+GENESIS_TIME = datetime(2016, 3, 24, 16, 0, 0)
+WS_GUID = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+def _digest(*parts):
+    return hashlib.sha1(':'.join(map(str, parts)).encode('ascii')).hexdigest()
+
+
+class SyntheticChain(object):
+    """ Deterministic chain: the content of every block only depends on its number and ``seed``.
+
+    Args:
+        head_block (int): Head block number at start.
+        block_interval (float): Seconds between blocks.
+        produce_blocks (bool): Advance the head every ``block_interval`` seconds.
+            Otherwise the head only moves with `produce_block`.
+        transactions_per_block (int): Average number of transactions in a block.
+        irreversible_lag (int): Number of blocks between head and last irreversible block.
+        accounts (int): Number of synthetic accounts (``user0``, ``user1``, ...) taking part in transactions.
+        seed (int): Changes the content of the chain.
+        realtime (bool): Date blocks by the wall clock, the head block at start being produced just now,
+            rather than from a fixed genesis time. Block contents then depend on the start time.
+    """
+
+    def __init__(self, head_block=1000, block_interval=3, produce_blocks=True, transactions_per_block=5,
+                 irreversible_lag=15, accounts=100, seed=0, realtime=False):
+        self.initial_head = head_block
+        self.block_interval = block_interval
+        self.produce_blocks = produce_blocks
+        self.transactions_per_block = transactions_per_block
+        self.irreversible_lag = irreversible_lag
+        self.accounts = ['user%d' % i for i in range(accounts)]
+        self.seed = seed
+        self.broadcasts = []
+        self._produced = 0
+        self._started = time.monotonic()
+        self._forks = []
+        self.genesis_time = GENESIS_TIME
+        if realtime:
+            # block times have a 1s resolution, the head block is produced on the last whole second
+            now = time.time()
+            self.genesis_time = datetime(1970, 1, 1) + timedelta(seconds=int(now) - head_block * block_interval)
+            self._started -= now - int(now)
+
+    @property
+    def head_block_number(self):
+        head = self.initial_head + self._produced
+        if self.produce_blocks and self.block_interval:
+            head += int((time.monotonic() - self._started) / self.block_interval)
+        return head
+
+    def produce_block(self, count=1):
+        self._produced += count
+
+    def fork(self, depth=1):
+        """ Switch to another branch, replacing the ``depth`` most recent blocks with new ones
+        (same contents, other ids), like after a micro-fork. """
+        self._forks.append(self.head_block_number - depth + 1)
+
+    def block_id(self, num):
+        branch = sum(1 for fork in self._forks if fork <= num)
+        if branch:
+            return '%08x' % num + _digest('block', self.seed, num, branch)[:32]
+        return '%08x' % num + _digest('block', self.seed, num)[:32]
+
+    def timestamp(self, num):
+        return (self.genesis_time + timedelta(seconds=num * self.block_interval)).strftime('%Y-%m-%dT%H:%M:%S')
+
+    def witness(self, num):
+        return 'witness%d' % (num % 21)
+
+    def _operation(self, rng, num):
+        kind = rng.choice(('vote', 'transfer', 'comment', 'custom_json'))
+        a, b = rng.sample(self.accounts, 2)
+        if kind == 'vote':
+            return ['vote', {'voter': a, 'author': b, 'permlink': 'post-%d' % rng.randrange(num + 1),
+                             'weight': rng.choice((10000, 5000, -10000))}]
+        if kind == 'transfer':
+            amount = '%d.%03d STEEM' % (rng.randrange(1000), rng.randrange(1000))
+            return ['transfer', {'from': a, 'to': b, 'amount': amount, 'memo': 'memo %s' % _digest('memo', num, a)[:12]}]
+        if kind == 'comment':
+            return ['comment', {'parent_author': '', 'parent_permlink': 'synthetic', 'author': a,
+                                'permlink': 'post-%d' % num, 'title': 'Block %d' % num,
+                                'body': 'Synthetic post of block %d by %s. ' % (num, a) * rng.randrange(1, 20),
+                                'json_metadata': json.dumps({'tags': ['synthetic']})}]
+        return ['custom_json', {'required_auths': [], 'required_posting_auths': [a], 'id': 'follow',
+                                'json': json.dumps(['follow', {'follower': a, 'following': b, 'what': ['blog']}])}]
+
+    def transactions(self, num):
+        rng = random.Random('%s:%d' % (self.seed, num))
+        count = rng.randrange(self.transactions_per_block * 2 + 1)
+        transactions = []
+        for i in range(count):
+            transactions.append({
+                'ref_block_num': (num - 1) & 0xffff,
+                'ref_block_prefix': int(_digest('prefix', self.seed, num)[:8], 16),
+                'expiration': self.timestamp(num + 20),
+                'operations': [self._operation(rng, num) for _ in range(rng.randrange(1, 3))],
+                'extensions': [],
+                'signatures': ['1f' + _digest('sig', self.seed, num, i) * 3],
+            })
+        return transactions
+
+    def block(self, num):
+        """ The block, or ``None`` if it wasn't produced yet. """
+        if num < 1 or num > self.head_block_number:
+            return None
+        transactions = self.transactions(num)
+        ids = [_digest('trx', self.seed, num, i) for i in range(len(transactions))]
+        return {
+            'previous': self.block_id(num - 1),
+            'timestamp': self.timestamp(num),
+            'witness': self.witness(num),
+            'transaction_merkle_root': _digest('merkle', self.seed, num),
+            'extensions': [],
+            'witness_signature': '20' + _digest('witness_signature', self.seed, num) * 3,
+            'transactions': [dict(trx, transaction_id=trx_id, block_num=num, transaction_num=i)
+                             for i, (trx, trx_id) in enumerate(zip(transactions, ids))],
+            'block_id': self.block_id(num),
+            'signing_key': 'STM' + _digest('key', self.witness(num))[:50],
+            'transaction_ids': ids,
+        }
+
+    def ops_in_block(self, num, only_virtual=False):
+        block = self.block(num)
+        if block is None:
+            return []
+        ops = []
+        if not only_virtual:
+            for trx_in_block, trx in enumerate(block['transactions']):
+                for op_in_trx, op in enumerate(trx['operations']):
+                    ops.append({'trx_id': trx['transaction_id'], 'block': num, 'trx_in_block': trx_in_block,
+                                'op_in_trx': op_in_trx, 'virtual_op': 0, 'timestamp': block['timestamp'], 'op': op})
+        ops.append({'trx_id': '0' * 40, 'block': num, 'trx_in_block': len(block['transactions']), 'op_in_trx': 0,
+                    'virtual_op': 1, 'timestamp': block['timestamp'],
+                    'op': ['producer_reward', {'producer': block['witness'], 'vesting_shares': '1000.000000 VESTS'}]})
+        return ops
+
+    def dynamic_global_properties(self):
+        head = self.head_block_number
+        return {
+            'id': 0,
+            'head_block_number': head,
+            'head_block_id': self.block_id(head),
+            'time': self.timestamp(head),
+            'current_witness': self.witness(head),
+            'total_pow': 514415,
+            'num_pow_witnesses': 172,
+            'virtual_supply': '283000000.000 STEEM',
+            'current_supply': '271000000.000 STEEM',
+            'confidential_supply': '0.000 STEEM',
+            'current_sbd_supply': '13000000.000 SBD',
+            'confidential_sbd_supply': '0.000 SBD',
+            'total_vesting_fund_steem': '190000000.000 STEEM',
+            'total_vesting_shares': '385000000000.000000 VESTS',
+            'total_reward_fund_steem': '0.000 STEEM',
+            'total_reward_shares2': '0',
+            'pending_rewarded_vesting_shares': '0.000000 VESTS',
+            'pending_rewarded_vesting_steem': '0.000 STEEM',
+            'sbd_interest_rate': 0,
+            'sbd_print_rate': 10000,
+            'maximum_block_size': 65536,
+            'current_aslot': head + 100,
+            'recent_slots_filled': '340282366920938463463374607431768211455',
+            'participation_count': 128,
+            'last_irreversible_block_num': max(0, head - self.irreversible_lag),
+            'vote_power_reserve_rate': 10,
+        }
+
+    def config(self):
+        return {
+            'IS_TEST_NET': False,
+            'STEEM_BLOCK_INTERVAL': self.block_interval,
+            'STEEMIT_BLOCK_INTERVAL': self.block_interval,
+            'STEEM_ADDRESS_PREFIX': 'STM',
+            'STEEM_CHAIN_ID': '0' * 64,
+            'STEEM_BLOCKCHAIN_VERSION': '0.19.4',
+            'STEEM_MAX_BLOCK_SIZE': 393216000,
+            'STEEM_100_PERCENT': 10000,
+        }
+
+    def account(self, name):
+        rng = random.Random('%s:account:%s' % (self.seed, name))
+        key = 'STM' + _digest('account key', name)[:50]
+        authority = {'weight_threshold': 1, 'account_auths': [], 'key_auths': [[key, 1]]}
+        return {
+            'id': int(_digest('account', name)[:6], 16),
+            'name': name,
+            'owner': authority,
+            'active': authority,
+            'posting': authority,
+            'memo_key': key,
+            'json_metadata': '{}',
+            'balance': '%d.%03d STEEM' % (rng.randrange(100000), rng.randrange(1000)),
+            'sbd_balance': '%d.%03d SBD' % (rng.randrange(1000), rng.randrange(1000)),
+            'vesting_shares': '%d.%06d VESTS' % (rng.randrange(10 ** 7), rng.randrange(10 ** 6)),
+            'voting_power': rng.randrange(1, 10001),
+            'post_count': rng.randrange(1000),
+            'created': self.timestamp(rng.randrange(1, self.initial_head + 1)),
+        }
+
+    def account_history_size(self, name):
+        return 100 + int(_digest('history', self.seed, name)[:4], 16) % 1000
+
+    def account_history(self, name, index_from, limit):
+        """ ``limit + 1`` entries ending at ``index_from`` (-1 for the newest), like steemd. """
+        size = self.account_history_size(name)
+        last = size - 1 if index_from < 0 else min(index_from, size - 1)
+        history = []
+        for index in range(max(0, last - limit), last + 1):
+            num = max(1, self.initial_head - size + index)
+            rng = random.Random('%s:history:%s:%d' % (self.seed, name, index))
+            op = self._operation(rng, num)
+            history.append([index, {'trx_id': _digest('history', name, index), 'block': num, 'trx_in_block': 0,
+                                    'op_in_trx': 0, 'virtual_op': 0, 'timestamp': self.timestamp(num), 'op': op}])
+        return history
+
+    def broadcast(self, trx):
+        self.broadcasts.append(trx)
+        return {'id': _digest('broadcast', len(self.broadcasts)), 'block_num': self.head_block_number + 1,
+                'trx_num': 0, 'expired': False}
+
+
+class FakeSteemd(object):
+    """ JSON-RPC node serving a :class:`SyntheticChain`.
+
+    Requests may use the condenser style ``call`` method, ``api.method`` names or bare method
+    names, and may be JSON-RPC batches.
+
+    Args:
+        chain (SyntheticChain): The chain to serve. Keyword arguments not listed here are
+            passed to a new ``SyntheticChain`` when omitted.
+        latency (float): Seconds added to every response.
+        errors (dict): Probability of injected failures per request, by kind:
+            ``db_lock`` (``Unable to acquire database lock``), ``internal`` (jussi's ``Internal Error``),
+            ``timeout`` (no answer for ``hang`` seconds, then the connection is dropped).
+        hang (float): Seconds a ``timeout`` failure keeps the request waiting.
+        seed (int): Seed of the chain and of the error injection.
+        subscriptions (bool): Support ``set_block_applied_callback`` over WebSocket, like legacy
+            (pre-appbase) nodes. Block headers are then pushed as ``notice`` messages.
+    """
+
+    def __init__(self, chain=None, latency=0.0, errors=None, hang=30.0, seed=0, subscriptions=True,
+                 **chain_kwargs):
+        self.chain = chain or SyntheticChain(seed=seed, **chain_kwargs)
+        self.latency = latency
+        self.errors = errors or {}
+        self.hang = hang
+        self.subscriptions = subscriptions
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._servers = []
+        self.methods = {
+            'get_block': lambda num: self.chain.block(int(num)),
+            'get_block_header': self._block_header,
+            'get_ops_in_block': lambda num, only_virtual=False: self.chain.ops_in_block(int(num), only_virtual),
+            'get_dynamic_global_properties': self.chain.dynamic_global_properties,
+            'get_config': self.chain.config,
+            'get_accounts': lambda names: [self.chain.account(name) for name in names],
+            'get_account_history': lambda name, index_from, limit: self.chain.account_history(
+                name, int(index_from), int(limit)),
+            'broadcast_transaction': lambda trx: self.chain.broadcast(trx) and None,
+            'broadcast_transaction_synchronous': self.chain.broadcast,
+        }
+
+    def _block_header(self, num):
+        block = self.chain.block(int(num))
+        if block is None:
+            return None
+        return {k: block[k] for k in ('previous', 'timestamp', 'witness', 'transaction_merkle_root', 'extensions')}
+
+    def _injected_error(self):
+        with self._lock:
+            self.requests += 1
+            roll = self._random.random()
+        for kind in ('timeout', 'db_lock', 'internal'):
+            roll -= self.errors.get(kind, 0)
+            if roll < 0:
+                return kind
+        return None
+
+    @staticmethod
+    def _parse(request):
+        method, params = request.get('method'), request.get('params', [])
+        if method == 'call':
+            _, method, params = params[0], params[1], (params[2] if len(params) > 2 else [])
+        elif '.' in method:
+            method = method.split('.', 1)[1]
+        return method, params
+
+    def _answer(self, request):
+        try:
+            method, params = self._parse(request)
+            fn = self.methods.get(method)
+            if fn is None:
+                return {'jsonrpc': '2.0', 'id': request.get('id'), 'error': {
+                    'code': -32003, 'message': "no method with name '%s'" % method}}
+            result = fn(**params) if isinstance(params, dict) else fn(*params)
+            return {'jsonrpc': '2.0', 'id': request.get('id'), 'result': result}
+        except Exception as e:
+            return {'jsonrpc': '2.0', 'id': request.get('id'), 'error': {
+                'code': -32000, 'message': '%s: %s' % (e.__class__.__name__, e)}}
+
+    def handle(self, body):
+        """ Answer a raw JSON-RPC request (or batch). Returns the raw response, ``None`` to drop the connection. """
+        failure = self._injected_error()
+        if self.latency:
+            time.sleep(self.latency)
+        if failure == 'timeout':
+            time.sleep(self.hang)
+            return None
+
+        try:
+            request = json.loads(body.decode('utf-8') if isinstance(body, bytes) else body)
+        except ValueError:
+            return json.dumps({'jsonrpc': '2.0', 'id': None, 'error': {'code': -32700, 'message': 'Parse error'}})
+
+        if failure is not None:
+            error = {'code': -32003, 'message': 'Unable to acquire database lock'} if failure == 'db_lock' else \
+                {'code': -32603, 'message': 'Internal Error', 'data': {'error_id': _digest('error', self.requests)}}
+            first = request[0] if isinstance(request, list) and request else request
+            return json.dumps({'jsonrpc': '2.0', 'id': first.get('id') if isinstance(first, dict) else None,
+                               'error': error})
+
+        if isinstance(request, list):
+            return json.dumps([self._answer(r) for r in request])
+        return json.dumps(self._answer(request))
+
+    def serve_http(self, host='127.0.0.1', port=0):
+        """ Serve JSON-RPC over HTTP from a background thread. Returns the node URL. """
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                response = node.handle(body)
+                if response is None:
+                    self.close_connection = True
+                    return
+                data = response.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        server = _ThreadingHTTPServer((host, port), Handler)
+        self._start(server)
+        return 'http://%s:%d' % (host, server.server_address[1])
+
+    def serve_ws(self, host='127.0.0.1', port=0):
+        """ Serve JSON-RPC over WebSocket from a background thread. Returns the node URL. """
+        server = _ThreadingTCPServer((host, port), _WebSocketHandler)
+        server.node = self
+        self._start(server)
+        return 'ws://%s:%d' % (host, server.server_address[1])
+
+    def _start(self, server):
+        self._servers.append(server)
+        threading.Thread(target=server.serve_forever, name='FakeSteemd', daemon=True).start()
+
+    def shutdown(self):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._servers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _WebSocketHandler(socketserver.StreamRequestHandler):
+    """ Minimal RFC 6455 server side: handshake, text frames, ping and close.
+
+    Messages are answered concurrently, so multiplexing clients get responses out of order.
+    """
+
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        headers = {}
+        self.rfile.readline()
+        while True:
+            line = self.rfile.readline().decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        key = headers.get('sec-websocket-key', '').encode('ascii')
+        accept = base64.b64encode(hashlib.sha1(key + WS_GUID).digest()).decode('ascii')
+        self.wfile.write(('HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                          'Sec-WebSocket-Accept: %s\r\n\r\n' % accept).encode('ascii'))
+        self.send_lock = threading.Lock()
+        self.callbacks = []
+        self.closed = False
+
+        try:
+            self.read_messages()
+        finally:
+            self.closed = True
+
+    def read_messages(self):
+        message = b''
+        while True:
+            frame = self.read_frame()
+            if frame is None:
+                return
+            fin, opcode, payload = frame
+            if opcode == 0x8:
+                self.send_frame(0x8, payload[:2])
+                return
+            if opcode == 0x9:
+                self.send_frame(0xA, payload)
+                continue
+            if opcode in (0x0, 0x1, 0x2):
+                message += payload
+                if fin:
+                    threading.Thread(target=self.answer, args=(message,), daemon=True).start()
+                    message = b''
+
+    def answer(self, message):
+        node = self.server.node
+        if node.subscriptions and self.subscribe(message):
+            return
+        response = node.handle(message)
+        if response is None:
+            self.request.shutdown(socket.SHUT_RDWR)
+            return
+        self.send_frame(0x1, response.encode('utf-8'))
+
+    def subscribe(self, message):
+        """ Handle the subscription calls, returns whether ``message`` was one. """
+        try:
+            request = json.loads(message.decode('utf-8'))
+            method, params = FakeSteemd._parse(request)
+        except (ValueError, AttributeError, IndexError, TypeError):
+            return False
+        if method == 'set_block_applied_callback':
+            self.callbacks.append(params[0])
+            if len(self.callbacks) == 1:
+                threading.Thread(target=self.notify_blocks, daemon=True).start()
+        elif method == 'cancel_all_subscriptions':
+            self.callbacks = []
+        else:
+            return False
+        self.send_frame(0x1, json.dumps({'jsonrpc': '2.0', 'id': request.get('id'), 'result': None}).encode('utf-8'))
+        return True
+
+    def notify_blocks(self):
+        node = self.server.node
+        notified = node.chain.head_block_number
+        while self.callbacks and not self.closed:
+            head = node.chain.head_block_number
+            for num in range(notified + 1, head + 1):
+                header = node._block_header(num)
+                for callback in self.callbacks:
+                    notice = {'method': 'notice', 'params': [callback, [header]]}
+                    self.send_frame(0x1, json.dumps(notice).encode('utf-8'))
+            notified = head
+            time.sleep(0.02)
+
+    def read_exact(self, n):
+        data = self.rfile.read(n)
+        return data if len(data) == n else None
+
+    def read_frame(self):
+        head = self.read_exact(2)
+        if head is None:
+            return None
+        fin, opcode = head[0] & 0x80, head[0] & 0x0F
+        masked, length = head[1] & 0x80, head[1] & 0x7F
+        if length == 126:
+            length = struct.unpack('>H', self.read_exact(2) or b'\0\0')[0]
+        elif length == 127:
+            length = struct.unpack('>Q', self.read_exact(8) or b'\0' * 8)[0]
+        mask = self.read_exact(4) if masked else None
+        payload = self.read_exact(length) if length else b''
+        if payload is None:
+            return None
+        if mask:
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        return fin, opcode, payload
+
+    def send_frame(self, opcode, payload):
+        length = len(payload)
+        if length < 126:
+            head = struct.pack('>BB', 0x80 | opcode, length)
+        elif length < 2 ** 16:
+            head = struct.pack('>BBH', 0x80 | opcode, 126, length)
+        else:
+            head = struct.pack('>BBQ', 0x80 | opcode, 127, length)
+        with self.send_lock:
+            try:
+                self.wfile.write(head + payload)
+            except OSError:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a synthetic steem chain over JSON-RPC.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--http', type=int, default=8090, help='HTTP port')
+    parser.add_argument('--ws', type=int, default=8091, help='WebSocket port')
+    parser.add_argument('--head-block', type=int, default=1000)
+    parser.add_argument('--block-interval', type=float, default=3)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--db-lock', type=float, default=0.0, help='probability of database lock errors')
+    parser.add_argument('--internal', type=float, default=0.0, help='probability of Internal Error errors')
+    parser.add_argument('--timeout', type=float, default=0.0, help='probability of requests left hanging')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--realtime', action='store_true', help='date blocks by the wall clock')
+    args = parser.parse_args()
+
+    node = FakeSteemd(latency=args.latency, seed=args.seed, head_block=args.head_block,
+                      block_interval=args.block_interval, realtime=args.realtime,
+                      errors={'db_lock': args.db_lock, 'internal': args.internal, 'timeout': args.timeout})
+    print('HTTP on %s' % node.serve_http(args.host, args.http))
+    print('WebSocket on %s' % node.serve_ws(args.host, args.ws))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        node.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,37 @@
+import concurrent.futures
+import gzip
 import json
 import logging
 import socket
+import threading
 import time
+from collections import deque
 from functools import partial
 from http.client import RemoteDisconnected
-from itertools import cycle
+from urllib.parse import urlparse
 
 import certifi
 import urllib3
 from urllib3.connection import HTTPConnection
 from urllib3.exceptions import MaxRetryError, ReadTimeoutError, ProtocolError
 
-from steep.consts import CONDENSER_API
+from steep.consts import CONDENSER_API, DATABASE_API
 from steepbase.base_client import BaseClient
-from steepbase.exceptions import RPCError, RPCErrorRecoverable
+from steepbase.cache import SingleFlight
+from steepbase.exceptions import RPCErrorRecoverable
+from steepbase.instrumentation import CallRecord
+from steepbase.json_codec import get_codec
+from steepbase.json_stream import ErrorResponse, iter_items
+from steepbase.node_pool import NodePool
+from steepbase.rate_limit import RateLimiter
+from steepbase.retry import RetryPolicy
 
 logger = logging.getLogger(__name__)
 
+# JSON-RPC errors a node answers a batch with when it does not understand batches at all
+# (invalid request, parse error); anything else is a failure of the calls themselves
+BATCH_UNSUPPORTED_CODES = (-32600, -32700)
+
 
 class HttpClient(BaseClient):
     """ Simple Steem JSON-HTTP-RPC API
@@ -25,6 +40,27 @@ class HttpClient(BaseClient):
 
     Args:
       nodes (list): A list of Steem HTTP RPC nodes to connect to.
+      node_policy (str): How calls are routed to nodes, ``latency`` (default) or ``round_robin``.
+        See :class:`steepbase.node_pool.NodePool`.
+      node_cooldown (float): Seconds a failed node is kept out of rotation (its circuit is open).
+      breaker_threshold (int): Consecutive failures opening the circuit of a node.
+      probe (bool): Check nodes with a ``get_dynamic_global_properties`` call once their circuit is half-open,
+        before sending them real traffic again. Probes run in the background while calls go to healthy
+        nodes. Otherwise the next real call is the trial.
+      probe_timeout (float): Seconds a probe may take.
+      retry_policy (RetryPolicy): Backoff, attempts, deadline and budget of retries. Defaults to retrying
+        forever with jittered exponential backoff. See :class:`steepbase.retry.RetryPolicy`.
+      rate_limit (float, RateLimiter): Max calls per second to each node. Calls queue for their turn,
+        see :class:`steepbase.rate_limit.RateLimiter` for per-method weights and wait time stats.
+      hedge (bool): Send a second copy of slow read calls to another node, and use the first answer.
+        Broadcast calls are never hedged.
+      hedge_percentile (float): Hedge once a call is slower than this percentile of recent calls.
+      hedge_delay (float): Hedge delay used until enough latency samples were collected.
+      single_flight (bool): Identical concurrent calls share one request (see ``call_coalesced``).
+      json_codec (str): ``orjson``, ``ujson`` or ``json``. Defaults to the fastest one installed.
+      compression (bool): Ask nodes for gzip/deflate compressed responses. See ``transfer_stats()``.
+      compress_requests_over (int): Gzip request bodies larger than this many bytes, ie. big broadcasts.
+        Nodes rejecting compressed bodies get them uncompressed from then on.
 
     .. code-block:: python
 
@@ -51,12 +87,21 @@ class HttpClient(BaseClient):
     # set of endpoints which were detected to not support condenser_api
     non_appbase_nodes = set()
 
+    # set of endpoints which were detected to not support JSON-RPC batches
+    non_batch_nodes = set()
+
+    # set of endpoints which were detected to reject gzip compressed request bodies
+    non_gzip_request_nodes = set()
+
     def __init__(self, nodes, **kwargs):
         super().__init__()
 
         self.return_with_args = kwargs.get('return_with_args', False)
+        self.single_flight = SingleFlight() if kwargs.get('single_flight') else None
+        self.codec = get_codec(kwargs.get('json_codec'))
         self.re_raise = kwargs.get('re_raise', True)
         self.max_workers = kwargs.get('max_workers', None)
+        self.batch_size = kwargs.get('batch_size', 50)
 
         num_pools = kwargs.get('num_pools', 10)
         maxsize = kwargs.get('maxsize', 10)
@@ -65,6 +110,15 @@ class HttpClient(BaseClient):
         pool_block = kwargs.get('pool_block', False)
         tcp_keepalive = kwargs.get('tcp_keepalive', True)
 
+        headers = {'Content-Type': 'application/json'}
+        if kwargs.get('compression', False):
+            headers.update(urllib3.util.make_headers(accept_encoding=True))
+        self.compress_requests_over = kwargs.get('compress_requests_over', None)
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.bytes_decoded = 0
+        self._transfer_lock = threading.Lock()
+
         if tcp_keepalive:
             socket_options = HTTPConnection.default_socket_options + \
                              [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1), ]
@@ -78,7 +132,7 @@ class HttpClient(BaseClient):
             timeout=timeout,
             retries=retries,
             socket_options=socket_options,
-            headers={'Content-Type': 'application/json'},
+            headers=headers,
             cert_reqs='CERT_REQUIRED',
             ca_certs=certifi.where())
         '''
@@ -88,55 +142,219 @@ class HttpClient(BaseClient):
             **response_kw)
         '''
 
-        self.nodes = cycle(nodes)
+        self.node_pool = NodePool(
+            nodes,
+            policy=kwargs.get('node_policy', 'latency'),
+            cooldown=kwargs.get('node_cooldown', 30),
+            failure_threshold=kwargs.get('breaker_threshold', 1),
+            probe=self.probe if kwargs.get('probe', True) else None)
+        self.probe_timeout = kwargs.get('probe_timeout', 5)
+
+        rate_limit = kwargs.get('rate_limit', None)
+        if rate_limit is not None and not isinstance(rate_limit, RateLimiter):
+            rate_limit = RateLimiter(rate_limit)
+        self.rate_limiter = rate_limit
+        self.retry_policy = kwargs.get('retry_policy', None) or RetryPolicy()
         self.url = ''
         self.request = None
-        self.next_node()
+        self._pinned = None
+        self._route()
+
+        self.hedge = kwargs.get('hedge', False)
+        self.hedge_percentile = kwargs.get('hedge_percentile', 0.95)
+        self.hedge_delay = kwargs.get('hedge_delay', 1.0)
+        self.hedged_calls = 0
+        self.hedge_wins = 0
+        self._latencies = deque(maxlen=kwargs.get('hedge_window', 200))
+        self.hedge_workers = kwargs.get('hedge_workers', maxsize * 2)
+        self._hedge_executor = None
+        self._hedge_lock = threading.Lock()
 
         log_level = kwargs.get('log_level', logging.INFO)
         logger.setLevel(log_level)
 
-    def _curr_node_downgraded(self):
-        return self.url in HttpClient.non_appbase_nodes
-
-    def _downgrade_curr_node(self):
-        HttpClient.non_appbase_nodes.add(self.url)
+    @staticmethod
+    def _node_downgraded(url):
+        return url in HttpClient.non_appbase_nodes
 
-    def _is_error_recoverable(self, error):
-        assert 'message' in error, "missing error msg key: {}".format(error)
-        assert 'code' in error, "missing error code key: {}".format(error)
-        message = error['message']
-        code = error['code']
+    @staticmethod
+    def _downgrade_node(url):
+        HttpClient.non_appbase_nodes.add(url)
 
-        # common steemd error
-        # {"code"=>-32003, "message"=>"Unable to acquire database lock"}
-        if message == 'Unable to acquire database lock':
-            return True
+    def _curr_node_downgraded(self):
+        return self._node_downgraded(self.url)
 
-        # rare steemd error
-        # {"code"=>-32000, "message"=>"Unknown exception", "data"=>"0 exception: unspecified\nUnknown Exception\n[...]"}
-        if message == 'Unknown exception':
-            return True
+    def _downgrade_curr_node(self):
+        self._downgrade_node(self.url)
 
-        # generic jussi error
-        # {'code': -32603, 'message': 'Internal Error', 'data': {'error_id': 'c7a15140-f306-4727-acbd-b5e8f3717e9b',
-        #         'request': {'amzn_trace_id': 'Root=1-5ad4cb9f-9bc86fbca98d9a180850fb80', 'jussi_request_id': None}}}
-        if message == 'Internal Error' and code == -32603:
-            return True
+    @property
+    def supports_batch(self):
+        return self.url not in HttpClient.non_batch_nodes
 
-        return False
+    def _disable_batch_curr_node(self):
+        HttpClient.non_batch_nodes.add(self.url)
 
     def next_node(self):
         """ Switch to the next available node.
 
         This method will change base URL of our requests.
-        Use it when the current node goes down to change to a fallback node. """
-        self.set_node(next(self.nodes))
+        Use it when the current node goes down to change to a fallback node. As with `set_node`,
+        calls stick to that node until it fails. """
+        self.set_node(self.node_pool.select(exclude=self.url))
+
+    def _route(self, failed=None):
+        """ The node the next call should go to, avoiding ``failed``, the one which just failed.
+
+        Calls run concurrently, so each one keeps the URL returned here for all of its attempt;
+        ``self.url`` is only the node routed to last.
+        """
+        pinned = self._pinned
+        if pinned is not None:
+            if pinned != failed:
+                return pinned
+            self._pinned = None
+        url = self.node_pool.select(exclude=failed) if failed else self.node_pool.route(self.url)
+        if url != self.url:
+            self.url, self.request = url, partial(self._post, url)
+        return url
 
     def set_node(self, node_url):
-        """ Change current node to provided node URL. """
+        """ Change current node to provided node URL.
+
+        Calls go to that node instead of the one the node pool would pick, until it fails.
+        """
+        self._pinned = node_url
         self.url = node_url
-        self.request = partial(self.http.urlopen, 'POST', self.url)
+        self.request = partial(self._post, self.url)
+
+    def _compresses(self, url, body):
+        """ Whether ``body`` is sent to ``url`` gzip compressed. """
+        return self.compress_requests_over is not None and len(body) > self.compress_requests_over \
+            and url not in HttpClient.non_gzip_request_nodes
+
+    def _post(self, url, body, preload_content=True):
+        """ POST ``body`` to ``url``, gzip compressed if it is over ``compress_requests_over`` bytes
+        and the node hasn't rejected compressed bodies before.
+
+        Without ``preload_content``, the response is streamed: received bytes are not counted
+        here, and a parse error (see `call_streaming`) is left to the caller.
+        """
+        if not self._compresses(url, body):
+            response = self.http.urlopen('POST', url, body=body, preload_content=preload_content)
+            self._count_transfer(len(body), response if preload_content else None)
+            return response
+
+        compressed = gzip.compress(body)
+        response = self.http.urlopen('POST', url, body=compressed, preload_content=preload_content,
+                                     headers=dict(self.http.headers, **{'Content-Encoding': 'gzip'}))
+        self._count_transfer(len(compressed), response if preload_content else None)
+        # steemd and jussi answer bodies they can't read with a JSON-RPC parse error
+        if response.status in (400, 411, 415) or (preload_content and self._is_parse_error(response)):
+            logger.info('%s rejected a gzip compressed request (%s), sending uncompressed', url, response.status)
+            HttpClient.non_gzip_request_nodes.add(url)
+            if not preload_content:
+                response.release_conn()
+            return self._post(url, body, preload_content)
+        return response
+
+    def _is_parse_error(self, response):
+        """ Whether ``response`` is the JSON-RPC error -32700, the request body couldn't be parsed. """
+        if response.status != 200 or b'-32700' not in (response.data or b''):
+            return False
+        try:
+            result = self.codec.loads(response.data)
+        except ValueError:
+            return False
+        return isinstance(result, dict) and isinstance(result.get('error'), dict) and \
+            result['error'].get('code') == -32700
+
+    def probe(self, url):
+        """ Lightweight call checking that ``url`` answers, raising if it doesn't. """
+        api = DATABASE_API if url in HttpClient.non_appbase_nodes else CONDENSER_API
+        body = HttpClient.json_rpc_body('get_dynamic_global_properties', api=api, codec=self.codec)
+        response = self.http.urlopen('POST', url, body=body, timeout=self.probe_timeout, retries=False)
+        if response.status != 200:
+            raise RPCErrorRecoverable('non-200 response: %s from %s' % (response.status, url))
+        result = self.codec.loads(response.data)
+        if 'error' in result:
+            raise self._classify_error('get_dynamic_global_properties', result['error'])
+        self.node_pool.record_head_block(url, result['result'].get('head_block_number'))
+
+    def _count_transfer(self, sent, response=None, received=0, decoded=0):
+        if response is not None:
+            received, decoded = response.tell(), len(response.data or b'')
+        with self._transfer_lock:
+            self.bytes_sent += sent
+            self.bytes_received += received
+            self.bytes_decoded += decoded
+
+    def transfer_stats(self):
+        """ Bytes sent and received on the wire, and received after decompression. """
+        return {
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'bytes_decoded': self.bytes_decoded,
+        }
+
+    @staticmethod
+    def is_hedgeable(name):
+        """ Only idempotent reads may be sent twice. Broadcasts must never be. """
+        return not name.startswith('broadcast_')
+
+    def current_hedge_delay(self):
+        """ Seconds to wait for an answer before the call is sent to a second node. """
+        samples = sorted(self._latencies)
+        if len(samples) < 20:
+            return self.hedge_delay
+        return samples[min(len(samples) - 1, int(len(samples) * self.hedge_percentile))]
+
+    def _hedged_request(self, url, body, name=None):
+        """ Send ``body`` to ``url``, and to a second node if ``url`` is slower than the hedge delay.
+
+        Returns:
+            tuple: URL of the node that answered first, and its response.
+        """
+        with self._hedge_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.hedge_workers)
+            executor = self._hedge_executor
+
+        def post(node_url):
+            return node_url, self._post(node_url, body)
+
+        pending = {executor.submit(post, url)}
+        done, pending = concurrent.futures.wait(pending, timeout=self.current_hedge_delay())
+        if not done:
+            backup = self.node_pool.select(exclude=url)
+            # hedging is best effort, it must not queue behind the rate limit
+            if backup != url and (self.rate_limiter is None or self.rate_limiter.try_acquire(backup, name)):
+                with self._hedge_lock:
+                    self.hedged_calls += 1
+                pending.add(executor.submit(post, backup))
+
+        futures = list(done | pending)
+        error = None
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                answered_by, response = future.result()
+            except Exception as e:
+                error = e
+                continue
+            if response.status != 200 and len(futures) > 1 and not all(f.done() for f in futures):
+                continue
+            if answered_by != url:
+                with self._hedge_lock:
+                    self.hedge_wins += 1
+            return answered_by, response
+        raise error
+
+    def close(self):
+        """ Stop the threads of `executor` and of hedged requests. """
+        with self._hedge_lock:
+            executor, self._hedge_executor = self._hedge_executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+        super().close()
 
     def call(self, name, *args, **kwargs):
         """ Call a remote procedure in steemd.
@@ -146,7 +364,11 @@ class HttpClient(BaseClient):
             node fail-over, unless we are broadcasting a transaction.
             In latter case, the exception is **re-raised**.
         """
+        if self.hooks:
+            return self._instrumented(CallRecord(name, kwargs.get('api')), self._call, name, args, kwargs)
+        return self._call(name, args, kwargs)
 
+    def _call(self, name, args, kwargs, record=None):
         retry_exceptions = (
             MaxRetryError,
             ConnectionResetError,
@@ -157,66 +379,288 @@ class HttpClient(BaseClient):
             json.decoder.JSONDecodeError,
         )
 
-        tries = 0
+        retry = self.retry_policy.begin()
+        failed = None
         while True:
+            url = self._route(failed)
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(url, name)
+            started = time.monotonic()
             try:
                 body_kwargs = kwargs.copy()
-                if not self._curr_node_downgraded():
+                if not self._node_downgraded(url):
                     body_kwargs['api'] = CONDENSER_API
 
-                body = HttpClient.json_rpc_body(name, *args, **body_kwargs)
-                response = self.request(body=body)
+                body = HttpClient.json_rpc_body(name, *args, codec=self.codec, **body_kwargs)
+                if self.hedge and len(self.node_pool) > 1 and self.is_hedgeable(name):
+                    url, response = self._hedged_request(url, body, name)
+                else:
+                    response = self._post(url, body)
+                if record is not None:
+                    record.node, record.retries = url, retry.attempts
+                    record.request_bytes, record.response_bytes = len(body), len(response.data or b'')
 
                 success_codes = {*response.REDIRECT_STATUSES, 200}
                 if response.status not in success_codes:
-                    raise RPCErrorRecoverable('non-200 response: %s from %s' % (response.status, self.hostname))
+                    raise RPCErrorRecoverable(
+                        'non-200 response: %s from %s' % (response.status, urlparse(url).hostname))
 
-                result = json.loads(response.data.decode('utf-8'))
+                result = self.codec.loads(response.data)
                 assert result, 'result entirely blank'
+                self._latencies.append(time.monotonic() - started)
 
                 if 'error' in result:
                     # legacy (pre-appbase) nodes always return err code 1
                     legacy = result['error']['code'] == 1
-                    detail = result['error']['message']
-
-                    # some errors have no data key (db lock error)
-                    if 'data' not in result['error']:
-                        error = 'error'
-                    # some errors have no name key (jussi errors)
-                    elif 'name' not in result['error']['data']:
-                        error = 'unspecified error'
-                    else:
-                        error = result['error']['data']['name']
-
-                    if legacy:
-                        detail = ":".join(detail.split("\n")[0:2])
-                        if not self._curr_node_downgraded():
-                            self._downgrade_curr_node()
-                            logging.error('Downgrade-retry %s', self.hostname)
-                            continue
+                    if legacy and not self._node_downgraded(url):
+                        self._downgrade_node(url)
+                        logging.error('Downgrade-retry %s', urlparse(url).hostname)
+                        continue
 
-                    detail = ('%s from %s (%s) in %s' % (
-                        error, self.hostname, detail, name))
+                    error = self._classify_error(name, result['error'])
+                    if not isinstance(error, RPCErrorRecoverable):
+                        self.node_pool.record_success(url, time.monotonic() - started)
+                    raise error
 
-                    if self._is_error_recoverable(result['error']):
-                        raise RPCErrorRecoverable(detail)
-                    else:
-                        raise RPCError(detail)
+                self.node_pool.record_success(url, time.monotonic() - started)
+                if name == 'get_dynamic_global_properties' and isinstance(result['result'], dict):
+                    self.node_pool.record_head_block(url, result['result'].get('head_block_number'))
 
                 return result['result']
 
             except retry_exceptions as e:
-                if tries >= 10:
-                    logger.error('Failed to call Steem API after %d atempts - %s: %s', tries, e.__class__.__name__, e)
-                tries += 1
-                logger.warning('Retry in %ds - %s: %s', tries, e.__class__.__name__, e)
-                time.sleep(tries)
-                self.next_node()
+                self.node_pool.record_failure(url)
+                delay = retry.backoff(e)
+                if record is not None:
+                    record.node, record.retries = url, retry.attempts
+                if retry.attempts >= 10:
+                    logger.error('Failed to call Steem API after %d atempts - %s: %s',
+                                 retry.attempts, e.__class__.__name__, e)
+                logger.warning('Retry in %.1fs - %s: %s', delay, e.__class__.__name__, e)
+                time.sleep(delay)
+                failed = url
+                continue
+
+            except Exception as e:
+                logger.error('Unexpected exception - %s: %s', e.__class__.__name__, e, extra={
+                    'err': e,
+                    'url': url
+                })
+                raise e
+
+    def call_streaming(self, name, *args, path='result', api=None, chunk_size=2 ** 16):
+        """ Call ``name``, parsing the response incrementally as it arrives, and yield the items
+        of the array (or the ``(key, value)`` pairs of the object) at ``path``.
+
+        Peak memory is bounded by the largest item rather than by the whole response, which
+        makes a difference for ``get_account_history`` with a large limit, busy blocks or ``get_state``.
+
+        The request is routed, rate limited, compressed and counted in `transfer_stats` like in
+        `call`, and failures are retried the same way until the first item was yielded.
+
+        .. code-block:: python
+
+           for index, entry in client.call_streaming('get_account_history', 'steemit', -1, 10000,
+                                                     api='database_api'):
+               ...
+
+        """
+        retry_exceptions = (
+            MaxRetryError,
+            ConnectionResetError,
+            ReadTimeoutError,
+            RemoteDisconnected,
+            ProtocolError,
+            RPCErrorRecoverable,
+            ValueError,  # a truncated or malformed body
+        )
+
+        retry = self.retry_policy.begin()
+        failed = None
+        while True:
+            url = self._route(failed)
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(url, name)
+            started = time.monotonic()
+            yielded = False
+            response = None
+            decoded = [0]
+            try:
+                body_api = api if self._node_downgraded(url) else CONDENSER_API
+                body = HttpClient.json_rpc_body(name, *args, api=body_api, codec=self.codec)
+                compressed = self._compresses(url, body)
+                response = self._post(url, body, preload_content=False)
+                if response.status != 200:
+                    raise RPCErrorRecoverable(
+                        'non-200 response: %s from %s' % (response.status, urlparse(url).hostname))
+
+                def chunks():
+                    for chunk in response.stream(chunk_size):
+                        decoded[0] += len(chunk)
+                        yield chunk
+
+                try:
+                    for item in iter_items(chunks(), path, self.codec.loads):
+                        yield item
+                        yielded = True
+                except ErrorResponse as e:
+                    if e.error.get('code') == -32700 and compressed:
+                        # the node couldn't read the compressed body, see `_post`
+                        logger.info('%s rejected a gzip compressed request, sending uncompressed', url)
+                        HttpClient.non_gzip_request_nodes.add(url)
+                        continue
+                    # legacy (pre-appbase) nodes always return err code 1
+                    if e.error.get('code') == 1 and not self._node_downgraded(url):
+                        self._downgrade_node(url)
+                        logging.error('Downgrade-retry %s', urlparse(url).hostname)
+                        continue
+                    error = self._classify_error(name, e.error)
+                    if not isinstance(error, RPCErrorRecoverable):
+                        self.node_pool.record_success(url, time.monotonic() - started)
+                    raise error
+
+                self.node_pool.record_success(url, time.monotonic() - started)
+                return
+
+            except retry_exceptions as e:
+                if yielded:
+                    raise
+                self.node_pool.record_failure(url)
+                delay = retry.backoff(e)
+                logger.warning('Retry in %.1fs - %s: %s', delay, e.__class__.__name__, e)
+                time.sleep(delay)
+                failed = url
+
+            finally:
+                if response is not None:
+                    self._count_transfer(0, received=response.tell(), decoded=decoded[0])
+                    response.release_conn()
+
+    def call_batch(self, calls):
+        """ Call several remote procedures in steemd, using as few HTTP requests as possible.
+
+        Calls are sent as JSON-RPC 2.0 batches of up to ``batch_size`` items. Nodes
+        which reject array bodies are remembered, and the calls are then issued one by one.
+
+        Args:
+            calls (list): A list of ``(name, args, api)`` tuples. ``api`` may be omitted.
+
+        Returns:
+            list: Results, in the order of ``calls``. Item errors are mapped to `RPCError`
+            subclasses (or returned as-is when ``re_raise`` is off).
+        """
+        calls = [self._unpack_batch_call(c) for c in calls]
+        results = []
+        for i in range(0, len(calls), self.batch_size):
+            chunk = calls[i:i + self.batch_size]
+            if self.hooks:
+                methods = {name for name, _, _ in chunk}
+                record = CallRecord(methods.pop() if len(methods) == 1 else 'batch')
+                results.extend(self._instrumented(record, self._call_batch, chunk))
+            else:
+                results.extend(self._call_batch(chunk))
+        return results
+
+    def _call_batch(self, calls, record=None):
+        retry_exceptions = (
+            MaxRetryError,
+            ConnectionResetError,
+            ReadTimeoutError,
+            RemoteDisconnected,
+            ProtocolError,
+            RPCErrorRecoverable,
+            json.decoder.JSONDecodeError,
+        )
+
+        retry = self.retry_policy.begin()
+        failed = None
+        while True:
+            url = self._route(failed)
+            if url in HttpClient.non_batch_nodes:
+                return super().call_batch(calls)
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(url, *[name for name, _, _ in calls])
+
+            started = time.monotonic()
+            try:
+                bodies = []
+                for _id, (name, args, api) in enumerate(calls):
+                    body_kwargs = {'api': api, '_id': _id, 'as_json': False}
+                    if not self._node_downgraded(url):
+                        body_kwargs['api'] = CONDENSER_API
+                    bodies.append(HttpClient.json_rpc_body(name, *args, **body_kwargs))
+
+                body = self.codec.dumps(bodies)
+                response = self._post(url, body)
+                if record is not None:
+                    record.node, record.retries = url, retry.attempts
+                    record.request_bytes, record.response_bytes = len(body), len(response.data or b'')
+
+                success_codes = {*response.REDIRECT_STATUSES, 200}
+                if response.status not in success_codes:
+                    raise RPCErrorRecoverable(
+                        'non-200 response: %s from %s' % (response.status, urlparse(url).hostname))
+
+                result = self.codec.loads(response.data)
+                assert result, 'result entirely blank'
+
+                if not isinstance(result, list):
+                    # node answered the array with a single error object
+                    error = result.get('error') if isinstance(result, dict) else None
+                    if not isinstance(error, dict) or error.get('code') in BATCH_UNSUPPORTED_CODES:
+                        HttpClient.non_batch_nodes.add(url)
+                        logger.warning('Batch requests unsupported by %s', urlparse(url).hostname)
+                        continue
+                    if 'message' in error and 'code' in error and self._is_error_recoverable(error):
+                        raise RPCErrorRecoverable(
+                            '%s from %s in batch' % (error['message'], urlparse(url).hostname))
+                    raise self._error_to_exception(error)
+
+                items = {item.get('id'): item for item in result}
+                if len(items) != len(calls) or set(items) != set(range(len(calls))):
+                    raise RPCErrorRecoverable('incomplete batch response from %s' % urlparse(url).hostname)
+
+                errors = [items[_id]['error'] for _id in range(len(calls)) if 'error' in items[_id]]
+
+                # legacy (pre-appbase) nodes always return err code 1
+                if any(error.get('code') == 1 for error in errors) and not self._node_downgraded(url):
+                    self._downgrade_node(url)
+                    logging.error('Downgrade-retry %s', urlparse(url).hostname)
+                    continue
+
+                for error in errors:
+                    if 'message' in error and 'code' in error and self._is_error_recoverable(error):
+                        raise RPCErrorRecoverable(
+                            '%s from %s in batch' % (error['message'], urlparse(url).hostname))
+
+                self.node_pool.record_success(url, time.monotonic() - started)
+                results = []
+                for _id in range(len(calls)):
+                    item = items[_id]
+                    if 'error' not in item:
+                        results.append(item.get('result'))
+                    elif self.re_raise:
+                        raise self._error_to_exception(item['error'])
+                    else:
+                        results.append(item['error'])
+                return results
+
+            except retry_exceptions as e:
+                self.node_pool.record_failure(url)
+                delay = retry.backoff(e)
+                if record is not None:
+                    record.node, record.retries = url, retry.attempts
+                if retry.attempts >= 10:
+                    logger.error('Failed to call Steem API after %d atempts - %s: %s',
+                                 retry.attempts, e.__class__.__name__, e)
+                logger.warning('Retry in %.1fs - %s: %s', delay, e.__class__.__name__, e)
+                time.sleep(delay)
+                failed = url
                 continue
 
             except Exception as e:
                 logger.error('Unexpected exception - %s: %s', e.__class__.__name__, e, extra={
                     'err': e,
-                    'request': self.request
+                    'url': url
                 })
                 raise e
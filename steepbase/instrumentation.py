@@ -0,0 +1,201 @@
+import bisect
+import logging
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+
+class CallRecord(object):
+    """ What a client hook is told about one RPC call.
+
+    Attributes:
+        method (str): RPC method, ie. ``get_block``. Batches of one method are recorded
+            under that method, mixed batches as ``batch``.
+        api (str): API the method was requested from, if any.
+        node (str): URL of the node which answered (or was tried last).
+        latency (float): Seconds from the call until its result, retries included.
+        request_bytes (int): Size of the request body.
+        response_bytes (int): Size of the response body, after decompression.
+        retries (int): Number of retries.
+        outcome (str): ``ok``, or the name of the exception the call raised.
+    """
+
+    __slots__ = ('method', 'api', 'node', 'latency', 'request_bytes', 'response_bytes', 'retries', 'outcome')
+
+    def __init__(self, method, api=None):
+        self.method = method
+        self.api = api
+        self.node = None
+        self.latency = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.retries = 0
+        self.outcome = None
+
+    def __repr__(self):
+        return '<CallRecord %s>' % ' '.join('%s=%r' % (k, getattr(self, k)) for k in self.__slots__)
+
+
+class Histogram(object):
+    """ Latency distribution: Prometheus style cumulative buckets, plus a window of recent
+    samples for exact quantiles. """
+
+    buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+    def __init__(self, window=1000):
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+
+    def quantile(self, q):
+        """ ``q`` quantile (0..1) of the recent samples, ``None`` without samples. """
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield bound, total
+
+
+class MethodStats(object):
+    """ Aggregates of the calls of one method to one node. """
+
+    def __init__(self, window=1000):
+        self.latency = Histogram(window)
+        self.outcomes = {}
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.retries = 0
+
+    def add(self, record):
+        self.latency.observe(record.latency)
+        self.outcomes[record.outcome] = self.outcomes.get(record.outcome, 0) + 1
+        self.request_bytes += record.request_bytes
+        self.response_bytes += record.response_bytes
+        self.retries += record.retries
+
+    def as_dict(self):
+        return {
+            'calls': self.latency.count,
+            'p50': self.latency.quantile(0.5),
+            'p95': self.latency.quantile(0.95),
+            'p99': self.latency.quantile(0.99),
+            'total_time': self.latency.sum,
+            'request_bytes': self.request_bytes,
+            'response_bytes': self.response_bytes,
+            'retries': self.retries,
+            'outcomes': dict(self.outcomes),
+        }
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class CallStats(object):
+    """ Client hook keeping per method and node latency histograms and byte counters in memory.
+
+    Args:
+        window (int): Number of recent latency samples quantiles are computed from, per method and node.
+        prefix (str): Prefix of the exported Prometheus metric names.
+
+    .. code-block:: python
+
+       s = Steemd(instrument=True)
+       s.get_block(1)
+       s.call_stats.summary()
+       # {('get_block', 'api.steemit.com'): {'calls': 1, 'p50': 0.21, 'p95': 0.21, ...}}
+
+       s.call_stats.serve(9123)  # Prometheus scrapes http://host:9123/metrics
+
+    """
+
+    def __init__(self, window=1000, prefix='steem_rpc'):
+        self.window = window
+        self.prefix = prefix
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        key = (record.method, urlparse(record.node).hostname if record.node else None)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = MethodStats(self.window)
+            stats.add(record)
+
+    def summary(self):
+        """ ``{(method, node hostname): stats}`` with latency quantiles, totals, and outcome counts. """
+        with self._lock:
+            return {key: stats.as_dict() for key, stats in self._stats.items()}
+
+    def clear(self):
+        with self._lock:
+            self._stats.clear()
+
+    def prometheus(self):
+        """ All metrics in the Prometheus text exposition format. """
+        p = self.prefix
+        lines = []
+        with self._lock:
+            items = sorted(self._stats.items(), key=lambda item: tuple(map(str, item[0])))
+
+            lines += ['# HELP %s_call_duration_seconds Time spent per call, retries included.' % p,
+                      '# TYPE %s_call_duration_seconds histogram' % p]
+            for (method, node), stats in items:
+                labels = 'method="%s",node="%s"' % (_label(method), _label(node))
+                for bound, count in stats.latency.cumulative():
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append('%s_call_duration_seconds_bucket{%s,le="%s"} %d' % (p, labels, le, count))
+                lines.append('%s_call_duration_seconds_sum{%s} %r' % (p, labels, stats.latency.sum))
+                lines.append('%s_call_duration_seconds_count{%s} %d' % (p, labels, stats.latency.count))
+
+            lines += ['# HELP %s_calls_total Calls by outcome.' % p, '# TYPE %s_calls_total counter' % p]
+            for (method, node), stats in items:
+                for outcome, count in sorted(stats.outcomes.items(), key=lambda item: str(item[0])):
+                    lines.append('%s_calls_total{method="%s",node="%s",outcome="%s"} %d' % (
+                        p, _label(method), _label(node), _label(outcome), count))
+
+            for metric, attr, help_text in (('request_bytes_total', 'request_bytes', 'Request body bytes.'),
+                                            ('response_bytes_total', 'response_bytes', 'Response body bytes.'),
+                                            ('retries_total', 'retries', 'Retried attempts.')):
+                lines += ['# HELP %s_%s %s' % (p, metric, help_text), '# TYPE %s_%s counter' % (p, metric)]
+                for (method, node), stats in items:
+                    lines.append('%s_%s{method="%s",node="%s"} %d' % (
+                        p, metric, _label(method), _label(node), getattr(stats, attr)))
+
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port, addr=''):
+        """ Serve `prometheus` at ``/metrics`` from a background thread. Returns the ``HTTPServer``. """
+        stats = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                data = stats.prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer((addr, port), Handler)
+        threading.Thread(target=server.serve_forever, name='CallStats-exporter', daemon=True).start()
+        return server
@@ -0,0 +1,90 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+class JsonCodec(object):
+    """ Encode requests to, and decode responses from, UTF-8 JSON bytes.
+
+    This one uses the standard library. Faster codecs are picked by :func:`get_codec`
+    when ``orjson`` or ``ujson`` is installed. Decode errors are always raised as
+    ``json.JSONDecodeError``, so the clients' retry handling works with any codec.
+    """
+
+    name = 'json'
+
+    @staticmethod
+    def dumps(obj):
+        return json.dumps(obj, ensure_ascii=False).encode('utf8')
+
+    @staticmethod
+    def loads(data):
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes(data).decode('utf-8')
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    name = 'orjson'
+
+    @staticmethod
+    def dumps(obj):
+        return orjson.dumps(obj)
+
+    @staticmethod
+    def loads(data):
+        # orjson parses bytes directly, and its JSONDecodeError subclasses json's
+        return orjson.loads(data)
+
+
+class UjsonCodec(JsonCodec):
+    name = 'ujson'
+
+    @staticmethod
+    def dumps(obj):
+        return ujson.dumps(obj, ensure_ascii=False).encode('utf8')
+
+    @staticmethod
+    def loads(data):
+        if isinstance(data, (bytearray, memoryview)):
+            data = bytes(data)
+        try:
+            return ujson.loads(data)
+        except ValueError as e:
+            raise json.JSONDecodeError(str(e), '', 0)
+
+
+#: installed codecs by name, fastest first
+available_codecs = {}
+if orjson is not None:
+    available_codecs['orjson'] = OrjsonCodec
+if ujson is not None:
+    available_codecs['ujson'] = UjsonCodec
+available_codecs['json'] = JsonCodec
+
+
+def get_codec(codec=None):
+    """ Resolve the JSON codec to use.
+
+    Args:
+        codec (None, str, JsonCodec): A codec name (``orjson``, ``ujson`` or ``json``),
+            a codec object, or ``None`` for the fastest installed one.
+    """
+    if codec is None:
+        return next(iter(available_codecs.values()))
+    if isinstance(codec, str):
+        if codec not in available_codecs:
+            raise ValueError('JSON codec %r is not installed, use one of %s' % (codec, ', '.join(available_codecs)))
+        return available_codecs[codec]
+    return codec
+
+
+default_codec = get_codec()
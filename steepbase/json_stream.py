@@ -0,0 +1,203 @@
+import json
+import re
+
+_STRING_SPECIAL = re.compile(rb'["\\]')
+_VALUE_SPECIAL = re.compile(rb'["\[\]{}]')
+_WHITESPACE = b' \t\r\n'
+
+
+class ErrorResponse(Exception):
+    """ The response was a JSON-RPC error. ``error`` holds the decoded error object. """
+
+    def __init__(self, error):
+        super().__init__(error.get('message') if isinstance(error, dict) else error)
+        self.error = error
+
+
+class _Reader(object):
+    """ Byte buffer over an iterable of chunks. Everything before ``mark`` (or ``pos``) can be dropped. """
+
+    def __init__(self, chunks, loads=None):
+        self.chunks = iter(chunks)
+        self.loads = loads or (lambda data: json.loads(data.decode('utf-8')))
+        self.buf = b''
+        self.pos = 0
+        self.mark = None
+
+    def fill(self):
+        chunk = next(self.chunks, None)
+        while chunk is not None and not chunk:
+            chunk = next(self.chunks, None)
+        if chunk is None:
+            return False
+        keep = self.pos if self.mark is None else self.mark
+        self.buf = self.buf[keep:] + bytes(chunk)
+        self.pos -= keep
+        if self.mark is not None:
+            self.mark = 0
+        return True
+
+    def peek(self):
+        """ Next non-whitespace byte, without consuming it. """
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos:self.pos + 1]
+            if not self.fill():
+                raise ValueError('unexpected end of JSON stream')
+
+    def expect(self, token):
+        if self.peek() != token:
+            raise ValueError('expected %r at %r' % (token, self.buf[self.pos:self.pos + 20]))
+        self.pos += 1
+
+    def skip_string(self):
+        """ Skip a string, ``pos`` being just past its opening quote. """
+        while True:
+            match = _STRING_SPECIAL.search(self.buf, self.pos)
+            if match is None:
+                self.pos = len(self.buf)
+            elif match.group() == b'"':
+                self.pos = match.end()
+                return
+            elif match.end() < len(self.buf):
+                self.pos = match.end() + 1
+                continue
+            else:
+                # backslash at the end of the buffer, the escaped byte is still to come
+                self.pos = match.start()
+            if not self.fill():
+                raise ValueError('unterminated string in JSON stream')
+
+    def read_string(self):
+        self.expect(b'"')
+        start = self.pos - 1
+        self.mark = start
+        self.skip_string()
+        start, self.mark = self.mark, None
+        return json.loads(self.buf[start:self.pos].decode('utf-8'))
+
+    def skip_value(self):
+        """ Skip a value, whatever its size, without decoding it. """
+        first = self.peek()
+        if first not in (b'[', b'{', b'"'):
+            # number, true, false or null
+            while True:
+                end = self.pos
+                while end < len(self.buf) and self.buf[end:end + 1] not in b',]} \t\r\n':
+                    end += 1
+                self.pos = end
+                if end < len(self.buf) or not self.fill():
+                    return
+        self.pos += 1
+        if first == b'"':
+            self.skip_string()
+            return
+        depth = 1
+        while depth:
+            match = _VALUE_SPECIAL.search(self.buf, self.pos)
+            if match is None:
+                self.pos = len(self.buf)
+                if not self.fill():
+                    raise ValueError('unexpected end of JSON stream')
+                continue
+            self.pos = match.end()
+            token = match.group()
+            if token == b'"':
+                self.skip_string()
+            elif token in b'[{':
+                depth += 1
+            else:
+                depth -= 1
+
+    def read_value(self):
+        """ Decode the next value. Only its own bytes are kept in memory. """
+        self.peek()
+        self.mark = self.pos
+        self.skip_value()
+        start, self.mark = self.mark, None
+        return self.loads(self.buf[start:self.pos])
+
+
+def _items(reader):
+    """ Items of the array, or ``(key, value)`` pairs of the object, at the reader's position. """
+    token = reader.peek()
+    if token == b'[':
+        reader.pos += 1
+        if reader.peek() == b']':
+            reader.pos += 1
+            return
+        while True:
+            yield reader.read_value()
+            token = reader.peek()
+            reader.pos += 1
+            if token == b']':
+                return
+    elif token == b'{':
+        reader.pos += 1
+        if reader.peek() == b'}':
+            reader.pos += 1
+            return
+        while True:
+            key = reader.read_string()
+            reader.expect(b':')
+            yield key, reader.read_value()
+            token = reader.peek()
+            reader.pos += 1
+            if token == b'}':
+                return
+    else:
+        # null (ie. a block which doesn't exist), or a scalar
+        value = reader.read_value()
+        if value is not None:
+            yield value
+
+
+def _walk(reader, path, top=False):
+    reader.expect(b'{')
+    if reader.peek() == b'}':
+        reader.pos += 1
+        return
+    while True:
+        key = reader.read_string()
+        reader.expect(b':')
+        if key == path[0]:
+            if len(path) == 1:
+                yield from _items(reader)
+            elif reader.peek() == b'{':
+                yield from _walk(reader, path[1:])
+            else:
+                reader.skip_value()
+        elif top and key == 'error':
+            raise ErrorResponse(reader.read_value())
+        else:
+            reader.skip_value()
+        token = reader.peek()
+        reader.pos += 1
+        if token == b'}':
+            return
+
+
+def iter_items(chunks, path='result', loads=None):
+    """ Incrementally parse a JSON-RPC response, yielding the items found at ``path``.
+
+    Only the item being decoded is held in memory, the rest of the response is scanned past.
+
+    Args:
+        chunks (iterable): The response body, as chunks of bytes.
+        path (str, list): Keys leading to an array (whose items are yielded) or to an object
+            (whose ``(key, value)`` pairs are yielded), ie. ``result.transactions``.
+        loads (callable): Decodes one item from bytes, ie. a codec's ``loads``.
+
+    Raises:
+        ErrorResponse: If the response is a JSON-RPC error.
+
+    .. code-block:: python
+
+       for trx in iter_items(response.stream(2 ** 16), 'result.transactions'):
+           ...
+
+    """
+    path = path.split('.') if isinstance(path, str) else list(path)
+    return _walk(_Reader(chunks, loads), path, top=True)
@@ -0,0 +1,287 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+#: circuit states, see :class:`NodePool`
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class NodeStats(object):
+    """ Health statistics of a single node, as tracked by :class:`NodePool`.
+
+    Args:
+        url (str): Node URL.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        #: exponentially weighted moving average of call latency, in seconds (``None`` until first sample)
+        self.latency = None
+        #: exponentially weighted moving average of failures (0 = never fails, 1 = always fails)
+        self.error_rate = 0.0
+        #: last ``head_block_number`` this node reported
+        self.head_block = None
+        #: circuit breaker state, ``closed`` (taking load), ``open`` or ``half_open``
+        self.state = CLOSED
+        #: ``time.monotonic()`` until which an open circuit keeps the node out of rotation
+        self.cooldown_until = 0.0
+        #: failures since the last success
+        self.consecutive_failures = 0
+        #: ``time.monotonic()`` when a half-open node's probe (or trial call) started, ``None`` if none is under way
+        self.probe_started = None
+        self.calls = 0
+        self.errors = 0
+
+    def in_cooldown(self, now=None):
+        return self.state == OPEN and (now or time.monotonic()) < self.cooldown_until
+
+    def as_dict(self):
+        return {
+            'latency': self.latency,
+            'error_rate': self.error_rate,
+            'head_block': self.head_block,
+            'state': self.state,
+            'cooldown': max(0.0, self.cooldown_until - time.monotonic()),
+            'calls': self.calls,
+            'errors': self.errors,
+        }
+
+
+class NodePool(object):
+    """ Pick the node each call should go to.
+
+    With the ``latency`` policy (default) every call goes to the healthy node with the best
+    score: its latency EWMA, inflated by its error rate. Nodes which have never answered
+    score best, so each one gets probed. The ``round_robin`` policy rotates through nodes
+    the way ``itertools.cycle`` did.
+
+    Every node has a circuit breaker. After ``failure_threshold`` consecutive failures its
+    circuit opens, and the node is kept out of rotation for ``cooldown`` seconds. Then the
+    circuit is half-open: the node is sent a single ``probe(url)`` (or, without a probe, a
+    single real call), and only takes load again once that succeeds. A failure re-opens it.
+    Probes run in background threads, so the call which found them due goes on to a healthy
+    node at once; it only waits for them when no node is healthy.
+
+    Nodes whose last reported head block lags the best known head by more than
+    ``max_head_lag`` blocks are skipped too. If no node is healthy, the one that comes back
+    first is used anyway.
+
+    Args:
+        nodes (list): Node URLs.
+        policy (str): ``latency`` or ``round_robin``.
+        cooldown (float): Seconds an open circuit keeps a node out of rotation.
+        alpha (float): Weight of the newest sample in the moving averages.
+        max_head_lag (int): Max number of blocks a node may be behind the best known head.
+        failure_threshold (int): Consecutive failures opening the circuit of a node.
+        probe (callable): ``probe(url)`` checking that a half-open node answers again, raising if not.
+
+    .. code-block:: python
+
+       pool = client.node_pool
+       pool.policy = 'round_robin'
+       pool.scores()
+       # {'https://api.steemit.com': 0.184, 'https://steemd.privex.io': 0.421}
+
+    """
+
+    policies = ('latency', 'round_robin')
+
+    def __init__(self, nodes, policy='latency', cooldown=30, alpha=0.3, max_head_lag=20,
+                 failure_threshold=1, probe=None):
+        if not nodes:
+            raise ValueError('at least one node is required')
+        self.nodes = [NodeStats(url) for url in nodes]
+        self._by_url = {node.url: node for node in self.nodes}
+        self.policy = policy
+        self.cooldown = cooldown
+        self.alpha = alpha
+        self.max_head_lag = max_head_lag
+        self.failure_threshold = failure_threshold
+        self.probe = probe
+        self._rr_index = -1
+        self._probes = {}
+        self._lock = threading.Lock()
+
+    @property
+    def policy(self):
+        return self._policy
+
+    @policy.setter
+    def policy(self, policy):
+        if policy not in self.policies:
+            raise ValueError('unknown routing policy %r, use one of %s' % (policy, ', '.join(self.policies)))
+        self._policy = policy
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __getitem__(self, url):
+        return self._by_url[url]
+
+    def score(self, node):
+        """ Lower is better. Untried nodes score 0. """
+        if node.latency is None:
+            return 0.0
+        return node.latency * (1 + 10 * node.error_rate)
+
+    def scores(self):
+        """ Current score of every node, lower is better. """
+        with self._lock:
+            return {node.url: self.score(node) for node in self.nodes}
+
+    def stats(self):
+        """ Health statistics of every node. """
+        with self._lock:
+            return {node.url: node.as_dict() for node in self.nodes}
+
+    def _circuit(self, node, now):
+        """ Circuit state of ``node``, turning open circuits whose cooldown ran out half-open. """
+        if node.state == OPEN and now >= node.cooldown_until:
+            node.state = HALF_OPEN
+            logger.debug('Circuit of %s is half-open', node.url)
+        return node.state
+
+    def is_healthy(self, node, now=None):
+        if self._circuit(node, now or time.monotonic()) != CLOSED:
+            return False
+        best_head = max((n.head_block for n in self.nodes if n.head_block is not None), default=None)
+        if best_head is not None and node.head_block is not None:
+            return best_head - node.head_block <= self.max_head_lag
+        return True
+
+    def select(self, exclude=None):
+        """ Return the URL of the node the next call should go to.
+
+        Args:
+            exclude (str): Avoid this node (ie. the one which just failed), unless it's the only choice.
+        """
+        if self.probe is not None:
+            self._probe_half_open()
+            url = self._pick(exclude, fallback=False)
+            if url is not None:
+                return url
+            # nothing healthy: the probes under way may bring a node back
+            self.join_probes()
+        return self._pick(exclude)
+
+    def _pick(self, exclude, fallback=True):
+        with self._lock:
+            now = time.monotonic()
+            candidates = [n for n in self.nodes if n.url != exclude] or self.nodes
+            if self.probe is None:
+                for node in candidates:
+                    if self._circuit(node, now) == HALF_OPEN and self._probe_due(node, now):
+                        # the one trial call which decides whether the circuit closes again
+                        node.probe_started = now
+                        return node.url
+
+            healthy = [n for n in candidates if self.is_healthy(n, now)]
+            if not healthy:
+                if not fallback:
+                    return None
+                return min(candidates, key=lambda n: n.cooldown_until).url
+
+            if self.policy == 'round_robin':
+                for _ in range(len(self.nodes)):
+                    self._rr_index = (self._rr_index + 1) % len(self.nodes)
+                    node = self.nodes[self._rr_index]
+                    if node in healthy:
+                        return node.url
+
+            return min(healthy, key=self.score).url
+
+    def route(self, current=None):
+        """ Return the URL the next call should go to, given the node currently in use.
+
+        ``round_robin`` sticks to the current node while it is healthy, ``latency`` re-evaluates every call.
+        """
+        if self.policy == 'round_robin' and current in self._by_url:
+            with self._lock:
+                if self.is_healthy(self._by_url[current]):
+                    return current
+            return self.select(exclude=current)
+        return self.select()
+
+    def _probe_due(self, node, now):
+        # a probe whose outcome was never recorded is given up on after ``cooldown``
+        return node.probe_started is None or now - node.probe_started > self.cooldown
+
+    def _probe_half_open(self):
+        with self._lock:
+            now = time.monotonic()
+            for node in self.nodes:
+                if self._circuit(node, now) == HALF_OPEN and self._probe_due(node, now):
+                    node.probe_started = now
+                    thread = threading.Thread(target=self._run_probe, args=(node.url,),
+                                              name='probe-%s' % node.url, daemon=True)
+                    self._probes[node.url] = thread
+                    thread.start()
+
+    def _run_probe(self, url):
+        started = time.monotonic()
+        try:
+            self.probe(url)
+        except Exception as e:
+            logger.info('Probe of %s failed - %s: %s', url, e.__class__.__name__, e)
+            self.record_failure(url, time.monotonic() - started)
+        else:
+            self.record_success(url, time.monotonic() - started)
+        finally:
+            with self._lock:
+                if self._probes.get(url) is threading.current_thread():
+                    del self._probes[url]
+
+    def join_probes(self, timeout=None):
+        """ Wait for the half-open probes under way to finish. """
+        with self._lock:
+            probes = list(self._probes.values())
+        for thread in probes:
+            thread.join(timeout)
+
+    def _average(self, previous, sample):
+        if previous is None:
+            return sample
+        return self.alpha * sample + (1 - self.alpha) * previous
+
+    def record_success(self, url, latency):
+        """ Account a successful call which took ``latency`` seconds. """
+        with self._lock:
+            node = self._by_url.get(url)
+            if node is None:
+                return
+            node.calls += 1
+            node.latency = self._average(node.latency, latency)
+            node.error_rate = self._average(node.error_rate, 0.0)
+            node.consecutive_failures = 0
+            node.probe_started = None
+            if node.state != CLOSED:
+                logger.info('Circuit of %s closed', url)
+            node.state = CLOSED
+            node.cooldown_until = 0.0
+
+    def record_failure(self, url, latency=None):
+        """ Account a failed call, opening the node's circuit if it failed too often (or while half-open). """
+        with self._lock:
+            node = self._by_url.get(url)
+            if node is None:
+                return
+            node.calls += 1
+            node.errors += 1
+            node.consecutive_failures += 1
+            if latency is not None:
+                node.latency = self._average(node.latency, latency)
+            node.error_rate = self._average(node.error_rate, 1.0)
+            node.probe_started = None
+            if node.state == HALF_OPEN or node.consecutive_failures >= self.failure_threshold:
+                node.state = OPEN
+                node.cooldown_until = time.monotonic() + self.cooldown
+                logger.debug('Circuit of %s open for %ss', url, self.cooldown)
+
+    def record_head_block(self, url, head_block):
+        """ Remember the last head block number reported by a node. """
+        with self._lock:
+            node = self._by_url.get(url)
+            if node is not None and head_block is not None:
+                node.head_block = max(node.head_block or 0, int(head_block))
@@ -2,14 +2,16 @@ import importlib
 import json
 import re
 import struct
+from binascii import unhexlify
 from collections import OrderedDict
+from decimal import Decimal
 
 from steepbase.account import PublicKey
 from steepbase.operationids import operations
 from steepbase.types import (
-    Int16, Uint16, Uint32, Uint64,
-    String, Bytes, Array, PointInTime, Bool,
-    Optional, Map, Id, JsonObj, StaticVariant)
+    Int16, Uint16, Uint32, Uint64, Int64,
+    String, Bytes, FixedBytes, Void, Array, Set, PointInTime, Signature, Bool,
+    Optional, Map, Version, JsonObj, StaticVariant, varint)
 
 default_prefix = "STM"
 
@@ -36,8 +38,13 @@ class Operation:
             self.name = self.to_class_name(name)
             try:
                 klass = self.get_class(self.name)
-            except:
-                raise NotImplementedError("Unimplemented Operation %s" % self.name)
+            except AttributeError:
+                # operations without a class of their own are built from their wire layout
+                if name not in operation_layouts:
+                    raise NotImplementedError("Unimplemented Operation %s" % self.name)
+                data = dict(op[1])
+                prefix = data.pop("prefix", default_prefix)
+                self.op = LayoutObject(data, prefix, name=name)
             else:
                 self.op = klass(op[1])
         else:
@@ -72,7 +79,7 @@ class Operation:
         return getattr(module, class_name)
 
     def __bytes__(self):
-        return bytes(Id(self.opId)) + bytes(self.op)
+        return varint(self.opId) + bytes(self.op)
 
     def __str__(self):
         return json.dumps([
@@ -98,13 +105,8 @@ class GrapheneObject(object):
     def __bytes__(self):
         if self.data is None:
             return bytes()
-        b = b''
-        for name, value in self.data.items():
-            if isinstance(value, str):
-                b += bytes(value, 'utf-8')
-            else:
-                b += bytes(value)
-        return b
+        return b''.join(bytes(value, 'utf-8') if isinstance(value, str) else bytes(value)
+                        for value in self.data.values())
 
     def __json__(self):
         if self.data is None:
@@ -127,6 +129,68 @@ class GrapheneObject(object):
         return self.__json__()
 
 
+class LayoutObject(GrapheneObject):
+    """ An operation built from its layout in :data:`operation_layouts`.
+
+    The operation classes check and normalize their fields, then hand them over as the API shows
+    them. They are serialized right away with the packing plan compiled from the layout (see
+    :class:`steepbase.wire.WireEncoder`), so ``bytes()`` builds no object per field. The
+    :mod:`steepbase.types` objects of ``data`` are only built when asked for, ie. by ``json()``.
+
+    Args:
+        fields (dict): The fields, as the API shows them.
+        prefix (str): Prefix of public keys (``default_prefix`` if not given).
+        name (str): Name of the operation, by default the one of the class (``transfer`` for ``Transfer``).
+    """
+    fields = None
+    _data = None
+    _bytes = None
+
+    def __init__(self, fields, prefix=None, name=None):
+        self.prefix = prefix or default_prefix
+        self.name, required, write = _plan(name or type(self), self.prefix)
+        for field in required:
+            if field not in fields:
+                raise KeyError(field)
+        self.fields = fields
+        out = bytearray()
+        write(out, fields)
+        self._bytes = bytes(out)
+
+    @property
+    def data(self):
+        if self._data is None and self.fields is not None:
+            self._data = wire_object(operation_layouts[self.name], self.fields, self.prefix).data
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        # set by hand, ie. copied from another instance: serialize the objects given
+        self._data = data
+        self._bytes = None
+
+    def __bytes__(self):
+        if self._bytes is None:
+            return super().__bytes__()
+        return self._bytes
+
+
+_plans = {}
+
+
+def _plan(operation, prefix):
+    """ The name, required fields and ``write(out, fields)`` of ``operation``, a name or a
+    :class:`LayoutObject` class, compiled once for each key prefix. """
+    plan = _plans.get((operation, prefix))
+    if plan is None:
+        from steepbase.wire import get_encoder
+        name = operation if isinstance(operation, str) else Operation.to_method_name(operation.__name__)
+        layout = operation_layouts[name]
+        required = [field for field, field_layout in layout if not is_optional(field_layout)]
+        plan = _plans[operation, prefix] = (name, required, get_encoder(prefix).writer(layout))
+    return plan
+
+
 class Permission(GrapheneObject):
     def __init__(self, *args, **kwargs):
         if isArgsThisClass(self, args):
@@ -184,22 +248,17 @@ class Memo(GrapheneObject):
             ]))
 
 
-class Vote(GrapheneObject):
+class Vote(LayoutObject):
     def __init__(self, *args, **kwargs):
         if isArgsThisClass(self, args):
             self.data = args[0].data
         else:
             if len(args) == 1 and len(kwargs) == 0:
                 kwargs = args[0]
-            super().__init__(OrderedDict([
-                ('voter', String(kwargs["voter"])),
-                ('author', String(kwargs["author"])),
-                ('permlink', String(kwargs["permlink"])),
-                ('weight', Int16(kwargs["weight"])),
-            ]))
+            super().__init__(kwargs)
 
 
-class Comment(GrapheneObject):
+class Comment(LayoutObject):
     def __init__(self, *args, **kwargs):
         if isArgsThisClass(self, args):
             self.data = args[0].data
@@ -214,31 +273,28 @@ class Comment(GrapheneObject):
                 else:
                     meta = kwargs["json_metadata"]
 
-            super().__init__(OrderedDict([
-                ('parent_author', String(kwargs["parent_author"])),
-                ('parent_permlink', String(kwargs["parent_permlink"])),
-                ('author', String(kwargs["author"])),
-                ('permlink', String(kwargs["permlink"])),
-                ('title', String(kwargs["title"])),
-                ('body', String(kwargs["body"])),
-                ('json_metadata', String(meta)),
-            ]))
+            super().__init__(dict(kwargs, json_metadata=meta))
 
 
 class Amount:
     def __init__(self, d):
-        self.amount, self.asset = d.strip().split(" ")
-        self.amount = float(self.amount)
+        amount, self.asset = d.strip().split(" ")
+        # floats don't hold the 18 digits of large VESTS amounts
+        self.decimal = Decimal(amount)
 
         if self.asset in asset_precision:
             self.precision = asset_precision[self.asset]
         else:
             raise Exception("Asset unknown")
 
+    @property
+    def amount(self):
+        return float(self.decimal)
+
     def __bytes__(self):
         # padding
         asset = self.asset + "\x00" * (7 - len(self.asset))
-        amount = round(float(self.amount) * 10 ** self.precision)
+        amount = round(self.decimal * 10 ** self.precision)
         return (
             struct.pack("<q", amount) +
             struct.pack("<b", self.precision) +
@@ -247,7 +303,7 @@ class Amount:
 
     def __str__(self):
         return '{:.{}f} {}'.format(
-            self.amount,
+            self.decimal,
             self.precision,
             self.asset
         )
@@ -329,12 +385,475 @@ class CommentOptionExtensions(StaticVariant):
         super().__init__(data, type_id)
 
 
+########################################################
+# Wire layouts
+########################################################
+
+# The fields of the operations, and of the objects in them, in wire order. The operation
+# classes below are built from these, and :mod:`steepbase.wire` reads and writes with them.
+# A layout is:
+#
+# * a class, ie. ``String`` or ``Amount``: a value of that type
+# * ``(FixedBytes, n)``: ``n`` bytes, as hex
+# * ``(Array, layout)``, ``(Set, layout)``: a varint count, then the items
+# * ``(Optional, layout)``: a flag, then the value when the flag is set
+# * ``(Map, key layout, value layout)``: a varint count, then the key/value pairs
+# * ``(StaticVariant, (layout, ...))``: a varint type id, then a value of the layout at that index
+# * a list of ``(name, layout)``: an object, its fields one after the other
+
+future_extensions = (Set, (StaticVariant, (Void,)))
+
+authority = [
+    ('weight_threshold', Uint32),
+    ('account_auths', (Map, String, Uint16)),
+    ('key_auths', (Map, PublicKey, Uint16)),
+]
+
+price = [
+    ('base', Amount),
+    ('quote', Amount),
+]
+
+chain_properties = [
+    ('account_creation_fee', Amount),
+    ('maximum_block_size', Uint32),
+    ('sbd_interest_rate', Uint16),
+]
+
+block_header_extensions = (Set, (StaticVariant, (
+    Void,
+    Version,
+    [('hf_version', Version), ('hf_time', PointInTime)],
+)))
+
+signed_block_header = [
+    ('previous', (FixedBytes, 20)),
+    ('timestamp', PointInTime),
+    ('witness', String),
+    ('transaction_merkle_root', (FixedBytes, 20)),
+    ('extensions', block_header_extensions),
+    ('witness_signature', Signature),
+]
+
+pow2_input = [
+    ('worker_account', String),
+    ('prev_block', (FixedBytes, 20)),
+    ('nonce', Uint64),
+]
+
+comment_options_extensions = (Set, (StaticVariant, (
+    [('beneficiaries', (Array, [('account', String), ('weight', Uint16)]))],
+)))
+
+#: fields of each operation, by name
+operation_layouts = {
+    'vote': [
+        ('voter', String),
+        ('author', String),
+        ('permlink', String),
+        ('weight', Int16),
+    ],
+    'comment': [
+        ('parent_author', String),
+        ('parent_permlink', String),
+        ('author', String),
+        ('permlink', String),
+        ('title', String),
+        ('body', String),
+        ('json_metadata', String),
+    ],
+    'transfer': [
+        ('from', String),
+        ('to', String),
+        ('amount', Amount),
+        ('memo', String),
+    ],
+    'transfer_to_vesting': [
+        ('from', String),
+        ('to', String),
+        ('amount', Amount),
+    ],
+    'withdraw_vesting': [
+        ('account', String),
+        ('vesting_shares', Amount),
+    ],
+    'limit_order_create': [
+        ('owner', String),
+        ('orderid', Uint32),
+        ('amount_to_sell', Amount),
+        ('min_to_receive', Amount),
+        ('fill_or_kill', Bool),
+        ('expiration', PointInTime),
+    ],
+    'limit_order_cancel': [
+        ('owner', String),
+        ('orderid', Uint32),
+    ],
+    'feed_publish': [
+        ('publisher', String),
+        ('exchange_rate', price),
+    ],
+    'convert': [
+        ('owner', String),
+        ('requestid', Uint32),
+        ('amount', Amount),
+    ],
+    'account_create': [
+        ('fee', Amount),
+        ('creator', String),
+        ('new_account_name', String),
+        ('owner', authority),
+        ('active', authority),
+        ('posting', authority),
+        ('memo_key', PublicKey),
+        ('json_metadata', String),
+    ],
+    'account_update': [
+        ('account', String),
+        ('owner', (Optional, authority)),
+        ('active', (Optional, authority)),
+        ('posting', (Optional, authority)),
+        ('memo_key', PublicKey),
+        ('json_metadata', String),
+    ],
+    'witness_update': [
+        ('owner', String),
+        ('url', String),
+        ('block_signing_key', PublicKey),
+        ('props', chain_properties),
+        ('fee', Amount),
+    ],
+    'account_witness_vote': [
+        ('account', String),
+        ('witness', String),
+        ('approve', Bool),
+    ],
+    'account_witness_proxy': [
+        ('account', String),
+        ('proxy', String),
+    ],
+    'pow': [
+        ('worker_account', String),
+        ('block_id', (FixedBytes, 20)),
+        ('nonce', Uint64),
+        ('work', [
+            ('worker', PublicKey),
+            ('input', (FixedBytes, 32)),
+            ('signature', Signature),
+            ('work', (FixedBytes, 32)),
+        ]),
+        ('props', chain_properties),
+    ],
+    'custom': [
+        ('required_auths', (Set, String)),
+        ('id', Uint16),
+        ('data', Bytes),
+    ],
+    'report_over_production': [
+        ('reporter', String),
+        ('first_block', signed_block_header),
+        ('second_block', signed_block_header),
+    ],
+    'delete_comment': [
+        ('author', String),
+        ('permlink', String),
+    ],
+    'custom_json': [
+        ('required_auths', (Set, String)),
+        ('required_posting_auths', (Set, String)),
+        ('id', String),
+        ('json', String),
+    ],
+    'comment_options': [
+        ('author', String),
+        ('permlink', String),
+        ('max_accepted_payout', Amount),
+        ('percent_steem_dollars', Uint16),
+        ('allow_votes', Bool),
+        ('allow_curation_rewards', Bool),
+        ('extensions', comment_options_extensions),
+    ],
+    'set_withdraw_vesting_route': [
+        ('from_account', String),
+        ('to_account', String),
+        ('percent', Uint16),
+        ('auto_vest', Bool),
+    ],
+    'limit_order_create2': [
+        ('owner', String),
+        ('orderid', Uint32),
+        ('amount_to_sell', Amount),
+        ('fill_or_kill', Bool),
+        ('exchange_rate', price),
+        ('expiration', PointInTime),
+    ],
+    'challenge_authority': [
+        ('challenger', String),
+        ('challenged', String),
+        ('require_owner', Bool),
+    ],
+    'prove_authority': [
+        ('challenged', String),
+        ('require_owner', Bool),
+    ],
+    'request_account_recovery': [
+        ('recovery_account', String),
+        ('account_to_recover', String),
+        ('new_owner_authority', authority),
+        ('extensions', future_extensions),
+    ],
+    'recover_account': [
+        ('account_to_recover', String),
+        ('new_owner_authority', authority),
+        ('recent_owner_authority', authority),
+        ('extensions', future_extensions),
+    ],
+    'change_recovery_account': [
+        ('account_to_recover', String),
+        ('new_recovery_account', String),
+        ('extensions', future_extensions),
+    ],
+    'escrow_transfer': [
+        ('from', String),
+        ('to', String),
+        ('agent', String),
+        ('escrow_id', Uint32),
+        ('sbd_amount', Amount),
+        ('steem_amount', Amount),
+        ('fee', Amount),
+        ('ratification_deadline', PointInTime),
+        ('escrow_expiration', PointInTime),
+        ('json_meta', String),
+    ],
+    'escrow_dispute': [
+        ('from', String),
+        ('to', String),
+        ('agent', String),
+        ('who', String),
+        ('escrow_id', Uint32),
+    ],
+    'escrow_release': [
+        ('from', String),
+        ('to', String),
+        ('agent', String),
+        ('who', String),
+        ('receiver', String),
+        ('escrow_id', Uint32),
+        ('sbd_amount', Amount),
+        ('steem_amount', Amount),
+    ],
+    'pow2': [
+        ('work', (StaticVariant, (
+            [('input', pow2_input), ('pow_summary', Uint32)],
+            [('input', pow2_input),
+             ('proof', [
+                 ('n', Uint32),
+                 ('k', Uint32),
+                 ('seed', (FixedBytes, 32)),
+                 ('inputs', (Array, Uint32)),
+             ]),
+             ('prev_block', (FixedBytes, 20)),
+             ('pow_summary', Uint32)],
+        ))),
+        ('new_owner_key', (Optional, PublicKey)),
+        ('props', chain_properties),
+    ],
+    'escrow_approve': [
+        ('from', String),
+        ('to', String),
+        ('agent', String),
+        ('who', String),
+        ('escrow_id', Uint32),
+        ('approve', Bool),
+    ],
+    'transfer_to_savings': [
+        ('from', String),
+        ('to', String),
+        ('amount', Amount),
+        ('memo', String),
+    ],
+    'transfer_from_savings': [
+        ('from', String),
+        ('request_id', Uint32),
+        ('to', String),
+        ('amount', Amount),
+        ('memo', String),
+    ],
+    'cancel_transfer_from_savings': [
+        ('from', String),
+        ('request_id', Uint32),
+    ],
+    'custom_binary': [
+        ('required_owner_auths', (Set, String)),
+        ('required_active_auths', (Set, String)),
+        ('required_posting_auths', (Set, String)),
+        ('required_auths', (Array, authority)),
+        ('id', String),
+        ('data', Bytes),
+    ],
+    'decline_voting_rights': [
+        ('account', String),
+        ('decline', Bool),
+    ],
+    'reset_account': [
+        ('reset_account', String),
+        ('account_to_reset', String),
+        ('new_owner_authority', authority),
+    ],
+    'set_reset_account': [
+        ('account', String),
+        ('current_reset_account', String),
+        ('reset_account', String),
+    ],
+    'claim_reward_balance': [
+        ('account', String),
+        ('reward_steem', Amount),
+        ('reward_sbd', Amount),
+        ('reward_vests', Amount),
+    ],
+    'delegate_vesting_shares': [
+        ('delegator', String),
+        ('delegatee', String),
+        ('vesting_shares', Amount),
+    ],
+    'account_create_with_delegation': [
+        ('fee', Amount),
+        ('delegation', Amount),
+        ('creator', String),
+        ('new_account_name', String),
+        ('owner', authority),
+        ('active', authority),
+        ('posting', authority),
+        ('memo_key', PublicKey),
+        ('json_metadata', String),
+        ('extensions', future_extensions),
+    ],
+
+    # virtual operations
+    'fill_convert_request': [
+        ('owner', String),
+        ('requestid', Uint32),
+        ('amount_in', Amount),
+        ('amount_out', Amount),
+    ],
+    'author_reward': [
+        ('author', String),
+        ('permlink', String),
+        ('sbd_payout', Amount),
+        ('steem_payout', Amount),
+        ('vesting_payout', Amount),
+    ],
+    'curation_reward': [
+        ('curator', String),
+        ('reward', Amount),
+        ('comment_author', String),
+        ('comment_permlink', String),
+    ],
+    'comment_reward': [
+        ('author', String),
+        ('permlink', String),
+        ('payout', Amount),
+    ],
+    'liquidity_reward': [
+        ('owner', String),
+        ('payout', Amount),
+    ],
+    'interest': [
+        ('owner', String),
+        ('interest', Amount),
+    ],
+    'fill_vesting_withdraw': [
+        ('from_account', String),
+        ('to_account', String),
+        ('withdrawn', Amount),
+        ('deposited', Amount),
+    ],
+    'fill_order': [
+        ('current_owner', String),
+        ('current_orderid', Uint32),
+        ('current_pays', Amount),
+        ('open_owner', String),
+        ('open_orderid', Uint32),
+        ('open_pays', Amount),
+    ],
+    'shutdown_witness': [
+        ('owner', String),
+    ],
+    'fill_transfer_from_savings': [
+        ('from', String),
+        ('to', String),
+        ('amount', Amount),
+        ('request_id', Uint32),
+        ('memo', String),
+    ],
+    'hardfork': [
+        ('hardfork_id', Uint32),
+    ],
+    'comment_payout_update': [
+        ('author', String),
+        ('permlink', String),
+    ],
+    'return_vesting_delegation': [
+        ('account', String),
+        ('vesting_shares', Amount),
+    ],
+    'comment_benefactor_reward': [
+        ('benefactor', String),
+        ('author', String),
+        ('permlink', String),
+        ('reward', Amount),
+    ],
+}
+
+
+def wire_object(layout, value, prefix=default_prefix):
+    """ ``value``, as the API shows it, as the :mod:`steepbase.types` objects of ``layout``,
+    which serialize it. Authorities are built as :class:`Permission`, which sorts them. """
+    if layout is authority:
+        return Permission(value, prefix=prefix)
+    if isinstance(layout, list):
+        return GrapheneObject(OrderedDict(
+            (name, wire_object(field_layout, value.get(name) if is_optional(field_layout) else value[name],
+                               prefix))
+            for name, field_layout in layout))
+    if isinstance(layout, tuple):
+        kind = layout[0]
+        if kind is FixedBytes:
+            return FixedBytes(value, layout[1])
+        if kind in (Array, Set):
+            return kind([wire_object(layout[1], item, prefix) for item in value])
+        if kind is Optional:
+            return Optional(None if value is None else wire_object(layout[1], value, prefix))
+        if kind is Map:
+            return Map([[wire_object(layout[1], key, prefix), wire_object(layout[2], item, prefix)]
+                        for key, item in value])
+        if kind is StaticVariant:
+            type_id, data = value
+            return StaticVariant(wire_object(layout[1][type_id], data, prefix), type_id)
+        raise TypeError('no wire layout for %r' % (layout,))
+    if layout is PublicKey:
+        return PublicKey(value, prefix=prefix)
+    if layout is Signature:
+        return Signature(unhexlify(value))
+    if layout is Void:
+        return Void()
+    if layout is Bool:
+        return Bool(bool(value))
+    if layout in (Int16, Uint16, Uint32, Uint64, Int64):
+        return layout(int(value))
+    return layout(value)
+
+
+def is_optional(layout):
+    return isinstance(layout, tuple) and layout[0] is Optional
+
+
 ########################################################
 # Actual Operations
 ########################################################
 
 
-class AccountCreate(GrapheneObject):
+class AccountCreate(LayoutObject):
     def __init__(self, *args, **kwargs):
         if isArgsThisClass(self, args):
             self.data = args[0].data
@@ -351,19 +870,10 @@ class AccountCreate(GrapheneObject):
                     meta = json.dumps(kwargs["json_metadata"])
                 else:
                     meta = kwargs["json_metadata"]
-            super().__init__(OrderedDict([
-                ('fee', Amount(kwargs["fee"])),
-                ('creator', String(kwargs["creator"])),
-                ('new_account_name', String(kwargs["new_account_name"])),
-                ('owner', Permission(kwargs["owner"], prefix=prefix)),
-                ('active', Permission(kwargs["active"], prefix=prefix)),
-                ('posting', Permission(kwargs["posting"], prefix=prefix)),
-                ('memo_key', PublicKey(kwargs["memo_key"], prefix=prefix)),
-                ('json_metadata', String(meta)),
-            ]))
+            super().__init__(dict(kwargs, json_metadata=meta), prefix)
 
 
-class AccountCreateWithDelegation(GrapheneObject):
+class AccountCreateWithDelegation(LayoutObject):
     def __init__(self, *args, **kwargs):
         if isArgsThisClass(self, args):
             self.data = args[0].data
@@ -380,21 +890,10 @@ class AccountCreateWithDelegation(GrapheneObject):
                     meta = json.dumps(kwargs["json_metadata"])
                 else:
                     meta = kwargs["json_metadata"]
-            super().__init__(OrderedDict([
-                ('fee', Amount(kwargs["fee"])),
-                ('delegation', Amount(kwargs["delegation"])),
-                ('creator', String(kwargs["creator"])),
-                ('new_account_name', String(kwargs["new_account_name"])),
-                ('owner', Permission(kwargs["owner"], prefix=prefix)),
-                ('active', Permission(kwargs["active"], prefix=prefix)),
-                ('posting', Permission(kwargs["posting"], prefix=prefix)),
-                ('memo_key', PublicKey(kwargs["memo_key"], prefix=prefix)),
-                ('json_metadata', String(meta)),
-                ('extensions', Array([])),
-            ]))
+            super().__init__(dict(kwargs, json_metadata=meta, extensions=[]), prefix)
 
 
-class AccountUpdate(GrapheneObject):
+class AccountUpdate(LayoutObject):
     def __init__(self, *args, **kwargs):
         if isArgsThisClass(self, args):
             self.data = args[0].data
@@ -410,34 +909,20 @@ class AccountUpdate(GrapheneObject):
                 else:
                     meta = kwargs["json_metadata"]
 
-            owner = Permission(kwargs["owner"], prefix=prefix) if "owner" in kwargs else None
-            active = Permission(kwargs["active"], prefix=prefix) if "active" in kwargs else None
-            posting = Permission(kwargs["posting"], prefix=prefix) if "posting" in kwargs else None
-
-            super().__init__(OrderedDict([
-                ('account', String(kwargs["account"])),
-                ('owner', Optional(owner)),
-                ('active', Optional(active)),
-                ('posting', Optional(posting)),
-                ('memo_key', PublicKey(kwargs["memo_key"], prefix=prefix)),
-                ('json_metadata', String(meta)),
-            ]))
+            super().__init__(dict(kwargs, json_metadata=meta), prefix)
 
 
-class ChangeRecoveryAccount(GrapheneObject):
+class ChangeRecoveryAccount(LayoutObject):
     def __init__(self, *args, **kwargs):
         if isArgsThisClass(self, args):
             self.data = args[0].data
         else:
-            super(ChangeRecoveryAccount, self).__init__(
-                OrderedDict([
-                    ('account_to_recover', String(kwargs["account_to_recover"])),
-                    ('new_recovery_account', String(kwargs["new_recovery_account"])),
-                    ('extensions', Array([])),
-                ]))
+            if len(args) == 1 and len(kwargs) == 0:
+                kwargs = args[0]
+            super().__init__(dict(kwargs, extensions=[]))
 
 
-class Transfer(GrapheneObject):
+class Transfer(LayoutObject):
     def __init__(self, *args, **kwargs):
         if isArgsThisClass(self, args):
             self.data = args[0].data
@@ -446,42 +931,30 @@ class Transfer(GrapheneObject):
                 kwargs = args[0]
             if "memo" not in kwargs:
                 kwargs["memo"] = ""
-            super().__init__(OrderedDict([
-                ('from', String(kwargs["from"])),
-                ('to', String(kwargs["to"])),
-                ('amount', Amount(kwargs["amount"])),
-                ('memo', String(kwargs["memo"])),
-            ]))
+            super().__init__(kwargs)
 
 
-class TransferToVesting(GrapheneObject):
+class TransferToVesting(LayoutObject):
     def __init__(self, *args, **kwargs):
         if isArgsThisClass(self, args):
             self.data = args[0].data
         else:
             if len(args) == 1 and len(kwargs) == 0:
                 kwargs = args[0]
-            super().__init__(OrderedDict([
-                ('from', String(kwargs["from"])),
-                ('to', String(kwargs["to"])),
-                ('amount', Amount(kwargs["amount"])),
-            ]))
+            super().__init__(kwargs)
 
 
-class WithdrawVesting(GrapheneObject):
+class WithdrawVesting(LayoutObject):
     def __init__(self, *args, **kwargs):
         if isArgsThisClass(self, args):
             self.data = args[0].data
         else:
             if len(args) == 1 and len(kwargs) == 0:
                 kwargs = args[0]
-            super().__init__(OrderedDict([
-                ('account', String(kwargs["account"])),
-                ('vesting_shares', Amount(kwargs["vesting_shares"])),
-            ]))
+            super().__init__(kwargs)
 
 
-class TransferToSavings(GrapheneObject):
+class TransferToSavings(LayoutObject):
     def __init__(self, *args, **kwargs):
         if isArgsThisClass(self, args):
             self.data = args[0].data
@@ -490,15 +963,10 @@ class TransferToSavings(GrapheneObject):
                 kwargs = args[0]
             if "memo" not in kwargs:
                 kwargs["memo"] = ""
-            super().__init__(OrderedDict([
-                ('from', String(kwargs["from"])),
-                ('to', String(kwargs["to"])),
-                ('amount', Amount(kwargs["amount"])),
-                ('memo', String(kwargs["memo"])),
-            ]))
+            super().__init__(kwargs)
 
 
-class TransferFromSavings(GrapheneObject):
+class TransferFromSavings(LayoutObject):
     def __init__(self, *args, **kwargs):
         if isArgsThisClass(self, args):
             self.data = args[0].data
@@ -508,130 +976,90 @@ class TransferFromSavings(GrapheneObject):
             if "memo" not in kwargs:
                 kwargs["memo"] = ""
 
-            super().__init__(OrderedDict([
-                ('from', String(kwargs["from"])),
-                ('request_id', Uint32(int(kwargs["request_id"]))),
-                ('to', String(kwargs["to"])),
-                ('amount', Amount(kwargs["amount"])),
-                ('memo', String(kwargs["memo"])),
-            ]))
+            super().__init__(kwargs)
 
 
-class CancelTransferFromSavings(GrapheneObject):
+class CancelTransferFromSavings(LayoutObject):
     def __init__(self, *args, **kwargs):
         if isArgsThisClass(self, args):
             self.data = args[0].data
         else:
             if len(args) == 1 and len(kwargs) == 0:
                 kwargs = args[0]
-            super().__init__(OrderedDict([
-                ('from', String(kwargs["from"])),
-                ('request_id', Uint32(int(kwargs["request_id"]))),
-            ]))
+            super().__init__(kwargs)
 
 
-class ClaimRewardBalance(GrapheneObject):
+class ClaimRewardBalance(LayoutObject):
     def __init__(self, *args, **kwargs):
         if isArgsThisClass(self, args):
             self.data = args[0].data
         else:
             if len(args) == 1 and len(kwargs) == 0:
                 kwargs = args[0]
-            super().__init__(OrderedDict([
-                ('account', String(kwargs["account"])),
-                ('reward_steem', Amount(kwargs["reward_steem"])),
-                ('reward_sbd', Amount(kwargs["reward_sbd"])),
-                ('reward_vests', Amount(kwargs["reward_vests"])),
-            ]))
+            super().__init__(kwargs)
 
 
-class DelegateVestingShares(GrapheneObject):
+class DelegateVestingShares(LayoutObject):
     def __init__(self, *args, **kwargs):
         if isArgsThisClass(self, args):
             self.data = args[0].data
         else:
             if len(args) == 1 and len(kwargs) == 0:
                 kwargs = args[0]
-            super().__init__(OrderedDict([
-                ('delegator', String(kwargs["delegator"])),
-                ('delegatee', String(kwargs["delegatee"])),
-                ('vesting_shares', Amount(kwargs["vesting_shares"])),
-            ]))
+            super().__init__(kwargs)
 
 
-class LimitOrderCreate(GrapheneObject):
+class LimitOrderCreate(LayoutObject):
     def __init__(self, *args, **kwargs):
         if isArgsThisClass(self, args):
             self.data = args[0].data
         else:
             if len(args) == 1 and len(kwargs) == 0:
                 kwargs = args[0]
-            super().__init__(OrderedDict([
-                ('owner', String(kwargs["owner"])),
-                ('orderid', Uint32(int(kwargs["orderid"]))),
-                ('amount_to_sell', Amount(kwargs["amount_to_sell"])),
-                ('min_to_receive', Amount(kwargs["min_to_receive"])),
-                ('fill_or_kill', Bool(kwargs["fill_or_kill"])),
-                ('expiration', PointInTime(kwargs["expiration"])),
-            ]))
+            super().__init__(kwargs)
 
 
-class LimitOrderCancel(GrapheneObject):
+class LimitOrderCancel(LayoutObject):
     def __init__(self, *args, **kwargs):
         if isArgsThisClass(self, args):
             self.data = args[0].data
         else:
             if len(args) == 1 and len(kwargs) == 0:
                 kwargs = args[0]
-            super().__init__(OrderedDict([
-                ('owner', String(kwargs["owner"])),
-                ('orderid', Uint32(int(kwargs["orderid"]))),
-            ]))
+            super().__init__(kwargs)
 
 
-class SetWithdrawVestingRoute(GrapheneObject):
+class SetWithdrawVestingRoute(LayoutObject):
     def __init__(self, *args, **kwargs):
         if isArgsThisClass(self, args):
             self.data = args[0].data
         else:
             if len(args) == 1 and len(kwargs) == 0:
                 kwargs = args[0]
-            super().__init__(OrderedDict([
-                ('from_account', String(kwargs["from_account"])),
-                ('to_account', String(kwargs["to_account"])),
-                ('percent', Uint16((kwargs["percent"]))),
-                ('auto_vest', Bool(kwargs["auto_vest"])),
-            ]))
+            super().__init__(kwargs)
 
 
-class Convert(GrapheneObject):
+class Convert(LayoutObject):
     def __init__(self, *args, **kwargs):
         if isArgsThisClass(self, args):
             self.data = args[0].data
         else:
             if len(args) == 1 and len(kwargs) == 0:
                 kwargs = args[0]
-            super().__init__(OrderedDict([
-                ('owner', String(kwargs["owner"])),
-                ('requestid', Uint32(kwargs["requestid"])),
-                ('amount', Amount(kwargs["amount"])),
-            ]))
+            super().__init__(kwargs)
 
 
-class FeedPublish(GrapheneObject):
+class FeedPublish(LayoutObject):
     def __init__(self, *args, **kwargs):
         if isArgsThisClass(self, args):
             self.data = args[0].data
         else:
             if len(args) == 1 and len(kwargs) == 0:
                 kwargs = args[0]
-            super().__init__(OrderedDict([
-                ('publisher', String(kwargs["publisher"])),
-                ('exchange_rate', ExchangeRate(kwargs["exchange_rate"])),
-            ]))
+            super().__init__(kwargs)
 
 
-class WitnessUpdate(GrapheneObject):
+class WitnessUpdate(LayoutObject):
     def __init__(self, *args, **kwargs):
         if isArgsThisClass(self, args):
             self.data = args[0].data
@@ -642,36 +1070,27 @@ class WitnessUpdate(GrapheneObject):
 
             if not kwargs["block_signing_key"]:
                 kwargs["block_signing_key"] = "STM1111111111111111111111111111111114T1Anm"
-            super().__init__(OrderedDict([
-                ('owner', String(kwargs["owner"])),
-                ('url', String(kwargs["url"])),
-                ('block_signing_key', PublicKey(kwargs["block_signing_key"], prefix=prefix)),
-                ('props', WitnessProps(kwargs["props"])),
-                ('fee', Amount(kwargs["fee"])),
-            ]))
+            super().__init__(kwargs, prefix)
 
 
-class AccountWitnessVote(GrapheneObject):
+class AccountWitnessVote(LayoutObject):
     def __init__(self, *args, **kwargs):
         if isArgsThisClass(self, args):
             self.data = args[0].data
         else:
             if len(args) == 1 and len(kwargs) == 0:
                 kwargs = args[0]
-            super().__init__(OrderedDict([
-                ('account', String(kwargs["account"])),
-                ('witness', String(kwargs["witness"])),
-                ('approve', Bool(bool(kwargs["approve"]))),
-            ]))
+            super().__init__(kwargs)
 
 
-class CustomJson(GrapheneObject):
+class CustomJson(LayoutObject):
     def __init__(self, *args, **kwargs):
         if isArgsThisClass(self, args):
             self.data = args[0].data
         else:
             if len(args) == 1 and len(kwargs) == 0:
                 kwargs = args[0]
+            js = ""
             if "json" in kwargs and kwargs["json"]:
                 if (isinstance(kwargs["json"], dict) or
                         isinstance(kwargs["json"], list)):
@@ -682,17 +1101,10 @@ class CustomJson(GrapheneObject):
             if len(kwargs["id"]) > 32:
                 raise Exception("'id' too long")
 
-            super().__init__(OrderedDict([
-                ('required_auths',
-                 Array([String(o) for o in kwargs["required_auths"]])),
-                ('required_posting_auths',
-                 Array([String(o) for o in kwargs["required_posting_auths"]])),
-                ('id', String(kwargs["id"])),
-                ('json', String(js)),
-            ]))
+            super().__init__(dict(kwargs, json=js))
 
 
-class CommentOptions(GrapheneObject):
+class CommentOptions(LayoutObject):
     def __init__(self, *args, **kwargs):
         if isArgsThisClass(self, args):
             self.data = args[0].data
@@ -701,25 +1113,15 @@ class CommentOptions(GrapheneObject):
                 kwargs = args[0]
 
             # handle beneficiaries
-            extensions = Array([])
+            extensions = []
             beneficiaries = kwargs.get('beneficiaries')
             # TODO: Explore this 2 lines
             if not beneficiaries and kwargs['extensions'] and len(kwargs['extensions'][0]) == 2:
                 beneficiaries = kwargs['extensions'][0][1].get('beneficiaries')
             if beneficiaries and type(beneficiaries) == list:
-                ext_obj = [0, {'beneficiaries': beneficiaries}]
-                ext = CommentOptionExtensions(ext_obj)
-                extensions = Array([ext])
+                extensions = [[0, {'beneficiaries': beneficiaries}]]
 
-            super().__init__(OrderedDict([
-                ('author', String(kwargs["author"])),
-                ('permlink', String(kwargs["permlink"])),
-                ('max_accepted_payout', Amount(kwargs["max_accepted_payout"])),
-                ('percent_steem_dollars', Uint16(int(kwargs["percent_steem_dollars"]))),
-                ('allow_votes', Bool(bool(kwargs["allow_votes"]))),
-                ('allow_curation_rewards', Bool(bool(kwargs["allow_curation_rewards"]))),
-                ('extensions', extensions),
-            ]))
+            super().__init__(dict(kwargs, extensions=extensions))
 
 
 def isArgsThisClass(self, args):
@@ -0,0 +1,116 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket(object):
+    """ Token bucket refilling at ``rate`` tokens per second, holding up to ``burst`` tokens.
+
+    Tokens are reserved up front, so callers queue in order: the balance may go negative,
+    and each caller waits until the bucket has refilled up to its reservation.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, self.rate))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, tokens=1):
+        """ Take ``tokens``, and return the seconds to wait before using them. """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= tokens
+            return max(0.0, -self.tokens / self.rate)
+
+    def deposit(self, tokens):
+        """ Add ``tokens`` on top of the refill, up to ``burst``. """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.burst, self.tokens + tokens)
+
+    def try_take(self, tokens=1):
+        """ Take ``tokens`` only if they are available right now. """
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens < tokens:
+                return False
+            self.tokens -= tokens
+            return True
+
+
+class RateLimiter(object):
+    """ Client side rate limit, with one token bucket per node URL.
+
+    Calls queue for a token instead of tripping the node's own throttling.
+    One instance can be shared by several clients.
+
+    Args:
+        rate (float): Calls per second allowed to each node.
+        burst (float): Max calls sent at once after a quiet period. Defaults to ``rate``.
+        weights (dict): ``{method: tokens}`` for calls more expensive than 1 token,
+            ie. ``{'get_account_history': 5}``.
+
+    .. code-block:: python
+
+       s = Steemd(rate_limit=RateLimiter(20, weights={'get_block': 2}))
+       s.get_blocks(range(1, 1000))
+       s.client.rate_limiter.stats()
+       # {'calls': 999, 'waited': 958, 'wait_time': 97.3, 'max_wait': 0.16}
+
+    """
+
+    def __init__(self, rate, burst=None, weights=None):
+        self.rate = rate
+        self.burst = burst
+        self.weights = weights or {}
+        self.calls = 0
+        self.waited = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url):
+        with self._lock:
+            bucket = self._buckets.get(url)
+            if bucket is None:
+                bucket = self._buckets[url] = TokenBucket(self.rate, self.burst)
+            return bucket
+
+    def weight(self, *names):
+        return sum(self.weights.get(name, 1) for name in names)
+
+    def acquire(self, url, *names):
+        """ Block until ``url`` may be sent a call (or a batch) of the methods ``names``.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        wait = self.bucket(url).reserve(self.weight(*names))
+        if wait:
+            logger.debug('Rate limit of %s, waiting %.3fs', url, wait)
+            time.sleep(wait)
+        with self._lock:
+            self.calls += 1
+            if wait:
+                self.waited += 1
+                self.wait_time += wait
+                self.max_wait = max(self.max_wait, wait)
+        return wait
+
+    def try_acquire(self, url, *names):
+        """ Like `acquire`, but only takes a token available right now. Returns whether it did. """
+        return self.bucket(url).try_take(self.weight(*names))
+
+    def stats(self):
+        """ Number of calls, how many of them had to wait, and for how long in total and at most. """
+        with self._lock:
+            return {'calls': self.calls, 'waited': self.waited, 'wait_time': self.wait_time, 'max_wait': self.max_wait}
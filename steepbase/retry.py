@@ -0,0 +1,111 @@
+import logging
+import random
+import threading
+import time
+
+from steepbase.exceptions import NumRetriesReached
+from steepbase.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class RetryPolicy(object):
+    """ When, and how long after a failure, the clients retry a call.
+
+    Retries back off exponentially from ``backoff`` up to ``max_backoff`` seconds, with
+    "full jitter" (a random delay between 0 and the backoff), so clients hit by the same
+    outage don't retry in lockstep.
+
+    The retry budget is shared by every call using the policy, ie. every thread of
+    ``call_multi_with_futures``, or several clients given the same policy. Each call adds
+    ``budget`` retry tokens (0.2 allows 20% extra load from retries), on top of
+    ``budget_min_rate`` tokens per second, and each retry takes one. A degraded cluster
+    thus gets a bounded amount of retries instead of an ever growing storm.
+
+    Args:
+        backoff (float): Max delay before the first retry, doubled for each following one.
+        max_backoff (float): Cap of the delay.
+        jitter (bool): Pick a random delay up to the backoff, rather than the backoff itself.
+        max_attempts (int): Attempts per call, including the first one. ``None`` retries forever.
+        deadline (float): Seconds after which a call is not retried anymore.
+        budget (float): Retry tokens earned per call, ``None`` for no budget.
+        budget_min_rate (float): Retry tokens earned per second regardless of the number of calls.
+        budget_burst (float): Max retry tokens saved up.
+
+    .. code-block:: python
+
+       policy = RetryPolicy(max_attempts=5, deadline=30, budget=0.2)
+       s = Steemd(retry_policy=policy)
+
+    """
+
+    def __init__(self, backoff=0.5, max_backoff=10, jitter=True, max_attempts=None, deadline=None,
+                 budget=None, budget_min_rate=1.0, budget_burst=10):
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.max_attempts = max_attempts
+        self.deadline = deadline
+        self.budget = budget
+        self._budget = TokenBucket(budget_min_rate, budget_burst) if budget is not None else None
+        self.retries = 0
+        self.exhausted = 0
+        self._lock = threading.Lock()
+
+    def delay(self, attempt):
+        """ Seconds to wait after failed attempt number ``attempt`` (1 based). """
+        ceiling = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling) if self.jitter else ceiling
+
+    def begin(self):
+        """ Start tracking the attempts of one call. """
+        if self._budget is not None:
+            self._budget.deposit(self.budget)
+        return Retry(self)
+
+    def _give_up(self, reason):
+        with self._lock:
+            self.exhausted += 1
+        raise NumRetriesReached(reason)
+
+    def stats(self):
+        """ Number of retries made, and of calls given up on. """
+        with self._lock:
+            return {'retries': self.retries, 'exhausted': self.exhausted}
+
+
+class Retry(object):
+    """ Attempts of a single call under a :class:`RetryPolicy`. """
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.attempts = 0
+        self.started = time.monotonic()
+
+    def backoff(self, error=None):
+        """ Account a failed attempt, and return the seconds to wait before the next one.
+
+        Raises:
+            NumRetriesReached: If the call ran out of attempts, its deadline or the retry budget.
+        """
+        policy = self.policy
+        self.attempts += 1
+        if policy.max_attempts is not None and self.attempts >= policy.max_attempts:
+            policy._give_up('gave up after %d attempts: %s' % (self.attempts, error))
+
+        delay = policy.delay(self.attempts)
+        if policy.deadline is not None and time.monotonic() + delay - self.started > policy.deadline:
+            policy._give_up('deadline of %ss exceeded after %d attempts: %s' % (policy.deadline, self.attempts, error))
+
+        if policy._budget is not None and not policy._budget.try_take(1):
+            policy._give_up('retry budget exhausted: %s' % error)
+
+        with policy._lock:
+            policy.retries += 1
+        return delay
+
+    def sleep(self, error=None):
+        """ `backoff`, and wait it out. """
+        delay = self.backoff(error)
+        time.sleep(delay)
+        return delay
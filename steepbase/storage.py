@@ -355,6 +355,94 @@ class Configuration(DataDir):
         return len(cursor.fetchall())
 
 
+class Checkpoints(DataDir):
+    """ Durable stream positions, in the `checkpoints` table of the SQLite3
+        database, one row per stream name.
+
+        This is the default store of :meth:`steep.blockchain.Blockchain.stream_from`
+        checkpoints. Any object with the same `load` and `save` methods can be
+        used instead.
+
+        :param str path: SQLite3 database file, defaults to the user's one
+    """
+    __tablename__ = 'checkpoints'
+
+    def __init__(self, path=None):
+        super(Checkpoints, self).__init__()
+        if path:
+            self.sqlDataBaseFile = path
+        if not self.exists_table():
+            self.create_table()
+
+    def exists_table(self):
+        """ Check if the database table exists
+        """
+        query = ("SELECT name FROM sqlite_master " +
+                 "WHERE type='table' AND name=?", (self.__tablename__,))
+        connection = sqlite3.connect(self.sqlDataBaseFile)
+        cursor = connection.cursor()
+        cursor.execute(*query)
+        return True if cursor.fetchone() else False
+
+    def create_table(self):
+        """ Create the new table in the SQLite database
+        """
+        query = ('CREATE TABLE IF NOT EXISTS %s (' % self.__tablename__ +
+                 'name STRING(256) PRIMARY KEY,' +
+                 'block_num INTEGER,' +
+                 'op_index INTEGER,' +
+                 'updated STRING(256)' +
+                 ')')
+        connection = sqlite3.connect(self.sqlDataBaseFile)
+        cursor = connection.cursor()
+        cursor.execute(query)
+        connection.commit()
+
+    def load(self, name):
+        """ Returns the last processed `(block_num, op_index)` of the
+            stream `name`, or `None`. `op_index` is `None` once the
+            whole block was processed.
+
+           :param str name: Stream name
+        """
+        query = ("SELECT block_num, op_index FROM %s " % self.__tablename__ +
+                 "WHERE name=?",
+                 (name,))
+        connection = sqlite3.connect(self.sqlDataBaseFile)
+        cursor = connection.cursor()
+        cursor.execute(*query)
+        result = cursor.fetchone()
+        return tuple(result) if result else None
+
+    def save(self, name, block_num, op_index=None):
+        """ Atomically replace the position of the stream `name`
+
+           :param str name: Stream name
+           :param int block_num: Last processed block
+           :param int op_index: Last processed operation of the block,
+               `None` once the whole block was processed
+        """
+        query = ("INSERT OR REPLACE INTO %s " % self.__tablename__ +
+                 "(name, block_num, op_index, updated) VALUES (?, ?, ?, ?)",
+                 (name, block_num, op_index, datetime.now().strftime(timeformat)))
+        connection = sqlite3.connect(self.sqlDataBaseFile)
+        cursor = connection.cursor()
+        cursor.execute(*query)
+        connection.commit()
+
+    def delete(self, name):
+        """ Forget the position of the stream `name`
+
+           :param str name: Stream name
+        """
+        query = ("DELETE FROM %s " % self.__tablename__ + "WHERE name=?",
+                 (name,))
+        connection = sqlite3.connect(self.sqlDataBaseFile)
+        cursor = connection.cursor()
+        cursor.execute(*query)
+        connection.commit()
+
+
 class WrongKEKException(Exception):
     pass
 
@@ -1,4 +1,5 @@
 import json
+import re
 import struct
 import time
 from binascii import hexlify, unhexlify
@@ -28,6 +29,9 @@ object_type = {
 
 timeformat = '%Y-%m-%dT%H:%M:%S%Z'
 
+# characters String escapes, all the others are written as they are
+control_chars = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
 
 def varint(n):
     """ Varint encoding
@@ -46,7 +50,7 @@ def varintdecode(data):
     shift = 0
     result = 0
     for c in data:
-        b = ord(c)
+        b = c if isinstance(c, int) else ord(c)
         result |= ((b & 0x7f) << shift)
         if not (b & 0x80):
             break
@@ -141,7 +145,7 @@ class Varint32:
 
 class Int64:
     def __init__(self, d):
-        self.data = d
+        self.data = int(d)
 
     def __bytes__(self):
         return struct.pack("<q", self.data)
@@ -162,6 +166,8 @@ class String:
         return '%s' % str(self.data)
 
     def unicodify(self):
+        if isinstance(self.data, str) and not control_chars.search(self.data):
+            return bytes(self.data, "utf-8")
         r = []
         for s in self.data:
             o = ord(s)
@@ -258,6 +264,36 @@ class Signature:
         return json.dumps(hexlify(self.data).decode('ascii'))
 
 
+class FixedBytes:
+    """ Hex data of a fixed length (ie. a 20 bytes block id), without a length prefix. """
+
+    def __init__(self, d, length=None):
+        self.data = d
+        self.length = length or len(d) // 2
+
+    def __bytes__(self):
+        d = unhexlify(bytes(self.data, 'utf-8'))
+        assert len(d) == self.length, 'expected %d bytes, got %d' % (self.length, len(d))
+        return d
+
+    def __str__(self):
+        return json.dumps(self.data)
+
+
+class Version:
+    """ A ``major.minor.patch`` version, packed into 32 bits. """
+
+    def __init__(self, d):
+        self.data = d
+
+    def __bytes__(self):
+        major, minor, patch = (int(part) for part in self.data.split('.'))
+        return struct.pack("<I", (major << 24) | (minor << 16) | patch)
+
+    def __str__(self):
+        return json.dumps(self.data)
+
+
 class Bool(Uint8):  # Bool = Uint8
     def __init__(self, d):
         super().__init__(d)
@@ -0,0 +1,665 @@
+""" Decoding of the steemd binary (wire) format into the JSON the RPC API returns, and the encoding
+of that JSON back into the wire format.
+
+Operations are read and written with the layouts of :data:`steepbase.operations.operation_layouts`,
+the ones the operation classes are built from (see there for the layout notation). This module adds
+the layouts of blocks and transactions.
+
+.. code-block:: python
+
+   decoder = WireDecoder()
+   block, _ = decoder.block(memoryview(raw))
+
+   trx = decode_transaction(s.get_transaction_hex(trx_json))  # a SignedTransaction
+   trx.verify([pubkey], chain='STEEM')
+
+   raw = encode_operation(['transfer', {'from': 'a', 'to': 'b', 'amount': '1.000 STEEM', 'memo': ''}])
+   trx = SignedTransaction(ref_block_num=..., ref_block_prefix=..., expiration=...,
+                           operations=[CompiledOperation(op) for op in ops])
+"""
+import hashlib
+import json
+import struct
+import time
+from binascii import unhexlify
+
+from steepbase.account import PublicKey
+from steepbase.base58 import gphBase58CheckEncode
+from steepbase.operationids import op_names, operations
+from steepbase.operations import (  # noqa: F401 (layouts re-exported)
+    Amount, Operation, default_prefix, wire_object, is_optional,
+    authority, block_header_extensions, chain_properties, comment_options_extensions, future_extensions,
+    operation_layouts, pow2_input, price, signed_block_header)
+from steepbase.transactions import SignedTransaction
+from steepbase.types import (
+    Uint8, Int16, Uint16, Uint32, Uint64, Int64,
+    String, Bytes, FixedBytes, Void, Array, Set, PointInTime, Signature, Bool,
+    Optional, StaticVariant, Map, Version, control_chars, varint)
+
+transaction = [
+    ('ref_block_num', Uint16),
+    ('ref_block_prefix', Uint32),
+    ('expiration', PointInTime),
+    ('operations', (Array, Operation)),
+    ('extensions', future_extensions),
+]
+
+signed_transaction = transaction + [
+    ('signatures', (Array, Signature)),
+]
+
+signed_block = signed_block_header + [
+    ('transactions', (Array, signed_transaction)),
+]
+
+_uint32 = struct.Struct('<I')
+_asset = struct.Struct('<qB7s')
+
+
+def read_varint(buf, pos):
+    """ Decode the varint at ``pos`` of ``buf``. Returns it, and the position after it. """
+    result = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7f) << shift
+        if not b & 0x80:
+            return result, pos
+        shift += 7
+
+
+def format_time(timestamp):
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(timestamp))
+
+
+def format_int64(value):
+    """ 64 bits integers beyond 32 bits are strings in the API output, as JSON parsers may round them. """
+    return value if -0xffffffff <= value <= 0xffffffff else str(value)
+
+
+def format_amount(amount, precision, symbol):
+    """ An asset as the API shows it, ie. ``1.000 STEEM``. """
+    sign = '-' if amount < 0 else ''
+    whole, fraction = divmod(abs(amount), 10 ** precision)
+    if not precision:
+        return '%s%d %s' % (sign, whole, symbol)
+    return '%s%d.%0*d %s' % (sign, whole, precision, fraction, symbol)
+
+
+def block_id(block_num, header):
+    """ The id of block ``block_num``, from its signed header (as wire bytes). """
+    return '%08x%s' % (block_num, hashlib.sha224(header).digest()[4:20].hex())
+
+
+def transaction_id(trx):
+    """ The id of a transaction, from its wire bytes without the signatures. """
+    return hashlib.sha256(trx).digest()[:20].hex()
+
+
+def _struct_reader(layout, pack):
+    # fields ``None`` is read for (empty optionals) are left out, as in the API output
+    fields = [(name, pack(field_layout), isinstance(field_layout, tuple) and field_layout[0] is Optional)
+              for name, field_layout in layout]
+
+    def read(buf, pos):
+        value = {}
+        for name, read_field, optional in fields:
+            field, pos = read_field(buf, pos)
+            if field is not None or not optional:
+                value[name] = field
+        return value, pos
+
+    return read
+
+
+def _unpacker(fmt, convert=None):
+    unpack_from = struct.Struct(fmt).unpack_from
+    size = struct.calcsize(fmt)
+
+    if convert is None:
+        def read(buf, pos):
+            return unpack_from(buf, pos)[0], pos + size
+    else:
+        def read(buf, pos):
+            return convert(unpack_from(buf, pos)[0]), pos + size
+
+    return read
+
+
+def _read_string(buf, pos):
+    length, pos = read_varint(buf, pos)
+    end = pos + length
+    return str(buf[pos:end], 'utf-8'), end
+
+
+def _read_bytes(buf, pos):
+    length, pos = read_varint(buf, pos)
+    end = pos + length
+    return buf[pos:end].hex(), end
+
+
+def _read_bool(buf, pos):
+    return buf[pos] != 0, pos + 1
+
+
+def _read_void(buf, pos):
+    return {}, pos
+
+
+def _read_signature(buf, pos):
+    return buf[pos:pos + 65].hex(), pos + 65
+
+
+def _read_version(buf, pos):
+    v = _uint32.unpack_from(buf, pos)[0]
+    return '%d.%d.%d' % (v >> 24, (v >> 16) & 0xff, v & 0xffff), pos + 4
+
+
+def _read_amount(buf, pos):
+    amount, precision, symbol = _asset.unpack_from(buf, pos)
+    return format_amount(amount, precision, symbol.rstrip(b'\x00').decode('ascii')), pos + _asset.size
+
+
+class WireDecoder(object):
+    """ Decodes wire format data into the values the RPC API returns: dicts, lists, strings and numbers.
+
+    Readers are compiled from the layouts on first use. They take a ``memoryview`` (or ``bytes``)
+    and a position, and only copy out the decoded values.
+
+    Args:
+        prefix (str): Prefix of public keys (``STM``).
+    """
+
+    def __init__(self, prefix=default_prefix):
+        self.prefix = prefix
+        self._readers = {}
+        self._public_keys = {}
+        self._atoms = {
+            Uint8: _unpacker('<B'),
+            Int16: _unpacker('<h'),
+            Uint16: _unpacker('<H'),
+            Uint32: _unpacker('<I'),
+            Uint64: _unpacker('<Q', format_int64),
+            Int64: _unpacker('<q', format_int64),
+            Bool: _read_bool,
+            String: _read_string,
+            Bytes: _read_bytes,
+            Void: _read_void,
+            PointInTime: _unpacker('<I', format_time),
+            Signature: _read_signature,
+            Version: _read_version,
+            Amount: _read_amount,
+            PublicKey: self._read_public_key,
+            Operation: self._read_operation,
+        }
+        self._operations = [operation_layouts.get(name) for name in op_names]
+        self._header = self.reader(signed_block_header)
+        self._transaction = self.reader(transaction)
+        self._signatures = self.reader((Array, Signature))
+
+    def reader(self, layout):
+        """ The ``read(buf, pos) -> (value, position after it)`` function of ``layout``. """
+        compiled = self._readers.get(id(layout))
+        if compiled is None or compiled[0] is not layout:
+            compiled = self._readers[id(layout)] = (layout, self._compile(layout))
+        return compiled[1]
+
+    def _compile(self, layout):
+        if isinstance(layout, list):
+            return _struct_reader(layout, self.reader)
+        if not isinstance(layout, tuple):
+            try:
+                return self._atoms[layout]
+            except (KeyError, TypeError):
+                raise TypeError('no wire layout for %r' % (layout,))
+
+        kind = layout[0]
+        if kind is FixedBytes:
+            length = layout[1]
+
+            def read(buf, pos):
+                return buf[pos:pos + length].hex(), pos + length
+        elif kind in (Array, Set):
+            read_item = self.reader(layout[1])
+
+            def read(buf, pos):
+                count, pos = read_varint(buf, pos)
+                items = []
+                for _ in range(count):
+                    item, pos = read_item(buf, pos)
+                    items.append(item)
+                return items, pos
+        elif kind is Optional:
+            read_value = self.reader(layout[1])
+
+            def read(buf, pos):
+                if not buf[pos]:
+                    return None, pos + 1
+                return read_value(buf, pos + 1)
+        elif kind is Map:
+            read_key, read_value = self.reader(layout[1]), self.reader(layout[2])
+
+            def read(buf, pos):
+                count, pos = read_varint(buf, pos)
+                items = []
+                for _ in range(count):
+                    key, pos = read_key(buf, pos)
+                    value, pos = read_value(buf, pos)
+                    items.append([key, value])
+                return items, pos
+        elif kind is StaticVariant:
+            variants = [self.reader(variant) for variant in layout[1]]
+
+            def read(buf, pos):
+                type_id, pos = read_varint(buf, pos)
+                if type_id >= len(variants):
+                    raise ValueError('unknown static variant type %d' % type_id)
+                value, pos = variants[type_id](buf, pos)
+                return [type_id, value], pos
+        else:
+            raise TypeError('no wire layout for %r' % (layout,))
+        return read
+
+    def _read_public_key(self, buf, pos):
+        raw = bytes(buf[pos:pos + 33])
+        key = self._public_keys.get(raw)
+        if key is None:
+            # the same few witness and account keys come up over and over
+            if len(self._public_keys) > 100000:
+                self._public_keys.clear()
+            key = self._public_keys[raw] = self.prefix + gphBase58CheckEncode(raw.hex())
+        return key, pos + 33
+
+    def _read_operation(self, buf, pos):
+        op_id, pos = read_varint(buf, pos)
+        layout = self._operations[op_id] if op_id < len(self._operations) else None
+        if layout is None:
+            raise ValueError('unknown operation id %d' % op_id)
+        value, pos = self.reader(layout)(buf, pos)
+        return [op_names[op_id], value], pos
+
+    def operation(self, buf, pos=0):
+        """ Decode an operation into ``[name, fields]``. Returns it, and the position after it. """
+        return self._read_operation(buf, pos)
+
+    def transaction(self, buf, pos=0):
+        """ Decode a signed transaction. Returns it, with its ``transaction_id``, and the position after it. """
+        start = pos
+        trx, pos = self._transaction(buf, pos)
+        trx_id = transaction_id(buf[start:pos])
+        trx['signatures'], pos = self._signatures(buf, pos)
+        trx['transaction_id'] = trx_id
+        return trx, pos
+
+    def block(self, buf, pos=0):
+        """ Decode a signed block, as ``get_block`` returns it (without the ``signing_key``).
+
+        Returns it, and the position after it.
+        """
+        start = pos
+        block, pos = self._header(buf, pos)
+        block_num = int(block['previous'][:8], 16) + 1
+        block['block_id'] = block_id(block_num, buf[start:pos])
+
+        count, pos = read_varint(buf, pos)
+        transactions = []
+        for transaction_num in range(count):
+            trx, pos = self.transaction(buf, pos)
+            trx['block_num'] = block_num
+            trx['transaction_num'] = transaction_num
+            transactions.append(trx)
+        block['transactions'] = transactions
+        block['transaction_ids'] = [trx['transaction_id'] for trx in transactions]
+        return block, pos
+
+
+_varints = [bytes([n]) for n in range(0x80)]
+_required = object()
+
+
+def _cached(convert):
+    """ ``convert``, remembering its results: the same few amounts, keys and times come up over and over. """
+    cache = {}
+
+    def cached(value):
+        try:
+            return cache[value]
+        except KeyError:
+            if len(cache) > 100000:
+                cache.clear()
+            result = cache[value] = convert(value)
+            return result
+
+    return cached
+
+
+def _write_varint(out, n):
+    out += _varints[n] if n < 0x80 else varint(n)
+
+
+def _write_string(out, value):
+    if not isinstance(value, str):
+        # json_metadata and the like may be given as objects
+        value = json.dumps(value) if value else ''
+    data = String(value).unicodify() if control_chars.search(value) else value.encode('utf-8')
+    length = len(data)
+    out += _varints[length] if length < 0x80 else varint(length)
+    out += data
+
+
+def _write_bytes(out, value):
+    data = unhexlify(value)
+    _write_varint(out, len(data))
+    out += data
+
+
+def _write_void(out, value):
+    pass
+
+
+def _bool(value):
+    return 1 if value else 0
+
+
+def _fixed_bytes(length):
+    def convert(value):
+        data = unhexlify(value)
+        if len(data) != length:
+            raise ValueError('expected %d bytes, got %d' % (length, len(data)))
+        return data
+
+    return convert
+
+
+def _run_step(run):
+    """ Write the fixed size fields of ``run`` with a single ``struct`` format. """
+    pack = struct.Struct('<' + ''.join(fmt for _, fmt, _ in run)).pack
+    fields = [(name, convert) for name, _, convert in run]
+
+    def step(out, value):
+        out += pack(*[convert(value[name]) for name, convert in fields])
+
+    return step
+
+
+def _field_step(name, write, default):
+    if default is _required:
+        def step(out, value):
+            write(out, value[name])
+    else:
+        def step(out, value):
+            write(out, value.get(name, default))
+    return step
+
+
+class WireEncoder(object):
+    """ Encodes values as the RPC API shows them (dicts, lists, strings and numbers) into the wire format.
+
+    Each layout is compiled on first use into a packing plan: runs of fixed size fields are packed
+    with a single ``struct`` format, strings and arrays are written with their varint length, all
+    into one ``bytearray``. The operation classes serialize with these plans too (see
+    :class:`steepbase.operations.LayoutObject`), and the output is the same as the one of the
+    :mod:`steepbase.types` objects of their ``data``: ``encode_operation(op) == bytes(Operation(op))``.
+
+    Missing strings are written empty and missing optionals unset, and maps are sorted as
+    :class:`steepbase.operations.Permission` sorts them.
+
+    Args:
+        prefix (str): Prefix of public keys (``STM``).
+    """
+
+    def __init__(self, prefix=default_prefix):
+        self.prefix = prefix
+        self._writers = {}
+        self._fixed = {
+            Uint8: ('B', int),
+            Int16: ('h', int),
+            Uint16: ('H', int),
+            Uint32: ('I', int),
+            Uint64: ('Q', int),
+            Int64: ('q', int),
+            Bool: ('B', _bool),
+            PointInTime: ('4s', _cached(lambda value: bytes(PointInTime(value)))),
+            Signature: ('65s', unhexlify),
+            Version: ('4s', _cached(lambda value: bytes(Version(value)))),
+            Amount: ('16s', _cached(lambda value: bytes(Amount(value)))),
+            PublicKey: ('33s', _cached(self._public_key)),
+        }
+        self._atoms = {
+            String: _write_string,
+            Bytes: _write_bytes,
+            Void: _write_void,
+            Operation: self._write_operation,
+        }
+        self._operations = [operation_layouts.get(name) for name in op_names]
+        self._transaction = self.writer(transaction)
+        self._signed_transaction = self.writer(signed_transaction)
+
+    def writer(self, layout):
+        """ The ``write(out, value)`` function of ``layout``, which appends ``value`` to the ``bytearray`` ``out``. """
+        compiled = self._writers.get(id(layout))
+        if compiled is None or compiled[0] is not layout:
+            compiled = self._writers[id(layout)] = (layout, self._compile(layout))
+        return compiled[1]
+
+    def _fixed_atom(self, layout):
+        """ The ``(struct format, convert)`` of a fixed size layout, ``None`` for the others. """
+        if isinstance(layout, tuple):
+            if layout[0] is FixedBytes:
+                return '%ds' % layout[1], _fixed_bytes(layout[1])
+            return None
+        if isinstance(layout, list):
+            return None
+        return self._fixed.get(layout)
+
+    def _compile(self, layout):
+        if isinstance(layout, list):
+            return self._struct_writer(layout)
+
+        fixed = self._fixed_atom(layout)
+        if fixed is not None:
+            pack, convert = struct.Struct('<' + fixed[0]).pack, fixed[1]
+
+            def write(out, value):
+                out += pack(convert(value))
+            return write
+        if not isinstance(layout, tuple):
+            try:
+                return self._atoms[layout]
+            except (KeyError, TypeError):
+                raise TypeError('no wire layout for %r' % (layout,))
+
+        kind = layout[0]
+        if kind in (Array, Set):
+            write_item = self.writer(layout[1])
+
+            def write(out, value):
+                _write_varint(out, len(value))
+                for item in value:
+                    write_item(out, item)
+        elif kind is Optional:
+            write_value = self.writer(layout[1])
+
+            def write(out, value):
+                if value is None:
+                    out.append(0)
+                else:
+                    out.append(1)
+                    write_value(out, value)
+        elif kind is Map:
+            write_key, write_value = self.writer(layout[1]), self.writer(layout[2])
+            by_key_bytes = layout[1] is PublicKey
+
+            def write(out, value):
+                items = []
+                for key, item in value:
+                    key_bytes = bytearray()
+                    write_key(key_bytes, key)
+                    items.append((bytes(key_bytes) if by_key_bytes else key, key_bytes, item))
+                items.sort(key=lambda entry: entry[0])
+                _write_varint(out, len(items))
+                for _, key_bytes, item in items:
+                    out += key_bytes
+                    write_value(out, item)
+        elif kind is StaticVariant:
+            variants = [self.writer(variant) for variant in layout[1]]
+
+            def write(out, value):
+                type_id, data = value
+                _write_varint(out, type_id)
+                variants[type_id](out, data)
+        else:
+            raise TypeError('no wire layout for %r' % (layout,))
+        return write
+
+    def _struct_writer(self, layout):
+        steps = []
+        run = []
+        for name, field_layout in layout:
+            fixed = self._fixed_atom(field_layout)
+            if fixed is not None:
+                run.append((name,) + fixed)
+                continue
+            if run:
+                steps.append(_run_step(run))
+                run = []
+            if field_layout is String:
+                default = ''
+            elif is_optional(field_layout):
+                default = None
+            else:
+                default = _required
+            steps.append(_field_step(name, self.writer(field_layout), default))
+        if run:
+            steps.append(_run_step(run))
+
+        if len(steps) == 1:
+            return steps[0]
+
+        def write(out, value):
+            for step in steps:
+                step(out, value)
+
+        return write
+
+    def _public_key(self, value):
+        # an empty key is the null key, as for the block_signing_key of witness_update
+        return bytes(PublicKey(value or 'STM1111111111111111111111111111111114T1Anm', prefix=self.prefix))
+
+    def _write_operation(self, out, op):
+        if isinstance(op, Operation):
+            out += bytes(op)
+            return
+        name, data = op
+        op_id = name if isinstance(name, int) else operations.get(name)
+        layout = self._operations[op_id] if op_id is not None and 0 <= op_id < len(self._operations) else None
+        if layout is None:
+            raise ValueError('Unknown operation %s' % name)
+        _write_varint(out, op_id)
+        self.writer(layout)(out, data)
+
+    def operation(self, op, out=None):
+        """ Write ``op``, ``[name or id, fields]``, to ``out`` (by default a new ``bytearray``). Returns ``out``. """
+        if out is None:
+            out = bytearray()
+        self._write_operation(out, op)
+        return out
+
+    def transaction(self, trx, out=None, signatures=True):
+        """ Write transaction ``trx`` to ``out`` (by default a new ``bytearray``), with its signatures
+        unless ``signatures`` is false, as it is signed. Returns ``out``. """
+        if out is None:
+            out = bytearray()
+        trx = dict(trx, extensions=trx.get('extensions') or [], signatures=trx.get('signatures') or [])
+        (self._signed_transaction if signatures else self._transaction)(out, trx)
+        return out
+
+
+_decoders = {}
+
+
+def get_decoder(prefix=default_prefix):
+    """ The shared :class:`WireDecoder` of ``prefix``. """
+    decoder = _decoders.get(prefix)
+    if decoder is None:
+        decoder = _decoders[prefix] = WireDecoder(prefix)
+    return decoder
+
+
+_encoders = {}
+
+
+def get_encoder(prefix=default_prefix):
+    """ The shared :class:`WireEncoder` of ``prefix``. """
+    encoder = _encoders.get(prefix)
+    if encoder is None:
+        encoder = _encoders[prefix] = WireEncoder(prefix)
+    return encoder
+
+
+def _decode(read, data):
+    buf = memoryview(unhexlify(data) if isinstance(data, str) else data)
+    value, pos = read(buf, 0)
+    if pos != len(buf):
+        raise ValueError('%d bytes left after decoding' % (len(buf) - pos))
+    return value
+
+
+def _operation(op, prefix):
+    if prefix != default_prefix:
+        op = [op[0], dict(op[1], prefix=prefix)]
+    return Operation(op)
+
+
+def decode_operation(data, prefix=default_prefix):
+    """ The :class:`steepbase.operations.Operation` serialized in ``data``: bytes, a ``memoryview``, or hex. """
+    return _operation(_decode(get_decoder(prefix).operation, data), prefix)
+
+
+def decode_transaction(data, prefix=default_prefix):
+    """ The :class:`steepbase.transactions.SignedTransaction` serialized in ``data``: bytes, a ``memoryview``,
+    or hex (ie. from ``get_transaction_hex``). """
+    trx = _decode(get_decoder(prefix).transaction, data)
+    return SignedTransaction(
+        ref_block_num=trx['ref_block_num'],
+        ref_block_prefix=trx['ref_block_prefix'],
+        expiration=trx['expiration'],
+        operations=[_operation(op, prefix) for op in trx['operations']],
+        extensions=wire_object(future_extensions, trx['extensions'], prefix),
+        signatures=trx['signatures'])
+
+
+def encode_operation(op, prefix=default_prefix):
+    """ The wire bytes of ``op``, ``[name or id, fields]`` as the API shows it. """
+    return bytes(get_encoder(prefix).operation(op))
+
+
+def encode_transaction(trx, prefix=default_prefix):
+    """ The wire bytes of the signed transaction ``trx``, a dict as the API shows it. """
+    return bytes(get_encoder(prefix).transaction(trx))
+
+
+class CompiledOperation(Operation):
+    """ An :class:`steepbase.operations.Operation` straight from its fields, as the API shows them.
+
+    It goes wherever an ``Operation`` does, ie. in the ``operations`` of a ``SignedTransaction``
+    to sign. Operations serialize with the same packing plan, but unlike the operation classes,
+    this checks the fields no further than serializing them, and never builds their objects.
+
+    Args:
+        op (list): ``[name or id, fields]``, as the API shows it.
+        prefix (str): Prefix of public keys (``STM``).
+    """
+
+    def __init__(self, op, prefix=default_prefix):
+        name, data = op
+        self._bytes = encode_operation(op, prefix)
+        self.opId = name if isinstance(name, int) else operations[name]
+        self.name = self.to_class_name(op_names[self.opId])
+        self.op = data
+
+    def __bytes__(self):
+        return self._bytes
+
+    def __str__(self):
+        return json.dumps([op_names[self.opId], self.op])
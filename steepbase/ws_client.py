@@ -1,12 +1,18 @@
+import concurrent.futures
 import logging
 import ssl
+import threading
 import time
-from itertools import cycle
+from itertools import count, cycle
 
 import websocket
 
 from steepbase.base_client import BaseClient
+from steepbase.cache import SingleFlight
+from steepbase.json_codec import get_codec
+from steepbase.retry import RetryPolicy
 from steepbase.exceptions import NumRetriesReached
+from steepbase.instrumentation import CallRecord
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +24,17 @@ class WsClient(BaseClient):
 
         Args:
           nodes (list): A list of Steem WebSocket RPC nodes to connect to.
+          multiplex (bool): Read responses on a background thread and match them to
+            calls by JSON-RPC ``id``, so many calls (ie. from ``call_multi_with_futures``)
+            can be in flight on the same connection. Calls still waiting for an answer
+            are replayed to the next node if the connection drops.
+            Subscriptions (see `set_block_applied_callback`) of a client without it use a
+            multiplexed connection of their own.
+          timeout (float): With ``multiplex``, max seconds to wait for a response (60 by default).
+            Calls timing out raise ``concurrent.futures.TimeoutError``.
+          num_retries (int): Retries of a failed call or connection attempt, -1 for no limit.
+          retry_policy (RetryPolicy): Backoff, attempts, deadline and budget of retries, instead of ``num_retries``.
+            See :class:`steepbase.retry.RetryPolicy`.
 
         .. code-block:: python
 
@@ -43,20 +60,48 @@ class WsClient(BaseClient):
         super().__init__()
 
         self.return_with_args = kwargs.get('return_with_args', False)
+        self.single_flight = SingleFlight() if kwargs.get('single_flight') else None
+        self.codec = get_codec(kwargs.get('json_codec'))
 
+        self.max_workers = kwargs.get('max_workers', None)
         self.num_retries = kwargs.get("num_retries", 20)
+        self.retry_policy = kwargs.get('retry_policy', None) or RetryPolicy(
+            max_attempts=self.num_retries + 1 if self.num_retries >= 0 else None)
+        self.multiplex = kwargs.get('multiplex', False)
+        self.timeout = kwargs.get('timeout', 60)
+        self.node_urls = list(nodes)
         self.nodes = cycle(nodes)
         self.url = ''
         self.ws = None
 
+        # serializes send/recv pairs in the non-multiplexed mode, and sends in the multiplexed one
+        self._send_lock = threading.RLock()
+        self._pending_lock = threading.Lock()
+        self._pending = {}
+        self._subscriptions = {}
+        self._ids = count(1)
+        self._reader = None
+        self._subscriber = None
+        self._closed = False
+
         log_level = kwargs.get('log_level', logging.INFO)
         logger.setLevel(log_level)
         self.ws_connect()
 
+        if self.multiplex:
+            self._start_reader()
+
+    def _start_reader(self):
+        # no non-multiplexed call is waiting for its response while the send lock is held
+        with self._send_lock:
+            if self._reader is None:
+                self.multiplex = True
+                self._reader = threading.Thread(target=self._read_loop, name='WsClient-reader', daemon=True)
+                self._reader.start()
+
     def ws_connect(self):
-        cnt = 0
+        retry = self.retry_policy.begin()
         while True:
-            cnt += 1
             self.url = next(self.nodes)
             logger.debug("Trying to connect to node %s" % self.url)
             if self.url[:3] == "wss":
@@ -70,45 +115,59 @@ class WsClient(BaseClient):
                 break
             except KeyboardInterrupt:
                 raise
-            except:
-                if self.num_retries >= 0 and cnt > self.num_retries:
-                    raise NumRetriesReached()
-
-                sleeptime = (cnt - 1) * 2 if cnt < 10 else 10
-                if sleeptime:
-                    logger.warning(
-                        "Lost connection to node during wsconnect(): %s (%d/%d) "
-                        % (self.url, cnt, self.num_retries) +
-                        "Retrying in %d seconds" % sleeptime
-                    )
-                    time.sleep(sleeptime)
+            except Exception as e:
+                sleeptime = retry.backoff(e)
+                logger.warning(
+                    "Lost connection to node during wsconnect(): %s (%d/%d) "
+                    % (self.url, retry.attempts, self.num_retries) +
+                    "Retrying in %.1f seconds" % sleeptime
+                )
+                time.sleep(sleeptime)
+
+    def close(self):
+        """ Close the connection, and stop the background reader. """
+        self._closed = True
+        try:
+            self.ws.close()
+        except Exception:
+            pass
+        self._fail_pending(NumRetriesReached('connection closed'))
+        if self._subscriber is not None:
+            self._subscriber.close()
+        super().close()
 
     def call(self, name, *args, api=None, return_with_args=None, _ret_cnt=0):
-        body = WsClient.json_rpc_body(name, *args, api=api)
+        if self.hooks:
+            return self._instrumented(CallRecord(name, api), self._call, name, args, api, return_with_args)
+        return self._call(name, args, api, return_with_args)
+
+    def _call(self, name, args, api=None, return_with_args=None, record=None):
+        if self.multiplex:
+            return self._call_multiplexed(name, *args, api=api, return_with_args=return_with_args, record=record)
+
+        body = WsClient.json_rpc_body(name, *args, api=api, codec=self.codec)
 
         response = None
 
-        cnt = 0
+        retry = self.retry_policy.begin()
         while True:
-            cnt += 1
-
             try:
-                self.ws.send(body)
-                response = self.ws.recv()
+                with self._send_lock:
+                    self.ws.send(body)
+                    response = self.ws.recv()
+                if record is not None:
+                    record.node, record.retries = self.url, retry.attempts
+                    record.request_bytes, record.response_bytes = len(body), len(response or b'')
                 break
             except KeyboardInterrupt:
                 raise
-            except:
-                if self.num_retries > -1 and cnt > self.num_retries:
-                    raise NumRetriesReached()
-                sleeptime = (cnt - 1) * 2 if cnt < 10 else 10
-                if sleeptime:
-                    logger.warning(
-                        "Lost connection to node during call(): %s (%d/%d) "
-                        % (self.url, cnt, self.num_retries) +
-                        "Retrying in %d seconds" % sleeptime
-                    )
-                    time.sleep(sleeptime)
+            except Exception as e:
+                sleeptime = retry.backoff(e)
+                logger.warning(
+                    "Lost connection to node during call(): %s (%d/%d) "
+                    % (self.url, retry.attempts, self.num_retries) +
+                    "Retrying in %.1f seconds" % sleeptime
+                )
 
                 # retry
                 try:
@@ -122,3 +181,192 @@ class WsClient(BaseClient):
             response=response,
             args=args,
             return_with_args=return_with_args)
+
+    def _call_multiplexed(self, name, *args, api=None, return_with_args=None, record=None, timeout=None):
+        if self._closed:
+            raise NumRetriesReached('connection closed')
+
+        _id = next(self._ids)
+        body = WsClient.json_rpc_body(name, *args, api=api, _id=_id, codec=self.codec)
+        future = concurrent.futures.Future()
+        with self._pending_lock:
+            self._pending[_id] = (body, future)
+
+        try:
+            with self._send_lock:
+                self.ws.send(body)
+        except Exception as e:
+            # the reader notices the broken connection, reconnects and replays pending calls
+            logger.debug('Send failed on %s: %s', self.url, e)
+
+        try:
+            response = future.result(timeout=timeout or self.timeout)
+        finally:
+            # timed out calls are not replayed anymore
+            with self._pending_lock:
+                self._pending.pop(_id, None)
+        if record is not None:
+            # the response was decoded by the reader, its size is unknown
+            record.node, record.request_bytes = self.url, len(body)
+
+        return self._return(
+            response=response,
+            args=args,
+            return_with_args=return_with_args)
+
+    def set_block_applied_callback(self, callback, timeout=None):
+        """ Have ``callback(block_header)`` called for every block the node applies, as it is applied.
+
+        The callback runs on the background reader thread, and should hand the header over
+        rather than make calls itself. The subscription is renewed when the client reconnects,
+        blocks applied in between are not notified.
+
+        Notifications have to be read as they come, so a client without ``multiplex`` subscribes
+        on a multiplexed connection of its own to the same node, closed with its last subscription.
+        The calls of the client itself are left as they are.
+
+        Args:
+            callback: Called with the header of each new block.
+            timeout (float): Max seconds to wait for the node to accept the subscription.
+                Defaults to ``timeout``.
+
+        Returns:
+            int: Subscription id, for `remove_block_applied_callback`.
+
+        Raises:
+            RPCError: If the node doesn't support subscriptions (ie. appbase nodes).
+        """
+        if not self.multiplex:
+            return self._subscribe_separately(callback, timeout)
+
+        subscription_id = next(self._ids)
+        self._subscriptions[subscription_id] = (
+            WsClient.json_rpc_body('set_block_applied_callback', subscription_id, api='database_api',
+                                   _id=subscription_id, codec=self.codec),
+            callback)
+        try:
+            self._call_multiplexed('set_block_applied_callback', subscription_id, api='database_api',
+                                   timeout=timeout)
+        except Exception:
+            self._subscriptions.pop(subscription_id, None)
+            raise
+        return subscription_id
+
+    def _subscribe_separately(self, callback, timeout):
+        with self._pending_lock:
+            if self._subscriber is None:
+                # start with the node this client is connected to
+                start = self.node_urls.index(self.url) if self.url in self.node_urls else 0
+                self._subscriber = WsClient(self.node_urls[start:] + self.node_urls[:start], multiplex=True,
+                                            timeout=self.timeout, retry_policy=self.retry_policy,
+                                            json_codec=self.codec)
+            subscriber = self._subscriber
+        try:
+            return subscriber.set_block_applied_callback(callback, timeout)
+        except Exception:
+            self._close_idle_subscriber()
+            raise
+
+    def _close_idle_subscriber(self):
+        with self._pending_lock:
+            subscriber = self._subscriber
+            if subscriber is None or subscriber._subscriptions:
+                return
+            self._subscriber = None
+        subscriber.close()
+
+    def remove_block_applied_callback(self, subscription_id):
+        """ Stop calling the callback of ``subscription_id``. Subscriptions are cancelled on the
+        node once none is left. """
+        subscriber = self._subscriber
+        if subscriber is not None and subscription_id in subscriber._subscriptions:
+            subscriber.remove_block_applied_callback(subscription_id)
+            self._close_idle_subscriber()
+            return
+        if self._subscriptions.pop(subscription_id, None) is None or self._subscriptions or self._closed:
+            return
+        try:
+            self._call_multiplexed('cancel_all_subscriptions', api='database_api')
+        except Exception as e:
+            logger.debug('Failed to cancel subscriptions on %s: %s', self.url, e)
+
+    def _read_loop(self):
+        error = NumRetriesReached('connection closed')
+        try:
+            while not self._closed:
+                try:
+                    raw = self.ws.recv()
+                    if not raw:
+                        raise ConnectionError('empty frame from %s' % self.url)
+                except Exception as e:
+                    if self._closed:
+                        break
+                    logger.warning('Lost connection to node %s: %s', self.url, e)
+                    try:
+                        self._reconnect()
+                    except Exception as reconnect_error:
+                        error = reconnect_error
+                        self._closed = True
+                        break
+                    continue
+
+                try:
+                    message = self.codec.loads(raw)
+                except ValueError:
+                    logger.info('failed to load response', extra=dict(response=raw))
+                    continue
+
+                self._dispatch(message)
+        finally:
+            # nothing answers the calls still waiting once the reader is gone
+            self._fail_pending(error)
+
+    def _dispatch(self, message):
+        if message.get('method') == 'notice':
+            subscription_id, values = (message.get('params') or [None, []])[:2]
+            entry = self._subscriptions.get(subscription_id)
+            if entry is None:
+                logger.debug('Dropping notice of unknown subscription: %s', subscription_id)
+                return
+            try:
+                entry[1](*values)
+            except Exception:
+                logger.exception('Subscription callback failed')
+            return
+
+        with self._pending_lock:
+            entry = self._pending.pop(message.get('id'), None)
+        if entry is None:
+            logger.debug('Dropping response without a caller: %s', message.get('id'))
+            return
+        entry[1].set_result(message)
+
+    def _reconnect(self):
+        """ Connect to the next node, and replay calls which are still waiting for a response. """
+        with self._send_lock:
+            try:
+                self.ws.close()
+            except Exception:
+                pass
+            self.ws_connect()
+
+            with self._pending_lock:
+                bodies = [body for body, _ in self._pending.values()]
+            for body in bodies:
+                self.ws.send(body)
+            if bodies:
+                logger.info('Replayed %d pending calls to %s', len(bodies), self.url)
+
+            # their responses have no caller waiting, and are dropped
+            subscriptions = [body for body, _ in list(self._subscriptions.values())]
+            for body in subscriptions:
+                self.ws.send(body)
+            if subscriptions:
+                logger.info('Renewed %d subscriptions on %s', len(subscriptions), self.url)
+
+    def _fail_pending(self, error):
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        for _, future in pending.values():
+            if not future.done():
+                future.set_exception(error)
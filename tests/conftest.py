@@ -0,0 +1,19 @@
+import pytest
+
+from steep.steemd import Steemd
+from steepbase.fake_steemd import FakeSteemd
+
+
+@pytest.fixture
+def node():
+    """ A FakeSteemd at block 100 that only produces blocks when told to. """
+    with FakeSteemd(head_block=100, produce_blocks=False) as node:
+        yield node
+
+
+@pytest.fixture
+def steemd(node):
+    """ A Steemd talking to ``node`` over HTTP. """
+    s = Steemd(nodes=[node.serve_http()], max_workers=4)
+    yield s
+    s.close()
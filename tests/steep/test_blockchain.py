@@ -0,0 +1,146 @@
+import time
+
+import pytest
+
+from steep.blockchain import Blockchain
+from steep.steemd import Steemd
+from steepbase.exceptions import NumRetriesReached
+from steepbase.fake_steemd import FakeSteemd
+from steepbase.storage import Checkpoints
+
+
+def test_blockchain(steemd):
+    blockchain = Blockchain(steemd)
+    ops = list(blockchain.stream_from(start_block=1, end_block=50))
+    assert {op['block'] for op in ops} == set(range(1, 51))
+
+
+@pytest.mark.parametrize('subscriptions', [True, False])
+def test_stream_subscription(subscriptions):
+    with FakeSteemd(head_block=100, produce_blocks=False, block_interval=0.5, subscriptions=subscriptions) as node:
+        s = Steemd(nodes=[node.serve_ws()])
+        stream = Blockchain(s, mode='head').stream_from(start_block=99, full_blocks=True, subscribe=True)
+        assert next(stream)['block_id'] == node.chain.block_id(99)
+        assert next(stream)['block_id'] == node.chain.block_id(100)
+
+        requests = node.requests
+        node.chain.produce_block()
+        started = time.monotonic()
+        assert next(stream)['block_id'] == node.chain.block_id(101)
+        if subscriptions:
+            assert time.monotonic() - started < 0.3
+            assert node.requests - requests == 1  # get_block only, no polling
+        stream.close()
+        # notifications came on a connection of their own, closed with the stream
+        assert not s.client.multiplex and s.client._subscriber is None
+        s.client.close()
+
+
+def test_stream_subscription_failure(node, steemd):
+    def set_block_applied_callback(callback, timeout=None):
+        raise NumRetriesReached('connection closed')
+
+    steemd.set_block_applied_callback = set_block_applied_callback
+    stream = Blockchain(steemd, mode='head').stream_from(start_block=99, full_blocks=True, subscribe=True)
+    assert next(stream)['block_id'] == node.chain.block_id(99)  # polling instead
+    stream.close()
+
+
+def test_stream_adaptive_polling():
+    with FakeSteemd(head_block=100, block_interval=1, realtime=True) as node:
+        blockchain = Blockchain(Steemd(nodes=[node.serve_http()]), mode='head')
+        stream = blockchain.stream_from(full_blocks=True, subscribe=False)
+        for _ in range(4):
+            next(stream)
+        stream.close()
+        assert blockchain.delivery_latency.count == 3
+        assert blockchain.delivery_latency.quantile(1) < 0.7
+
+        head_time = node.chain.dynamic_global_properties()['time']
+        assert 0 < blockchain._next_poll_delay(head_time, 1, misses=0) <= 1
+        assert blockchain._next_poll_delay(head_time, 1, misses=2) == 0.5
+        assert blockchain._next_poll_delay(head_time, 1, misses=5) == 1
+
+
+def test_stream_prefetch(node, steemd):
+    for batch in (True, False):
+        if not batch:
+            steemd.client.non_batch_nodes.add(steemd.client.url)
+        for workers in (None, 3):
+            blocks = Blockchain(steemd).stream_from(start_block=1, end_block=80, full_blocks=True,
+                                               prefetch=20, prefetch_workers=workers)
+            assert [b['block_id'] for b in blocks] == [node.chain.block_id(n) for n in range(1, 81)]
+    steemd.client.non_batch_nodes.discard(steemd.client.url)
+
+
+def test_stream_checkpoint(node, steemd, tmpdir):
+    store = Checkpoints(str(tmpdir.join('checkpoints.sqlite')))
+    blockchain = Blockchain(steemd)
+    all_ops = list(blockchain.stream_from(start_block=1, end_block=30))
+
+    def stream(**kwargs):
+        return blockchain.stream_from(start_block=1, end_block=30, checkpoint='test', checkpoint_store=store,
+                                      **kwargs)
+
+    # processed items are the ones before the last one yielded
+    ops = []
+    for i, op in enumerate(stream(checkpoint_every=5)):
+        ops.append(op)
+        if i == 40:
+            break
+    ops.pop()
+    assert store.load('test') == (ops[-1]['block'], [op['block'] for op in ops].count(ops[-1]['block']) - 1)
+    ops += list(stream(checkpoint_every=5))
+    assert ops == all_ops
+    assert store.load('test') == (30, None)
+    assert list(stream()) == []
+
+    store.delete('test')
+    blocks = stream(full_blocks=True)
+    assert next(blocks)['block_id'] == node.chain.block_id(1)
+    next(blocks)
+    blocks.close()
+    assert store.load('test') == (1, None)
+    assert next(stream(full_blocks=True))['block_id'] == node.chain.block_id(2)
+
+
+@pytest.mark.parametrize('url', ['serve_http', 'serve_ws'])
+def test_stream_head_fork(node, url):
+    s = Steemd(nodes=[getattr(node, url)()])
+    events = Blockchain(s, mode='head').stream_head(start_block=98)
+    assert [(kind, block['block_num']) for kind, block in (next(events) for _ in range(3))] == \
+        [('apply', 98), ('apply', 99), ('apply', 100)]
+    orphaned = node.chain.block_id(100)
+
+    node.chain.fork(depth=2)
+    node.chain.produce_block()
+    assert [(kind, block['block_num']) for kind, block in (next(events) for _ in range(5))] == \
+        [('rollback', 100), ('rollback', 99), ('apply', 99), ('apply', 100), ('apply', 101)]
+    events.close()
+    assert node.chain.block_id(100) != orphaned
+    assert node.chain.block(101)['previous'] == node.chain.block_id(100)
+    s.client.close()
+
+
+def test_stream_head_fork_lagging_node(node, steemd):
+    events = Blockchain(steemd, mode='head').stream_head(start_block=99)
+    assert [(kind, block['block_num']) for kind, block in (next(events) for _ in range(2))] == \
+        [('apply', 99), ('apply', 100)]
+    orphaned = node.chain.block_id(100)
+
+    node.chain.fork(depth=1)
+    node.chain.produce_block()
+    get_block, missing = steemd.get_block, [100]
+
+    def lagging_get_block(num):
+        # the node hasn't got the replacement of block 100 yet on the first try
+        if num in missing:
+            missing.remove(num)
+            return None
+        return get_block(num)
+
+    steemd.get_block = lagging_get_block
+    assert [(kind, block['block_id']) for kind, block in (next(events) for _ in range(3))] == \
+        [('rollback', orphaned), ('apply', node.chain.block_id(100)), ('apply', node.chain.block_id(101))]
+    assert not missing
+    events.close()
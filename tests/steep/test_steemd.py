@@ -46,3 +46,19 @@ def test_ensured_block_ranges():
     # for fuzzing in s.get_block_range_ensured() use:
     # degraded_results = [x for x in results if x['block_num'] %
     #     random.choice(range(1, 10)) != 0]
+
+
+def test_iter_blocks(steemd):
+    for batch in (True, False):
+        steemd.client.batch_size = 7
+        if not batch:
+            steemd.client.non_batch_nodes.add(steemd.client.url)
+        blocks = steemd.iter_blocks(range(1, 101), window=3)
+        assert [b['block_num'] for b in blocks] == list(range(1, 101))
+    steemd.client.non_batch_nodes.discard(steemd.client.url)
+
+
+def test_call_streaming(node, steemd):
+    assert list(steemd.stream_block_transactions(10)) == node.chain.block(10)['transactions']
+    assert list(steemd.stream_block_transactions(1000)) == []
+    assert list(steemd.stream_account_history('user1', -1, 50)) == steemd.get_account_history('user1', -1, 50)
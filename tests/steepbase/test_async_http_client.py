@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from steep.consts import CONDENSER_API
+
+aiohttp = pytest.importorskip('aiohttp')
+from aiohttp import web  # noqa
+
+from steep.async_steemd import AsyncSteemd  # noqa
+from steepbase.async_http_client import AsyncHttpClient  # noqa
+from steepbase.exceptions import RPCError  # noqa
+
+
+async def start_node(handler):
+    app = web.Application()
+    app.router.add_post('/', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, 'http://127.0.0.1:%d/' % port
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def test_concurrent_calls():
+    in_flight = {'now': 0, 'max': 0}
+
+    async def handler(request):
+        body = await request.json()
+        in_flight['now'] += 1
+        in_flight['max'] = max(in_flight['max'], in_flight['now'])
+        await asyncio.sleep(0.05)
+        in_flight['now'] -= 1
+        return web.json_response({'jsonrpc': '2.0', 'id': body['id'], 'result': body['params']})
+
+    async def main():
+        runner, url = await start_node(handler)
+        try:
+            async with AsyncHttpClient([url]) as client:
+                return await asyncio.gather(*[client.call('get_block', num, api='database_api')
+                                              for num in range(50)])
+        finally:
+            await runner.cleanup()
+
+    results = run(main())
+    assert [r[2] for r in results] == [[num] for num in range(50)]
+    assert results[0][:2] == [CONDENSER_API, 'get_block']
+    assert in_flight['max'] > 1
+
+
+def test_failover_and_errors():
+    async def locked(request):
+        body = await request.json()
+        return web.json_response({'jsonrpc': '2.0', 'id': body['id'],
+                                  'error': {'code': -32003, 'message': 'Unable to acquire database lock'}})
+
+    async def healthy(request):
+        body = await request.json()
+        if body['params'][1] == 'nope':
+            return web.json_response({'jsonrpc': '2.0', 'id': body['id'],
+                                      'error': {'code': -32601, 'message': 'no method'}})
+        return web.json_response({'jsonrpc': '2.0', 'id': body['id'], 'result': 42})
+
+    async def main():
+        runner1, url1 = await start_node(locked)
+        runner2, url2 = await start_node(healthy)
+        try:
+            async with AsyncHttpClient([url1, url2]) as client:
+                result = await client.call('get_config')
+                assert client.url == url2
+                with pytest.raises(RPCError):
+                    await client.call('nope')
+                return result
+        finally:
+            await runner1.cleanup()
+            await runner2.cleanup()
+
+    assert run(main()) == 42
+
+
+def test_block_store(node, tmpdir):
+    async def main():
+        async with AsyncSteemd(nodes=[node.serve_http()], block_store=str(tmpdir)) as s:
+            # blocking helpers aren't there at all
+            assert not hasattr(s, 'backfill_block_store') and not hasattr(s, 'map_ordered')
+            await s.get_dynamic_global_properties()
+            blocks = [await s.get_block(10) for _ in range(2)]
+            return blocks, node.requests
+
+    blocks, requests = run(main())
+    assert blocks == [node.chain.block(10)] * 2
+    assert requests == 2  # the second get_block came from the store
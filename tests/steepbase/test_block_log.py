@@ -0,0 +1,72 @@
+import json
+import os
+import struct
+from binascii import unhexlify
+
+from steep.blockchain import Blockchain
+from steepbase.block_log import BlockLog
+from steepbase.transactions import SignedTransaction
+from steepbase.types import Array, FixedBytes, PointInTime, String, varint
+from steepbase.wire import block_id
+
+with open(os.path.join(os.path.dirname(__file__), '..', 'block_data', 'block.json')) as f:
+    block_data = json.load(f)
+
+
+def write_block_log(path, first_block, count):
+    """ Write ``count`` copies of the test block, as blocks ``first_block`` and on. """
+    previous = '%08x' % (first_block - 1) + '0' * 32
+    positions = []
+    with open(path, 'wb') as log:
+        for num in range(first_block, first_block + count):
+            header = (bytes(FixedBytes(previous)) + bytes(PointInTime(block_data['timestamp'])) +
+                      bytes(String(block_data['witness'])) + bytes(FixedBytes(block_data['transaction_merkle_root'])) +
+                      bytes(Array([])) + unhexlify(block_data['witness_signature']))
+            transactions = [bytes(SignedTransaction(**trx)) for trx in block_data['transactions']]
+            positions.append(log.tell())
+            log.write(header + varint(len(transactions)) + b''.join(transactions) + struct.pack('<Q', positions[-1]))
+            previous = block_id(num, header)
+    with open(path + '.index', 'wb') as index:
+        index.write(b''.join(struct.pack('<Q', position) for position in positions))
+
+
+def test_block_log(tmpdir):
+    path = str(tmpdir.join('block_log'))
+    write_block_log(path, 1, 3)
+
+    log = BlockLog(str(tmpdir))
+    assert log.head_block_num == 3
+    block = log.get_block(1)
+    for key, value in block_data.items():
+        if key not in ('previous', 'transactions'):
+            assert block[key] == value
+    for trx, expected in zip(block['transactions'], block_data['transactions']):
+        assert {key: trx[key] for key in expected} == expected
+    assert block['transaction_ids'][0] == '97bd45dd0385924111de6f6bcbcb92d3d825ac47'
+    assert log.get_block(2)['previous'] == block['block_id']
+    assert log.get_block(4) is None and log.get_block(0) is None
+    ops = log.get_ops(3)
+    assert [(op['op'][0], op['trx_in_block']) for op in ops] == [
+        ('comment', 0), ('witness_update', 1), ('account_update', 2), ('account_update', 3)]
+    log.close()
+
+    # without an index, it is rebuilt from the log
+    os.remove(path + '.index')
+    with BlockLog(path) as log:
+        blocks = list(log.blocks(2))
+        assert [b['block_id'][:8] for b in blocks] == ['00000002', '00000003']
+        assert blocks[1]['previous'] == blocks[0]['block_id']
+
+
+def test_blockchain_block_log(node, steemd, tmpdir):
+    path = str(tmpdir.join('block_log'))
+    write_block_log(path, 1, 5)
+    blockchain = Blockchain(steemd)
+    requests = node.requests
+    ops = list(blockchain.history(start_block=1, end_block=20, raw_output=True, block_log=path))
+    assert node.requests - requests == 2  # get_dynamic_global_properties, a batch of blocks 6 to 20
+    assert [op['block'] for op in ops[:20]] == [num for num in range(1, 6) for _ in range(4)]
+    assert ops[20:] == [op for num in range(6, 21) for op in node.chain.ops_in_block(num)]
+
+    blocks = list(blockchain.stream_from(start_block=7, end_block=3, full_blocks=True, block_log=path))
+    assert [b['block_id'][:8] for b in blocks] == ['%08x' % num for num in range(7, 2, -1)]
@@ -0,0 +1,55 @@
+from steep.blockchain import Blockchain
+from steep.steemd import Steemd
+from steepbase.block_store import BlockStore, BlockTable
+
+
+def test_block_table(tmpdir):
+    path = str(tmpdir.join('blocks'))
+    table = BlockTable(path, segment_size=100)
+    for num in (5, 1, 3000000):
+        table.put(num, {'num': num, 'data': 'x' * 50})
+    table.put(5, {'num': 'ignored, blocks are immutable'})
+    assert table.get(5) == {'num': 5, 'data': 'x' * 50}
+    assert table.get(2) is None and table.get(10 ** 9) is None
+    assert 3000000 in table and 4 not in table
+    table.close()
+
+    table = BlockTable(path, segment_size=100)
+    assert [table.get(num)['num'] for num in (1, 5, 3000000)] == [1, 5, 3000000]
+    table.put(7, [])
+    assert table.get(7) == []
+    table.close()
+    assert len([name for name in tmpdir.join('blocks').listdir() if name.ext == '.seg']) > 1
+
+
+def test_block_store_irreversible_only(tmpdir):
+    store = BlockStore(str(tmpdir))
+    store.put('get_block', [10], {'block_id': 10})
+    assert store.get('get_block', [10]) == (False, None)
+
+    store.put('get_dynamic_global_properties', [], {'last_irreversible_block_num': 10})
+    store.put('get_block', [10], {'block_id': 10})
+    store.put('get_block', [11], {'block_id': 11})
+    store.put('get_ops_in_block', [10, True], [['producer_reward', {}]])
+    assert store.get('get_block', [10]) == (True, {'block_id': 10})
+    assert store.get('get_block', [11]) == (False, None)
+    assert store.get('get_ops_in_block', [10, True]) == (True, [['producer_reward', {}]])
+    assert store.get('get_ops_in_block', [10, False]) == (False, None)
+    assert store.get('get_accounts', [['steemit']]) == (False, None)
+    assert store.stats() == {'hits': 2, 'misses': 3}
+    store.close()
+
+
+def test_backfill(node, tmpdir):
+    s = Steemd(nodes=[node.serve_http()], block_store=str(tmpdir))
+    assert s.backfill_block_store(1, 50, operations=True) == 50
+    assert s.backfill_block_store(1, 200) == 85 - 50  # up to the last irreversible block
+
+    blockchain = Blockchain(s)
+    requests = node.requests
+    ops = list(blockchain.history(start_block=1, end_block=40, raw_output=True))
+    assert s.get_block(10) == node.chain.block(10)
+    assert s.get_ops_in_block(10, False) == node.chain.ops_in_block(10)
+    assert node.requests - requests == 1  # get_dynamic_global_properties
+    assert ops == [op for num in range(1, 41) for op in node.chain.ops_in_block(num)]
+    s.close()
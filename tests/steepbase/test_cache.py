@@ -0,0 +1,85 @@
+import time
+
+from steep.consts import DATABASE_API
+from steepbase.base_client import BaseClient
+from steepbase.cache import ResponseCache
+from steepbase.connector import Connector
+
+
+class CountingClient(BaseClient):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    @staticmethod
+    def _unpack_batch_call(call):
+        name, args, api = call
+        return name, list(args), api
+
+    def call(self, name, *args, **kwargs):
+        self.calls.append((name, args))
+        if name == 'get_dynamic_global_properties':
+            return {'head_block_number': 120, 'last_irreversible_block_num': 100}
+        if name == 'get_block':
+            return {'block_id': '%08x' % args[0]}
+        return {'name': name}
+
+    def call_batch(self, calls):
+        return [self.call(name, *args, api=api) for name, args, api in calls]
+
+
+def make_connector(**kwargs):
+    connector = Connector(['http://cache.local'], cache=ResponseCache(**kwargs))
+    connector.client = CountingClient()
+    return connector
+
+
+def test_config_never_expires():
+    s = make_connector()
+    assert s.call('get_config', api=DATABASE_API) == s.call('get_config', api=DATABASE_API)
+    assert len(s.client.calls) == 1
+    assert s.cache.stats()['hits'] == 1
+
+
+def test_global_props_expire_after_block_interval():
+    s = make_connector(block_interval=0.05)
+    s.call('get_dynamic_global_properties', api=DATABASE_API)
+    s.call('get_dynamic_global_properties', api=DATABASE_API)
+    assert len(s.client.calls) == 1
+
+    time.sleep(0.06)
+    s.call('get_dynamic_global_properties', api=DATABASE_API)
+    assert len(s.client.calls) == 2
+
+
+def test_only_irreversible_blocks_cached():
+    s = make_connector()
+    s.call('get_block', 50, api=DATABASE_API)
+    s.call('get_block', 50, api=DATABASE_API)
+    assert len(s.client.calls) == 2, 'irreversible block unknown yet'
+
+    s.call('get_dynamic_global_properties', api=DATABASE_API)
+    for _ in range(2):
+        s.call_batch([('get_block', [50], DATABASE_API), ('get_block', [110], DATABASE_API)])
+    assert [c for c in s.client.calls if c == ('get_block', (110,))] == [('get_block', (110,))] * 2
+    assert [c for c in s.client.calls if c == ('get_block', (50,))] == [('get_block', (50,))] * 3
+
+
+def test_lru_eviction_and_copies():
+    s = make_connector(maxsize=2)
+    s.call('get_dynamic_global_properties', api=DATABASE_API)
+    for num in (1, 2, 3):
+        s.call('get_block', num, api=DATABASE_API)
+    assert len(s.cache) == 2
+
+    block = s.call('get_block', 3, api=DATABASE_API)
+    block['mutated'] = True
+    assert 'mutated' not in s.call('get_block', 3, api=DATABASE_API)
+
+
+def test_uncached_methods_pass_through():
+    s = make_connector()
+    s.call('get_content', 'a', 'b')
+    s.call('get_content', 'a', 'b')
+    assert len(s.client.calls) == 2
+    assert s.cache.stats()['misses'] == 0
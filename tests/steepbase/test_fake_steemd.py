@@ -0,0 +1,38 @@
+from steep.consts import DATABASE_API
+from steepbase.fake_steemd import FakeSteemd
+from steepbase.http_client import HttpClient
+from steepbase.retry import RetryPolicy
+from steepbase.ws_client import WsClient
+
+
+def test_http(node, steemd):
+    assert steemd.get_dynamic_global_properties()['last_irreversible_block_num'] == 85
+    blocks = steemd.get_blocks(range(1, 101))
+    assert [int(b['block_id'][:8], 16) for b in blocks] == list(range(1, 101))
+    assert steemd.get_block(10) == node.chain.block(10) == FakeSteemd(produce_blocks=False).chain.block(10)
+    assert steemd.get_block(101) is None
+
+    node.chain.produce_block()
+    assert steemd.get_block(101)['previous'] == blocks[-1]['block_id']
+    assert len(steemd.get_account_history('user1', -1, 10)) == 11
+    assert steemd.get_accounts(['user1'])[0]['name'] == 'user1'
+
+
+def test_ws(node):
+    url = node.serve_ws()
+    for multiplex in (False, True):
+        client = WsClient([url], multiplex=multiplex)
+        assert client.call('get_block', 7, api=DATABASE_API) == node.chain.block(7)
+        results = sorted(client.call_multi_with_futures('get_ops_in_block', [[n, False] for n in range(1, 30)],
+                                                        api=DATABASE_API, max_workers=5),
+                         key=lambda ops: ops[0]['block'])
+        assert [ops[0]['block'] for ops in results] == list(range(1, 30))
+        client.close()
+
+
+def test_error_injection(node):
+    node.errors = {'db_lock': 0.3, 'internal': 0.2}
+    client = HttpClient([node.serve_http()], retry_policy=RetryPolicy(backoff=0.001))
+    for num in range(1, 21):
+        assert client.call('get_block', num, api=DATABASE_API)['block_id'] == node.chain.block_id(num)
+    assert client.retry_policy.stats()['retries'] > 0
@@ -0,0 +1,286 @@
+import gzip
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import pytest
+
+from steep.consts import CONDENSER_API, DATABASE_API
+from steepbase.exceptions import NoMethodWithName
+from steepbase.fake_steemd import FakeSteemd
+from steepbase.http_client import HttpClient
+from steepbase.retry import RetryPolicy
+
+
+class FakeResponse(object):
+    REDIRECT_STATUSES = [301, 302, 303, 307, 308]
+
+    def __init__(self, payload, status=200):
+        self.status = status
+        self.data = json.dumps(payload).encode('utf-8')
+
+
+def answer(body):
+    """ Echo the params of every call back as its result, in reverse order. """
+    request = json.loads(body.decode('utf-8'))
+    if isinstance(request, list):
+        return FakeResponse([{'jsonrpc': '2.0', 'id': r['id'], 'result': r['params']} for r in reversed(request)])
+    return FakeResponse({'jsonrpc': '2.0', 'id': request['id'], 'result': request['params']})
+
+
+def make_client(url, handler, **kwargs):
+    client = HttpClient([url], **kwargs)
+    client._post = lambda url, body: handler(body)
+    return client
+
+
+def test_call_batch_matches_ids():
+    client = make_client('http://batch-ids.local', answer, batch_size=2)
+    calls = [('get_block', [num], DATABASE_API) for num in range(5)]
+    results = client.call_batch(calls)
+
+    assert [r[2] for r in results] == [[num] for num in range(5)]
+    assert all(r[:2] == [CONDENSER_API, 'get_block'] for r in results)
+
+
+def test_call_batch_item_errors():
+    def handler(body):
+        request = json.loads(body.decode('utf-8'))
+        return FakeResponse([
+            {'jsonrpc': '2.0', 'id': 0, 'result': 1},
+            {'jsonrpc': '2.0', 'id': 1, 'error': {'code': -32601, 'message': 'no method with name \'foo\''}},
+        ][:len(request)])
+
+    client = make_client('http://batch-errors.local', handler)
+    with pytest.raises(NoMethodWithName):
+        client.call_batch([('get_block', [1]), ('foo', [])])
+
+    client.re_raise = False
+    result, error = client.call_batch([('get_block', [1]), ('foo', [])])
+    assert result == 1
+    assert error['code'] == -32601
+
+
+def test_call_batch_fallback():
+    requests = []
+
+    def handler(body):
+        request = json.loads(body.decode('utf-8'))
+        requests.append(request)
+        if isinstance(request, list):
+            return FakeResponse({'jsonrpc': '2.0', 'id': None,
+                                 'error': {'code': -32600, 'message': 'Invalid Request'}})
+        return answer(body)
+
+    client = make_client('http://batch-unsupported.local', handler)
+    assert client.supports_batch
+
+    results = client.call_batch([('get_block', [1]), ('get_block', [2])])
+    assert [r[2] for r in results] == [[1], [2]]
+    assert not client.supports_batch
+    assert [type(r) for r in requests] == [list, dict, dict]
+
+
+def test_call_batch_transient_errors_keep_batching():
+    with FakeSteemd(head_block=100, produce_blocks=False, errors={'db_lock': 0.3}) as node:
+        url = node.serve_http()
+        client = HttpClient([url], retry_policy=RetryPolicy(backoff=0.001))
+        for _ in range(5):
+            blocks = client.call_batch([('get_block', [num]) for num in range(1, 4)])
+            assert [b['block_id'] for b in blocks] == [node.chain.block(num)['block_id'] for num in range(1, 4)]
+
+        assert client.supports_batch
+        assert url not in HttpClient.non_batch_nodes
+        assert HttpClient([url]).supports_batch
+
+
+def test_set_node_sticks_until_it_fails():
+    nodes = ['http://a-sticky.local', 'http://b-sticky.local']
+    client = HttpClient(nodes, retry_policy=RetryPolicy(backoff=0.001))
+    posted = []
+    down = set()
+
+    def post(url, body):
+        posted.append(url)
+        if url in down:
+            raise ConnectionResetError('down')
+        return answer(body)
+
+    client._post = post
+    client.set_node(nodes[1])
+    for num in range(3):
+        assert client.call('get_block', num)[2] == [num]
+    assert posted == [nodes[1]] * 3
+
+    down.add(nodes[1])
+    del posted[:]
+    client.call('get_block', 1)
+    client.call('get_block', 2)
+    assert posted == [nodes[1], nodes[0], nodes[0]]
+
+
+def serve(delay):
+    """ Start a local JSON-RPC node answering every call with its own port after ``delay`` seconds. """
+    class Server(ThreadingMixIn, HTTPServer):
+        daemon_threads = True
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8'))
+            time.sleep(delay)
+            data = json.dumps({'jsonrpc': '2.0', 'id': request['id'], 'result': self.server.server_port}).encode()
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = Server(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, 'http://127.0.0.1:%d' % server.server_port
+
+
+def test_hedged_call():
+    slow, slow_url = serve(0.5)
+    fast, fast_url = serve(0)
+    try:
+        client = HttpClient([slow_url, fast_url], hedge=True, hedge_delay=0.05, node_policy='round_robin')
+        assert client.url == slow_url
+
+        assert client.call('get_block', 1) == fast.server_port
+        assert (client.hedged_calls, client.hedge_wins) == (1, 1)
+
+        # broadcasts must wait for the node they were sent to
+        assert client.call('broadcast_transaction', {}) == slow.server_port
+        assert client.hedged_calls == 1
+
+        client.close()
+        assert client._hedge_executor is None
+    finally:
+        slow.shutdown()
+        fast.shutdown()
+
+
+def test_single_flight():
+    server, url = serve(delay=0.2)
+    try:
+        client = HttpClient([url], single_flight=True)
+        requests = []
+        original = client._post
+        client._post = lambda *args, **kwargs: requests.append(1) or original(*args, **kwargs)
+
+        results = [None] * 5
+        threads = [threading.Thread(target=lambda i=i: results.__setitem__(
+            i, client.call_coalesced('get_dynamic_global_properties', api=DATABASE_API))) for i in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert results == [server.server_port] * 5
+        assert len(requests) == 1
+        assert client.deduplicated_calls == 4
+    finally:
+        server.shutdown()
+
+
+def test_compression():
+    class Server(ThreadingMixIn, HTTPServer):
+        daemon_threads = True
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            if self.headers.get('Content-Encoding') == 'gzip' and self.server.gzip_requests:
+                body = gzip.decompress(body)
+            try:
+                request = json.loads(body.decode('utf-8'))
+                response = {'jsonrpc': '2.0', 'id': request['id'], 'result': request['params'] * 100}
+            except ValueError:
+                # like steemd, which ignores Content-Encoding
+                response = {'jsonrpc': '2.0', 'id': None, 'error': {'code': -32700, 'message': 'Parse Error'}}
+            data = json.dumps(response).encode()
+            self.send_response(200)
+            if 'gzip' in self.headers.get('Accept-Encoding', ''):
+                data = gzip.compress(data)
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = Server(('127.0.0.1', 0), Handler)
+    server.gzip_requests = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = 'http://127.0.0.1:%d' % server.server_port
+        plain = HttpClient([url])
+        compressed = HttpClient([url], compression=True, compress_requests_over=100)
+        params = ['x' * 500]
+        echoed = plain.call('echo', *params)
+        assert compressed.call('echo', *params) == echoed
+
+        stats = compressed.transfer_stats()
+        assert stats['bytes_decoded'] == plain.transfer_stats()['bytes_received']
+        assert stats['bytes_received'] < stats['bytes_decoded'] / 10
+        assert stats['bytes_sent'] < plain.transfer_stats()['bytes_sent']
+
+        sent = compressed.transfer_stats()['bytes_sent']
+        assert list(compressed.call_streaming('echo', *params)) == echoed
+        stats = compressed.transfer_stats()
+        assert 0 < stats['bytes_sent'] - sent < len(params[0])
+        assert stats['bytes_decoded'] == 2 * plain.transfer_stats()['bytes_received']
+
+        server.gzip_requests = False
+        assert compressed.call('echo', *params) == echoed
+        assert url in HttpClient.non_gzip_request_nodes
+
+        HttpClient.non_gzip_request_nodes.discard(url)
+        assert list(compressed.call_streaming('echo', *params)) == echoed
+        assert url in HttpClient.non_gzip_request_nodes
+    finally:
+        HttpClient.non_gzip_request_nodes.discard(url)
+        server.shutdown()
+
+
+def test_map_ordered():
+    def handler(body):
+        request = json.loads(body.decode('utf-8'))
+        time.sleep(0.01 * (request['params'][2][0] % 3))
+        return answer(body)
+
+    client = make_client('http://ordered.local', handler, max_workers=4)
+    params = iter(range(100))
+    results = client.map_ordered('echo', params, window=8)
+    assert [next(results)[2] for _ in range(10)] == [[i] for i in range(10)]
+    # only the window was consumed ahead of the results
+    assert next(params) <= 10 + 8
+    results.close()
+
+    executor = client.executor
+    assert sorted(r[2][0] for r in client.call_multi_with_futures('echo', range(20))) == list(range(20))
+    assert client.executor is executor
+
+    # more workers than the shared executor has threads
+    in_flight, most = [], []
+    lock = threading.Lock()
+
+    def slow(body):
+        with lock:
+            in_flight.append(1)
+            most.append(len(in_flight))
+        time.sleep(0.05)
+        with lock:
+            in_flight.pop()
+        return answer(body)
+
+    client._post = lambda url, body: slow(body)
+    assert len(list(client.call_multi_with_futures('echo', range(16), max_workers=8))) == 16
+    assert max(most) > 4
+    client.close()
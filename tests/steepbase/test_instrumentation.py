@@ -0,0 +1,42 @@
+import pytest
+
+from steep.consts import DATABASE_API
+from steepbase.exceptions import RPCError
+from steepbase.http_client import HttpClient
+from steepbase.instrumentation import CallStats
+
+
+def test_call_stats(node):
+    url = node.serve_http()
+    client = HttpClient([url])
+    stats = CallStats()
+    records = []
+    client.add_hook(stats)
+    client.add_hook(records.append)
+
+    for _ in range(3):
+        client.call('get_dynamic_global_properties', api=DATABASE_API)
+    with pytest.raises(RPCError):
+        client.call('nope')
+
+    record = records[0]
+    assert (record.method, record.api, record.node, record.outcome) == \
+        ('get_dynamic_global_properties', DATABASE_API, url, 'ok')
+    assert record.request_bytes > 0 and record.response_bytes > 0
+    assert records[-1].outcome == 'RPCError'
+
+    summary = stats.summary()[('get_dynamic_global_properties', '127.0.0.1')]
+    assert summary['calls'] == 3
+    assert summary['p50'] <= summary['p99']
+    assert summary['outcomes'] == {'ok': 3}
+
+    text = stats.prometheus()
+    assert '# TYPE steem_rpc_call_duration_seconds histogram' in text
+    assert 'steem_rpc_call_duration_seconds_bucket{method="get_dynamic_global_properties",node="127.0.0.1",le="+Inf"} 3' in text
+    assert 'steem_rpc_calls_total{method="nope",node="127.0.0.1",outcome="RPCError"} 1' in text
+
+
+def test_no_hooks_no_records(node):
+    client = HttpClient([node.serve_http()])
+    assert client.call('get_dynamic_global_properties')['head_block_number'] == 100
+    assert client.hooks == []
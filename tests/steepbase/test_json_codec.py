@@ -0,0 +1,30 @@
+import json
+
+import pytest
+
+from steepbase.json_codec import available_codecs, get_codec
+
+
+@pytest.mark.parametrize('name', list(available_codecs))
+def test_round_trip(name):
+    codec = get_codec(name)
+    body = {'jsonrpc': '2.0', 'id': 1, 'method': 'call', 'params': ['condenser_api', 'get_accounts', [['тест']]]}
+    data = codec.dumps(body)
+    assert isinstance(data, bytes)
+    assert 'тест'.encode('utf8') in data
+    assert codec.loads(data) == body
+    assert codec.loads(memoryview(data)) == body
+    assert codec.loads(data.decode('utf8')) == body
+
+
+@pytest.mark.parametrize('name', list(available_codecs))
+def test_decode_error(name):
+    with pytest.raises(json.JSONDecodeError):
+        get_codec(name).loads(b'<html>502 Bad Gateway</html>')
+
+
+def test_get_codec():
+    assert get_codec() is list(available_codecs.values())[0]
+    assert get_codec('json').name == 'json'
+    with pytest.raises(ValueError):
+        get_codec('simplejson')
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from steepbase.json_stream import ErrorResponse, iter_items
+
+
+def chunked(data, size):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+RESPONSE = {
+    'jsonrpc': '2.0',
+    'id': 1,
+    'result': {
+        'previous': '00000001',
+        'extensions': [],
+        'transactions': [
+            {'ref_block_num': 1, 'operations': [['vote', {'voter': 'a\\"b', 'weight': -100}]]},
+            {'ref_block_num': 2, 'operations': [], 'memo': '{"]}é😀'},
+            [1, 2.5e3, None, True, False, "x"],
+        ],
+    },
+}
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 64, 2 ** 16])
+def test_iter_items(size):
+    data = json.dumps(RESPONSE, ensure_ascii=False).encode('utf8')
+    assert list(iter_items(chunked(data, size), 'result.transactions')) == RESPONSE['result']['transactions']
+    assert dict(iter_items(chunked(data, size))) == RESPONSE['result']
+    assert list(iter_items(chunked(data, size), 'result.extensions')) == []
+    assert list(iter_items(chunked(data, size), 'result.previous')) == ['00000001']
+    assert list(iter_items(chunked(data, size), 'result.missing')) == []
+
+
+def test_iter_items_null_result():
+    assert list(iter_items([b'{"id": 1, "result": null}'], 'result.transactions')) == []
+
+
+def test_iter_items_error():
+    data = b'{"jsonrpc": "2.0", "error": {"code": -32003, "message": "Assert Exception"}, "id": 1}'
+    with pytest.raises(ErrorResponse) as e:
+        list(iter_items(chunked(data, 5)))
+    assert e.value.error['code'] == -32003
+
+
+def test_iter_items_truncated():
+    with pytest.raises(ValueError):
+        list(iter_items([b'{"result": [1, 2, {"a": '], 'result'))
@@ -0,0 +1,147 @@
+import time
+
+import pytest
+
+from steepbase.node_pool import NodePool
+
+nodes = ['https://a.local', 'https://b.local', 'https://c.local']
+
+
+def test_untried_nodes_are_probed_first():
+    pool = NodePool(nodes)
+    pool.record_success(nodes[0], 0.1)
+    assert pool.select() in nodes[1:]
+
+
+def test_fastest_node_wins():
+    pool = NodePool(nodes)
+    for url, latency in zip(nodes, [0.3, 0.05, 0.2]):
+        pool.record_success(url, latency)
+    assert pool.select() == nodes[1]
+    assert pool.route(nodes[0]) == nodes[1]
+
+    scores = pool.scores()
+    assert scores[nodes[1]] < scores[nodes[2]] < scores[nodes[0]]
+
+
+def test_failed_node_cools_down():
+    pool = NodePool(nodes, cooldown=0.05)
+    for url in nodes:
+        pool.record_success(url, 0.1)
+    pool.record_success(nodes[0], 0.01)
+    assert pool.select() == nodes[0]
+
+    pool.record_failure(nodes[0])
+    assert pool.select() != nodes[0]
+    assert pool.stats()[nodes[0]]['errors'] == 1
+
+    time.sleep(0.06)
+    assert not pool[nodes[0]].in_cooldown()
+
+
+def test_all_nodes_down():
+    pool = NodePool(nodes, cooldown=10)
+    for url in nodes:
+        pool.record_failure(url)
+    assert pool.select() == nodes[0]
+
+
+def test_lagging_node_skipped():
+    pool = NodePool(nodes[:2], max_head_lag=5)
+    pool.record_success(nodes[0], 0.01)
+    pool.record_success(nodes[1], 0.5)
+    pool.record_head_block(nodes[0], 100)
+    pool.record_head_block(nodes[1], 200)
+    assert pool.select() == nodes[1]
+
+
+def test_round_robin():
+    pool = NodePool(nodes, policy='round_robin')
+    assert [pool.select() for _ in range(4)] == nodes + nodes[:1]
+    assert pool.route(nodes[1]) == nodes[1]
+
+    with pytest.raises(ValueError):
+        pool.policy = 'random'
+
+
+def test_circuit_opens_after_threshold():
+    pool = NodePool(nodes[:2], cooldown=10, failure_threshold=3)
+    for url in nodes[:2]:
+        pool.record_success(url, 0.1)
+    pool.record_success(nodes[0], 0.01)
+
+    for _ in range(2):
+        pool.record_failure(nodes[0])
+    assert pool[nodes[0]].state == 'closed'
+    pool.record_failure(nodes[0])
+    assert pool[nodes[0]].state == 'open'
+    assert pool.select() == nodes[1]
+
+
+def test_half_open_probe():
+    probed = []
+
+    def probe(url):
+        probed.append(url)
+        if len(probed) == 1:
+            raise ConnectionError('still down')
+
+    pool = NodePool(nodes[:2], cooldown=0.05, probe=probe)
+    pool.record_success(nodes[1], 0.5)
+    pool.record_failure(nodes[0])
+    assert pool.select() == nodes[1]
+    assert probed == []
+
+    time.sleep(0.06)
+    assert pool.select() == nodes[1]
+    pool.join_probes()
+    assert probed == [nodes[0]]
+    assert pool[nodes[0]].state == 'open', 'failed probe re-opens the circuit'
+
+    time.sleep(0.06)
+    pool.select()
+    pool.join_probes()
+    assert probed == [nodes[0]] * 2
+    assert pool[nodes[0]].state == 'closed', 'successful probe closes the circuit'
+    assert pool.select() == nodes[0]
+
+
+def test_probe_runs_in_background():
+    def probe(url):
+        time.sleep(0.5)
+
+    pool = NodePool(nodes[:2], cooldown=0.05, probe=probe)
+    pool.record_success(nodes[1], 0.5)
+    pool.record_failure(nodes[0])
+    time.sleep(0.06)
+
+    started = time.monotonic()
+    assert pool.select() == nodes[1]
+    assert time.monotonic() - started < 0.1, 'routing must not wait for the probe'
+    assert pool[nodes[0]].state == 'half_open'
+
+    pool.join_probes()
+    assert pool[nodes[0]].state == 'closed'
+
+
+def test_probe_blocks_when_no_node_is_healthy():
+    probed = []
+    pool = NodePool(nodes[:1], cooldown=0.05, probe=lambda url: probed.append(url))
+    pool.record_failure(nodes[0])
+    time.sleep(0.06)
+
+    assert pool.select() == nodes[0]
+    assert probed == [nodes[0]]
+    assert pool[nodes[0]].state == 'closed'
+
+
+def test_half_open_trial_call():
+    pool = NodePool(nodes[:2], cooldown=0.05)
+    pool.record_success(nodes[1], 0.5)
+    pool.record_failure(nodes[0])
+    time.sleep(0.06)
+
+    assert pool.select() == nodes[0]
+    assert pool.select() == nodes[1], 'only one trial call while half-open'
+    pool.record_success(nodes[0], 0.01)
+    assert pool.select() == nodes[0]
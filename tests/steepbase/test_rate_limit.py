@@ -0,0 +1,33 @@
+import threading
+import time
+
+from steepbase.rate_limit import RateLimiter, TokenBucket
+
+
+def test_token_bucket_queues_callers():
+    bucket = TokenBucket(rate=100, burst=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert 0.005 < bucket.reserve() <= 0.01
+    assert 0.015 < bucket.reserve() <= 0.02
+    assert not bucket.try_take()
+
+
+def test_rate_limiter_shared_across_threads():
+    limiter = RateLimiter(rate=200, burst=1, weights={'get_account_history': 5})
+    started = time.monotonic()
+    threads = [threading.Thread(target=limiter.acquire, args=('https://a.local', 'get_block')) for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert time.monotonic() - started >= 19 / 200
+
+    stats = limiter.stats()
+    assert stats['calls'] == 20
+    assert stats['waited'] == 19
+    assert 0.09 <= stats['max_wait'] <= 0.1
+
+    # other nodes have their own bucket, weights take several tokens
+    assert limiter.acquire('https://b.local', 'get_block') == 0
+    assert 0.02 < limiter.acquire('https://b.local', 'get_account_history') <= 0.025
@@ -0,0 +1,43 @@
+import time
+
+import pytest
+
+from steepbase.exceptions import NumRetriesReached
+from steepbase.retry import RetryPolicy
+
+
+def test_exponential_backoff_with_jitter():
+    policy = RetryPolicy(backoff=1, max_backoff=8, jitter=False)
+    assert [policy.delay(n) for n in range(1, 6)] == [1, 2, 4, 8, 8]
+
+    policy.jitter = True
+    delays = [policy.delay(4) for _ in range(100)]
+    assert all(0 <= d <= 8 for d in delays)
+    assert len(set(delays)) > 1
+
+
+def test_max_attempts():
+    policy = RetryPolicy(max_attempts=3)
+    retry = policy.begin()
+    retry.backoff()
+    retry.backoff()
+    with pytest.raises(NumRetriesReached):
+        retry.backoff()
+    assert policy.stats() == {'retries': 2, 'exhausted': 1}
+
+
+def test_deadline():
+    retry = RetryPolicy(backoff=0.01, jitter=False, deadline=0.05).begin()
+    retry.sleep()
+    time.sleep(0.05)
+    with pytest.raises(NumRetriesReached):
+        retry.backoff()
+
+
+def test_budget_is_shared():
+    policy = RetryPolicy(budget=0.5, budget_min_rate=0.001, budget_burst=2)
+    retries = [policy.begin() for _ in range(4)]
+    retries[0].backoff()
+    retries[1].backoff()
+    with pytest.raises(NumRetriesReached):
+        retries[2].backoff()
@@ -0,0 +1,154 @@
+import glob
+import json
+import os
+from binascii import hexlify
+
+import pytest
+
+import steep.consts  # noqa: F401
+from steepbase.account import PrivateKey
+from steepbase.operationids import op_names
+from steepbase.operations import GrapheneObject, Operation
+from steepbase.transactions import SignedTransaction
+from steepbase.types import (
+    Uint8, Int16, Uint16, Uint32, Uint64, Int64, String, Bytes, FixedBytes, Void, Array, Set,
+    PointInTime, Signature, Bool, Optional, StaticVariant, Map, Version)
+from steepbase.wire import (
+    PublicKey, Amount, WireDecoder, CompiledOperation, future_extensions, operation_layouts,
+    decode_operation, decode_transaction, encode_operation, encode_transaction)
+
+wif = '5KQwrPbwdL6PhXujxW37FSSQZ1JiwsST4cqQzDeyXtP79zkvFD3'
+key = 'STM6zLNtyFVToBsBZDsgMhgjpwysYVbsQD6YhP3kRkQhANUB4w7Qp'
+block_data = os.path.join(os.path.dirname(__file__), '..', 'block_data')
+
+samples = {
+    Uint8: 1, Int16: -2, Uint16: 3, Uint32: 4, Uint64: 5, Int64: -6, Bool: True,
+    String: 'steem', Bytes: 'beef', Void: {}, PointInTime: '2016-08-11T22:00:09',
+    Signature: '20' + 'ab' * 64, Version: '0.19.0', Amount: '1.500 SBD', PublicKey: key,
+}
+
+
+def sample(layout):
+    """ A value of ``layout``, as the API shows it. """
+    if layout is future_extensions:
+        return []  # operation classes don't take extensions
+    if isinstance(layout, list):
+        return {name: sample(field) for name, field in layout}
+    if isinstance(layout, tuple):
+        kind = layout[0]
+        if kind is FixedBytes:
+            return '01' * layout[1]
+        if kind in (Array, Set):
+            return [sample(layout[1])]
+        if kind is Optional:
+            return sample(layout[1])
+        if kind is Map:
+            return [[sample(layout[1]), sample(layout[2])]]
+        if kind is StaticVariant:
+            return [len(layout[1]) - 1, sample(layout[1][-1])]
+    return samples[layout]
+
+
+def transactions():
+    for path in sorted(glob.glob(os.path.join(block_data, '*.json'))):
+        with open(path) as f:
+            try:
+                data = json.load(f)
+            except ValueError:
+                continue  # some samples aren't strict JSON
+        if isinstance(data, dict) and 'operations' in data:
+            yield os.path.basename(path), data
+
+
+def test_every_operation_has_a_layout():
+    assert sorted(operation_layouts) == sorted(op_names)
+
+
+@pytest.mark.parametrize('name', op_names)
+def test_operation_round_trip(name):
+    op = [name, sample(operation_layouts[name])]
+    raw = bytes(Operation(op))
+    decoded = decode_operation(raw)
+    assert isinstance(decoded, Operation) and decoded.opId == op_names.index(name)
+    assert bytes(decoded) == raw
+    assert decode_operation(hexlify(raw).decode()).opId == decoded.opId
+    assert WireDecoder().operation(memoryview(raw)) == (op, len(raw))
+    assert encode_operation(op) == raw
+
+
+@pytest.mark.parametrize('name, data', list(transactions()))
+def test_transaction_round_trip(name, data):
+    raw = bytes(SignedTransaction(**dict(data)))
+    assert encode_transaction(data) == raw
+    decoded = decode_transaction(memoryview(raw))
+    assert bytes(decoded) == raw
+
+    trx, _ = WireDecoder().transaction(raw)
+    for key_name, value in data.items():
+        assert trx[key_name] == value, name
+
+
+def test_large_amount_round_trip():
+    op = ['withdraw_vesting', {'account': 'steem', 'vesting_shares': '123456789012.123456 VESTS'}]
+    assert WireDecoder().operation(bytes(Operation(op)))[0] == op
+
+
+def test_amount_is_exact():
+    amount = Amount('123456789012.123456 VESTS')
+    assert bytes(amount)[:8] == (123456789012123456).to_bytes(8, 'little')
+    assert str(amount) == '123456789012.123456 VESTS'
+    assert str(Amount('0.1 STEEM')) == '0.100 STEEM'
+
+
+def test_decoded_transaction_verifies():
+    trx = SignedTransaction(ref_block_num=34294, ref_block_prefix=3707022213, expiration='2016-04-06T08:29:27',
+                            operations=[Operation(['vote', {'voter': 'a', 'author': 'b', 'permlink': 'c',
+                                                            'weight': 10000}])])
+    raw = bytes(trx.sign([wif], chain='STEEM'))
+    decoded = decode_transaction(raw)
+    decoded.verify([PrivateKey(wif).pubkey], chain='STEEM')
+
+    with pytest.raises(ValueError):
+        decode_transaction(raw + b'\x00')
+
+
+def test_encode_operation():
+    keys = [format(PrivateKey(wif).pubkey, 'STM'), key, 'STM1111111111111111111111111111111114T1Anm']
+    authority = {'weight_threshold': 1, 'account_auths': [['b', 1], ['ab', 1]], 'key_auths': [[k, 1] for k in keys]}
+    for op in (
+            ['account_update', {'account': 'a', 'posting': authority, 'memo_key': key, 'json_metadata': {'a': 1}}],
+            ['comment', {'parent_author': '', 'parent_permlink': 'p', 'author': 'a', 'permlink': 'p',
+                         'title': 'escaped \x01\x08\x0c\x1f', 'body': 'long \n' * 100}],
+            ['transfer', {'from': 'a', 'to': 'b', 'amount': '0.001 SBD'}],
+    ):
+        assert encode_operation(op) == bytes(Operation(op))
+
+    with pytest.raises(ValueError):
+        encode_operation(['no_such_operation', {}])
+
+
+@pytest.mark.parametrize('name', op_names)
+def test_operation_plan_matches_objects(name):
+    op = Operation([name, sample(operation_layouts[name])])
+    assert op.op._data is None, 'no object per field until asked for'
+    assert bytes(op.op) == GrapheneObject.__bytes__(op.op)
+
+
+def test_operation_checks_fields():
+    with pytest.raises(KeyError):
+        Operation(['vote', {'voter': 'a', 'author': 'b', 'weight': 100}])
+    with pytest.raises(AssertionError):
+        Operation(['account_create', dict(sample(operation_layouts['account_create']), new_account_name='a' * 17)])
+
+
+def test_compiled_operation_signs():
+    op = ['vote', {'voter': 'a', 'author': 'b', 'permlink': 'c', 'weight': 10000}]
+    compiled = CompiledOperation(op)
+    assert bytes(compiled) == bytes(Operation(op))
+    assert json.loads(str(compiled)) == op
+
+    trx = SignedTransaction(ref_block_num=34294, ref_block_prefix=3707022213, expiration='2016-04-06T08:29:27',
+                            operations=[compiled])
+    trx.sign([wif], chain='STEEM')
+    assert trx.json()['operations'] == [op]
+    decode_transaction(bytes(trx)).verify([PrivateKey(wif).pubkey], chain='STEEM')
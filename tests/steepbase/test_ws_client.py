@@ -0,0 +1,94 @@
+import concurrent.futures
+import json
+import queue
+import threading
+import time
+
+import pytest
+
+from steepbase import ws_client
+from steepbase.exceptions import NumRetriesReached
+from steepbase.ws_client import WsClient
+
+CLOSED = object()
+
+
+class FakeWebSocket(object):
+    """ In-memory websocket answering ``echo`` calls with their first param, slowest first. """
+    connections = []
+
+    def __init__(self, **kwargs):
+        self.inbox = queue.Queue()
+        self.sent = []
+        self.drop_after = None
+
+    def connect(self, url):
+        self.url = url
+        FakeWebSocket.connections.append(self)
+
+    def send(self, body):
+        request = json.loads(body.decode('utf-8'))
+        self.sent.append(request)
+        if self.drop_after is not None and len(self.sent) >= self.drop_after:
+            self.inbox.put(CLOSED)
+            return
+        value = request['params'][0]
+        response = json.dumps({'jsonrpc': '2.0', 'id': request['id'], 'result': value})
+        threading.Timer(0.01 * (10 - value), self.inbox.put, [response]).start()
+
+    def recv(self):
+        message = self.inbox.get()
+        if message is CLOSED:
+            raise ConnectionResetError('connection dropped')
+        return message
+
+    def close(self):
+        self.inbox.put(CLOSED)
+
+
+@pytest.fixture
+def fake_ws(monkeypatch):
+    FakeWebSocket.connections = []
+    monkeypatch.setattr(ws_client.websocket, 'WebSocket', FakeWebSocket)
+    return FakeWebSocket
+
+
+def test_multiplexed_calls(fake_ws):
+    client = WsClient(['ws://a.local'], multiplex=True, timeout=5)
+    results = list(client.call_multi_with_futures('echo', range(10), max_workers=10))
+
+    assert sorted(results) == list(range(10))
+    # answers arrive slowest-last, so calls must have been in flight together
+    assert results[0] == 9
+    assert len(fake_ws.connections) == 1
+    client.close()
+
+
+def test_pending_calls_replayed(fake_ws):
+    client = WsClient(['ws://a.local', 'ws://b.local'], multiplex=True, timeout=5)
+    fake_ws.connections[0].drop_after = 3
+
+    results = list(client.call_multi_with_futures('echo', range(5), max_workers=5))
+
+    assert sorted(results) == list(range(5))
+    assert [c.url for c in fake_ws.connections] == ['ws://a.local', 'ws://b.local']
+    client.close()
+
+
+def test_unanswered_calls(fake_ws):
+    client = WsClient(['ws://a.local'], multiplex=True, timeout=0.1)
+    fake_ws.connections[0].send = lambda body: None  # never answered
+
+    with pytest.raises(concurrent.futures.TimeoutError):
+        client.call('echo', 1)
+    assert not client._pending
+
+    # calls waiting when the client is closed fail, rather than wait for their timeout
+    client.timeout = 30
+    with concurrent.futures.ThreadPoolExecutor(1) as executor:
+        future = executor.submit(client.call, 'echo', 1)
+        while not client._pending:
+            time.sleep(0.01)
+        client.close()
+        with pytest.raises(NumRetriesReached):
+            future.result(timeout=5)